@@ -0,0 +1,38 @@
+"""Add composite indexes for chat access paths
+
+Revision ID: 7b3f9c2d4a61
+Revises: e1cfecddf316
+Create Date: 2026-10-18 10:12:44.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3f9c2d4a61'
+down_revision: Union[str, Sequence[str], None] = 'e1cfecddf316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # History fetch: conversation_id = ? ORDER BY created_at DESC LIMIT n
+    op.create_index('ix_messages_conversation_id_created_at', 'messages', ['conversation_id', 'created_at'], unique=False)
+    # Per-character message stats and trending queries
+    op.create_index('ix_messages_character_id_created_at', 'messages', ['character_id', 'created_at'], unique=False)
+    # Get-or-create conversation: user_id = ? AND character_id = ? AND is_active
+    op.create_index('ix_conversations_user_id_character_id_is_active', 'conversations', ['user_id', 'character_id', 'is_active'], unique=False)
+    # Conversation list: user_id = ? AND is_active ORDER BY updated_at DESC
+    op.create_index('ix_conversations_user_id_is_active_updated_at', 'conversations', ['user_id', 'is_active', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversations_user_id_is_active_updated_at', table_name='conversations')
+    op.drop_index('ix_conversations_user_id_character_id_is_active', table_name='conversations')
+    op.drop_index('ix_messages_character_id_created_at', table_name='messages')
+    op.drop_index('ix_messages_conversation_id_created_at', table_name='messages')
@@ -0,0 +1,32 @@
+"""Add rolling summary columns to conversations
+
+Revision ID: c4d82e1f9b07
+Revises: 7b3f9c2d4a61
+Create Date: 2026-10-18 11:03:17.502961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d82e1f9b07'
+down_revision: Union[str, Sequence[str], None] = '7b3f9c2d4a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_updated_at')
+    op.drop_column('conversations', 'summary_message_id')
+    op.drop_column('conversations', 'summary')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import categories, characters, chat, community
+from app.api.v1.endpoints import categories, characters, chat, community, images, voice
 from app.api.v1 import subcategories
 
 api_router = APIRouter()
@@ -9,3 +9,5 @@ api_router.include_router(subcategories.router, prefix="/subcategories", tags=["
 api_router.include_router(characters.router, prefix="/characters", tags=["characters"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(community.router, prefix="/community", tags=["community"])
+api_router.include_router(images.router, prefix="/images", tags=["images"])
+api_router.include_router(voice.router, prefix="/voice", tags=["voice"])
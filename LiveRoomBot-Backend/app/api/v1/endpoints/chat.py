@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db, AsyncSessionLocal
 from app.models.conversation import Conversation as ConversationModel, Message as MessageModel
 from app.models.character import Character as CharacterModel
 from app.schemas.conversation import (
     Conversation, ConversationCreate, ConversationWithMessages,
-    Message, MessageCreate, ChatRequest, ChatResponse
+    Message, MessageCreate, ChatRequest, ChatResponse,
+    DirectChatRequest, ChatStreamEvent, MessagePage
 )
-from app.services.openai_service import OpenAIService
+from app.services.openai_service import OpenAIService, get_openai_service
 from app.services.character_service import CharacterService
+from app.services.chat_service import ChatService, PAGE_LIMIT, MAX_PAGE_LIMIT
+from app.services.summary_service import conversation_summarizer
+from app.services.memory_index import memory_index
+from app.services.turn_guard import IdempotencyConflict, get_chat_turn_guard
 
 router = APIRouter()
 
@@ -47,71 +58,39 @@ def start_conversation(
     return db_conversation
 
 @router.post("/message", response_model=ChatResponse)
-def send_message(
+async def send_message(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """Send a message and get character response"""
-    openai_service = OpenAIService()
-    
-    # Get or create conversation
-    if chat_request.conversation_id:
-        conversation = db.query(ConversationModel).filter(
-            ConversationModel.id == chat_request.conversation_id,
-            ConversationModel.user_id == DEMO_USER_ID
-        ).first()
-        
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-    else:
+    if not chat_request.conversation_id:
         # For demo, we'll assume character_id = 1 if no conversation specified
         # In production, this should be handled differently
         raise HTTPException(status_code=400, detail="Conversation ID required")
     
-    # Get character
-    character = db.query(CharacterModel).filter(
-        CharacterModel.id == conversation.character_id
-    ).first()
-    
-    if not character:
-        raise HTTPException(status_code=404, detail="Character not found")
+    user_sent_at = datetime.now(timezone.utc)
+    chat_service = ChatService(db)
     
-    # Save user message
-    user_message = MessageModel(
-        conversation_id=conversation.id,
-        user_id=DEMO_USER_ID,
-        character_id=character.id,
-        content=chat_request.message,
-        sender_type="user"
+    # Conversation, character and bounded history in one query
+    character, conversation, conversation_history, plan = await chat_service.load_conversation_turn(
+        chat_request.conversation_id, DEMO_USER_ID
     )
-    db.add(user_message)
-    db.commit()
     
-    # Get conversation history
-    conversation_history = db.query(MessageModel).filter(
-        MessageModel.conversation_id == conversation.id
-    ).order_by(MessageModel.created_at).all()
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Generate character response
-    try:
-        character_response = openai_service.generate_character_response(
-            character, conversation_history[:-1], chat_request.message
-        )
-    except Exception as e:
-        # Fallback response if OpenAI fails
-        character_response = f"I'm having trouble thinking right now, but I'm still here for you! 💕"
+    # Generate character response; backend failures come back as the character's fallback line
+    character_response = await openai_service.generate_character_response_async(
+        character, conversation_history, chat_request.message,
+        conversation_summary=conversation.summary, plan=plan
+    )
     
-    # Save character message
-    character_message = MessageModel(
-        conversation_id=conversation.id,
-        user_id=DEMO_USER_ID,
-        character_id=character.id,
-        content=character_response,
-        sender_type="character"
+    _, user_message, character_message = await chat_service.save_turn(
+        character, conversation.id, DEMO_USER_ID, chat_request.message, character_response, user_sent_at
     )
-    db.add(character_message)
-    db.commit()
-    db.refresh(character_message)
+    memory_index.schedule([user_message, character_message])
+    conversation_summarizer.maybe_schedule(conversation.id, len(conversation_history) + 2)
     
     return ChatResponse(
         message=character_response,
@@ -131,100 +110,229 @@ def get_conversations(db: Session = Depends(get_db)):
     return conversations
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationWithMessages)
-def get_conversation(conversation_id: int, db: Session = Depends(get_db)):
-    """Get a specific conversation with all messages"""
-    conversation = db.query(ConversationModel).filter(
-        ConversationModel.id == conversation_id,
-        ConversationModel.user_id == DEMO_USER_ID
-    ).first()
+async def get_conversation(
+    conversation_id: int,
+    limit: int = Query(PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific conversation with its most recent messages"""
+    chat_service = ChatService(db)
+    conversation = await chat_service.get_conversation(conversation_id, DEMO_USER_ID)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return conversation
+    messages, has_more = await chat_service.get_message_page(conversation_id, limit=limit)
+
+    return ConversationWithMessages(
+        id=conversation.id,
+        user_id=conversation.user_id,
+        character_id=conversation.character_id,
+        title=conversation.title,
+        is_active=conversation.is_active,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        messages=messages,
+        has_more_messages=has_more,
+        next_before_id=messages[0].id if has_more else None
+    )
+
+@router.get("/conversations/{conversation_id}/messages", response_model=MessagePage)
+async def get_conversation_messages(
+    conversation_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Page backwards through a conversation's history using a before_id cursor"""
+    chat_service = ChatService(db)
+
+    if not await chat_service.get_conversation(conversation_id, DEMO_USER_ID):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    messages, has_more = await chat_service.get_message_page(conversation_id, before_id, limit)
+
+    return MessagePage(
+        messages=messages,
+        has_more=has_more,
+        next_before_id=messages[0].id if has_more else None
+    )
 
 @router.post("/send", response_model=dict)
-def send_direct_message(
+async def send_direct_message(
     request: dict,
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """Send a direct message to a character (simplified endpoint for frontend)"""
-    openai_service = OpenAIService()
-
     message = request.get("message")
     character_id = request.get("character_id", 1)
     user_id = request.get("user_id", DEMO_USER_ID)
+    # Retries with the same key replay the first response instead of running the turn again
+    idempotency_key = idempotency_key or request.get("idempotency_key")
 
     if not message:
         raise HTTPException(status_code=400, detail="Message is required")
 
-    # Get character
-    character = db.query(CharacterModel).filter(
-        CharacterModel.id == character_id,
-        CharacterModel.is_active == True
-    ).first()
+    async def run_turn():
+        user_sent_at = datetime.now(timezone.utc)
+        chat_service = ChatService(db)
 
-    if not character:
-        raise HTTPException(status_code=404, detail="Character not found")
+        # Character, active conversation and recent history in one query
+        character, conversation, conversation_history, plan = await chat_service.load_direct_turn(user_id, character_id)
 
-    # Get or create conversation for this user and character
-    conversation = db.query(ConversationModel).filter(
-        ConversationModel.user_id == user_id,
-        ConversationModel.character_id == character_id,
-        ConversationModel.is_active == True
-    ).first()
+        if not character:
+            raise HTTPException(status_code=404, detail="Character not found")
 
-    if not conversation:
-        # Create new conversation
-        conversation = ConversationModel(
-            user_id=user_id,
-            character_id=character_id,
-            title=f"Chat with {character.display_name}"
+        # Generate character response; backend failures come back as the character's fallback line
+        character_response = await openai_service.generate_character_response_async(
+            character, conversation_history, message, user_id,
+            conversation_summary=conversation.summary if conversation else None, plan=plan
         )
-        db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
 
-    # Save user message
-    user_message = MessageModel(
-        conversation_id=conversation.id,
-        user_id=user_id,
-        character_id=character.id,
-        content=message,
-        sender_type="user"
+        # Both messages and the conversation bump in one transaction
+        conversation_id, user_message, character_message = await chat_service.save_turn(
+            character, conversation.id if conversation else None, user_id,
+            message, character_response, user_sent_at
+        )
+        memory_index.schedule([user_message, character_message])
+        conversation_summarizer.maybe_schedule(conversation_id, len(conversation_history) + 2)
+
+        return {
+            "response": character_response,
+            "character_name": character.display_name,
+            "conversation_id": conversation_id
+        }
+
+    # Double taps share one turn; other turns for this pair wait their go
+    try:
+        return await get_chat_turn_guard().run(user_id, character_id, message, idempotency_key, run_turn)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different message")
+
+async def _stream_turn_events(
+    openai_service: OpenAIService, character, conversation, conversation_history, message: str, user_id: int, plan=None
+):
+    """Yield ChatStreamEvents for one turn and persist it once the stream closes"""
+    started = time.perf_counter()
+    user_sent_at = datetime.now(timezone.utc)
+    time_to_first_token_ms = None
+    reply_parts = []
+
+    yield ChatStreamEvent(
+        event="start",
+        character_name=character.display_name,
+        conversation_id=conversation.id if conversation else None
     )
-    db.add(user_message)
-    db.commit()
 
-    # Get conversation history (last 10 messages for context)
-    conversation_history = db.query(MessageModel).filter(
-        MessageModel.conversation_id == conversation.id
-    ).order_by(MessageModel.created_at.desc()).limit(10).all()
-    conversation_history.reverse()  # Reverse to get chronological order
+    async def persist_turn():
+        # The request session may already be released, so the final write gets its own
+        async with AsyncSessionLocal() as session:
+            return await ChatService(session).save_turn(
+                character, conversation.id if conversation else None, user_id,
+                message, "".join(reply_parts).strip(), user_sent_at
+            )
 
-    # Generate character response
     try:
-        character_response = openai_service.generate_character_response(
-            character, conversation_history[:-1], message, user_id
-        )
-    except Exception as e:
-        print(f"OpenAI Error: {e}")  # Debug logging
-        # Fallback response if OpenAI fails
-        character_response = f"I'm having trouble thinking right now, but I'm still here for you! 💕"
+        async for delta in openai_service.stream_character_response(
+            character, conversation_history, message, user_id,
+            conversation_summary=conversation.summary if conversation else None, plan=plan
+        ):
+            if time_to_first_token_ms is None:
+                time_to_first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            reply_parts.append(delta)
+            yield ChatStreamEvent(event="delta", content=delta)
+    except BaseException:
+        # Client went away mid-stream; keep the user message and whatever was already shown
+        await asyncio.shield(persist_turn())
+        raise
 
-    # Save character message
-    character_message = MessageModel(
-        conversation_id=conversation.id,
-        user_id=user_id,
-        character_id=character.id,
-        content=character_response,
-        sender_type="character"
+    conversation_id, user_message, character_message = await persist_turn()
+    # A blank reply isn't saved, so there may be no character message
+    saved = [message for message in (user_message, character_message) if message is not None]
+    memory_index.schedule(saved)
+    conversation_summarizer.maybe_schedule(conversation_id, len(conversation_history) + len(saved))
+
+    yield ChatStreamEvent(
+        event="done",
+        content=character_message.content if character_message else "",
+        character_name=character.display_name,
+        conversation_id=conversation_id,
+        message_id=character_message.id if character_message else None,
+        time_to_first_token_ms=time_to_first_token_ms,
+        total_time_ms=round((time.perf_counter() - started) * 1000, 1)
     )
-    db.add(character_message)
-    db.commit()
 
-    return {
-        "response": character_response,
-        "character_name": character.display_name,
-        "conversation_id": conversation.id
-    }
+@router.post("/stream")
+async def stream_direct_message(
+    chat_request: DirectChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    openai_service: OpenAIService = Depends(get_openai_service)
+):
+    """Send a direct message and stream the character response as Server-Sent Events"""
+    if not chat_request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    character, conversation, conversation_history, plan = await ChatService(db).load_direct_turn(
+        chat_request.user_id, chat_request.character_id
+    )
+
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+
+    async def event_source():
+        nonlocal conversation, conversation_history, plan
+        async with get_chat_turn_guard().lock(chat_request.user_id, chat_request.character_id):
+            if conversation is None:
+                # A turn that held the lock before us may have just created the conversation
+                async with AsyncSessionLocal() as session:
+                    _, conversation, conversation_history, plan = await ChatService(session).load_direct_turn(
+                        chat_request.user_id, chat_request.character_id
+                    )
+
+            async for event in _stream_turn_events(
+                openai_service, character, conversation, conversation_history,
+                chat_request.message, chat_request.user_id, plan
+            ):
+                yield f"event: {event.event}\ndata: {event.model_dump_json(exclude_none=True)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    openai_service: OpenAIService = Depends(get_openai_service)
+):
+    """Stream character responses over a WebSocket, one DirectChatRequest JSON per turn"""
+    await websocket.accept()
+
+    try:
+        while True:
+            try:
+                chat_request = DirectChatRequest(**json.loads(await websocket.receive_text()))
+            except (ValueError, TypeError) as e:
+                await websocket.send_text(ChatStreamEvent(event="error", content=str(e)).model_dump_json(exclude_none=True))
+                continue
+
+            async with get_chat_turn_guard().lock(chat_request.user_id, chat_request.character_id):
+                async with AsyncSessionLocal() as db:
+                    character, conversation, conversation_history, plan = await ChatService(db).load_direct_turn(
+                        chat_request.user_id, chat_request.character_id
+                    )
+
+                if not character:
+                    await websocket.send_text(ChatStreamEvent(event="error", content="Character not found").model_dump_json(exclude_none=True))
+                    continue
+
+                async for event in _stream_turn_events(
+                    openai_service, character, conversation, conversation_history,
+                    chat_request.message, chat_request.user_id, plan
+                ):
+                    await websocket.send_text(event.model_dump_json(exclude_none=True))
+    except WebSocketDisconnect:
+        pass
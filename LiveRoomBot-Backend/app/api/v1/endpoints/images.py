@@ -0,0 +1,91 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db
+from app.core.media_response import REVALIDATE_CACHE_CONTROL, media_file_response
+from app.models.character import Character as CharacterModel
+from app.schemas.image import ImageRequest
+from app.services.image_jobs import ImageJob, ImageQueueFull, image_job_queue
+from app.services.image_service import ImageGenerationService, get_image_service
+
+router = APIRouter()
+
+# Seconds between keep-alive comments on an idle job event stream
+EVENT_KEEPALIVE_SECONDS = 15
+
+def _get_job(job_id: str, user_id: int) -> ImageJob:
+    # Someone else's job is reported as missing, not forbidden
+    job = image_job_queue.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job
+
+@router.post("/jobs", status_code=202)
+async def submit_image_job(
+    request: ImageRequest,
+    db: AsyncSession = Depends(get_async_db),
+    image_service: ImageGenerationService = Depends(get_image_service)
+):
+    """Queue an image generation and return its job; poll it or follow its events"""
+    if not image_service.api_key:
+        raise HTTPException(status_code=503, detail="Image generation service not configured")
+
+    character = await db.get(CharacterModel, request.character_id)
+    if not character or not character.is_active:
+        raise HTTPException(status_code=404, detail="Character not found")
+
+    try:
+        job = image_job_queue.submit(request.prompt, character, request.user_id, request.style)
+    except ImageQueueFull:
+        raise HTTPException(status_code=503, detail="Too many images are being generated, try again shortly")
+    return job.as_dict()
+
+@router.get("/jobs/{job_id}")
+def get_image_job(job_id: str, user_id: int = 1):
+    """Current status of one of the user's image jobs, with its result once finished"""
+    return _get_job(job_id, user_id).as_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def image_job_events(job_id: str, user_id: int = 1):
+    """Follow one of the user's image jobs as Server-Sent Events until it finishes"""
+    job = _get_job(job_id, user_id)
+
+    async def event_source():
+        while True:
+            yield f"event: {job.status}\ndata: {json.dumps(job.as_dict())}\n\n"
+            if job.finished:
+                return
+            while not await job.wait_for_change(EVENT_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/view/{filename}")
+def view_image(request: Request, filename: str, image_service: ImageGenerationService = Depends(get_image_service)):
+    """Serve a generated image from the cache (supports Range and conditional requests)"""
+    file_path = image_service.get_image_path(filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Images are keyed by prompt and a regenerated one reuses the name, so clients must revalidate
+    return media_file_response(
+        request,
+        file_path,
+        media_type="image/png" if file_path.suffix == ".png" else "image/jpeg",
+        cache_control=REVALIDATE_CACHE_CONTROL
+    )
+
+@router.get("/styles")
+def get_image_styles(image_service: ImageGenerationService = Depends(get_image_service)):
+    """Available image styles"""
+    return image_service.get_style_options()
+
+@router.get("/cache/stats")
+def get_image_cache_stats(image_service: ImageGenerationService = Depends(get_image_service)):
+    """Image cache size and the job queue"""
+    return {"cache": image_service.get_cache_stats(), "jobs": image_job_queue.stats()}
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db
+from app.core.media_response import media_file_response
+from app.models.character import Character as CharacterModel
+from app.schemas.voice import VoiceRequest
+from app.services.voice_service import VoiceService, VoiceSynthesisError, get_voice_service
+
+router = APIRouter()
+
+async def _get_character(db: AsyncSession, character_id: int) -> CharacterModel:
+    character = await db.get(CharacterModel, character_id)
+    if not character or not character.is_active:
+        raise HTTPException(status_code=404, detail="Character not found")
+    return character
+
+@router.get("/characters")
+def get_character_voices(voice_service: VoiceService = Depends(get_voice_service)):
+    """Voices used by each character"""
+    return voice_service.get_all_character_voices()
+
+@router.post("/generate")
+async def generate_voice(
+    request: VoiceRequest,
+    db: AsyncSession = Depends(get_async_db),
+    voice_service: VoiceService = Depends(get_voice_service)
+):
+    """Synthesize a character line into the cache and return its audio URL"""
+    character = await _get_character(db, request.character_id)
+    return await voice_service.generate_voice_message(request.text, character)
+
+@router.post("/stream")
+async def stream_voice(
+    request: VoiceRequest,
+    db: AsyncSession = Depends(get_async_db),
+    voice_service: VoiceService = Depends(get_voice_service)
+):
+    """Stream a character line as MP3 while ElevenLabs generates it"""
+    if not voice_service.api_key:
+        raise HTTPException(status_code=503, detail="Voice service not configured")
+    character = await _get_character(db, request.character_id)
+
+    chunks = voice_service.stream_voice_message(request.text, character)
+    # Wait for the first chunk so a failed synthesis is still a proper error response
+    try:
+        first_chunk = await chunks.__anext__()
+    except (VoiceSynthesisError, StopAsyncIteration):
+        raise HTTPException(status_code=502, detail="Failed to generate voice")
+
+    async def audio():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+@router.get("/audio/{filename}")
+def get_voice_audio(request: Request, filename: str, voice_service: VoiceService = Depends(get_voice_service)):
+    """Serve a cached voice message (supports Range and conditional requests)"""
+    file_path = voice_service.get_voice_path(filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Voice message not found")
+    return media_file_response(request, file_path, media_type="audio/mpeg")
+
+@router.get("/cache/stats")
+def get_voice_cache_stats(voice_service: VoiceService = Depends(get_voice_service)):
+    """Voice cache size"""
+    return voice_service.get_cache_stats()
@@ -8,14 +8,92 @@ load_dotenv()
 class Settings:
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./liveroom.db")
-    
+    # Derived from DATABASE_URL when empty; for asyncpg, ?sslmode= is passed on as its ssl argument
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    OPENAI_HTTP2: bool = os.getenv("OPENAI_HTTP2", "True").lower() == "true"
+
+    # LLM scheduler (adaptive concurrency and priority lanes in front of the API)
+    LLM_INITIAL_CONCURRENCY: int = int(os.getenv("LLM_INITIAL_CONCURRENCY", "16"))
+    LLM_MIN_CONCURRENCY: int = int(os.getenv("LLM_MIN_CONCURRENCY", "2"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "128"))
+    LLM_LATENCY_TARGET_SECONDS: float = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "8"))
+    LLM_QUEUE_MAX_WAITING: int = int(os.getenv("LLM_QUEUE_MAX_WAITING", "200"))  # Per lane
+    LLM_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "20"))
+
+    # LLM backends: "openai", "local" (OpenAI-compatible server) or "fake" (in-process)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
+    LLM_PROVIDER_BY_PLAN: str = os.getenv("LLM_PROVIDER_BY_PLAN", "")  # e.g. "free:local"
+    LLM_PROVIDER_BY_CHARACTER: str = os.getenv("LLM_PROVIDER_BY_CHARACTER", "")  # e.g. "luna:openai"
+    LOCAL_LLM_BASE_URL: str = os.getenv("LOCAL_LLM_BASE_URL", "")  # e.g. http://localhost:8080/v1
+    LOCAL_LLM_API_KEY: str = os.getenv("LOCAL_LLM_API_KEY", "local")
+    LOCAL_LLM_MODEL: str = os.getenv("LOCAL_LLM_MODEL", "")  # Empty keeps the routed model name
+    FAKE_LLM_LATENCY_SECONDS: float = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0"))
+    FAKE_LLM_TOKENS_PER_SECOND: float = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))  # 0 = instant
+
+    # Model routing per turn
+    ROUTER_SHORT_MODEL: str = os.getenv("ROUTER_SHORT_MODEL", "gpt-4.1-nano")
+    ROUTER_STANDARD_MODEL: str = os.getenv("ROUTER_STANDARD_MODEL", "gpt-4o-mini")
+    ROUTER_PREMIUM_MODEL: str = os.getenv("ROUTER_PREMIUM_MODEL", "gpt-4o-mini")
+    ROUTER_SHORT_MESSAGE_TOKENS: int = int(os.getenv("ROUTER_SHORT_MESSAGE_TOKENS", "12"))  # At most this is "short"
+    ROUTER_SHORT_MAX_REPLY_TOKENS: int = int(os.getenv("ROUTER_SHORT_MAX_REPLY_TOKENS", "200"))
+    ROUTER_LONG_MESSAGE_TOKENS: int = int(os.getenv("ROUTER_LONG_MESSAGE_TOKENS", "120"))  # PRO premium from here
+    ROUTER_CHARACTER_ROUTES: str = os.getenv("ROUTER_CHARACTER_ROUTES", "")  # e.g. "astro_baba:premium"
+
+    # LLM circuit breaker and hedged requests
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "10"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "50"))  # Before p95 is trusted
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+
+    # Chat context
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # Prompt tokens per request
+    CONTEXT_HISTORY_MAX_MESSAGES: int = int(os.getenv("CONTEXT_HISTORY_MAX_MESSAGES", "40"))  # Rows fetched to fill it
+
+    # Conversation summaries (long-term memory)
+    SUMMARY_MODEL: str = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+    SUMMARY_MAX_TOKENS: int = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+    SUMMARY_WORKERS: int = int(os.getenv("SUMMARY_WORKERS", "2"))
+    SUMMARY_KEEP_RECENT_MESSAGES: int = int(os.getenv("SUMMARY_KEEP_RECENT_MESSAGES", "20"))  # Stay verbatim
+    SUMMARY_MIN_NEW_MESSAGES: int = int(os.getenv("SUMMARY_MIN_NEW_MESSAGES", "20"))
+
+    # Semantic memory (embedding index over past messages, opt-in: recall embeds every user message)
+    MEMORY_INDEX_ENABLED: bool = os.getenv("MEMORY_INDEX_ENABLED", "False").lower() == "true"
+    MEMORY_INDEX_DIR: str = os.getenv("MEMORY_INDEX_DIR", "memory_index")
+    MEMORY_INDEX_BACKEND: str = os.getenv("MEMORY_INDEX_BACKEND", "numpy")  # "numpy" or "hnsw"
+    MEMORY_EMBEDDER: str = os.getenv("MEMORY_EMBEDDER", "openai")  # "openai" or "hashing"
+    MEMORY_EMBEDDING_MODEL: str = os.getenv("MEMORY_EMBEDDING_MODEL", "text-embedding-3-small")
+    MEMORY_EMBEDDING_DIM: int = int(os.getenv("MEMORY_EMBEDDING_DIM", "256"))
+    MEMORY_BATCH_SIZE: int = int(os.getenv("MEMORY_BATCH_SIZE", "64"))
+    MEMORY_TOP_K: int = int(os.getenv("MEMORY_TOP_K", "4"))
+    MEMORY_MIN_SCORE: float = float(os.getenv("MEMORY_MIN_SCORE", "0.35"))
+
+    # Response cache for repeated openers (opt-in)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    RESPONSE_CACHE_POOL_SIZE: int = int(os.getenv("RESPONSE_CACHE_POOL_SIZE", "5"))  # Replies per key
+    RESPONSE_CACHE_MAX_HISTORY: int = int(os.getenv("RESPONSE_CACHE_MAX_HISTORY", "0"))  # 0 = first messages only
 
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     TELEGRAM_WEBHOOK_URL: str = os.getenv("TELEGRAM_WEBHOOK_URL", "")
 
+    # Telegram chat sessions ("memory" or "redis"); idle sessions expire after the TTL
+    TELEGRAM_SESSION_BACKEND: str = os.getenv("TELEGRAM_SESSION_BACKEND", "memory")
+    TELEGRAM_SESSION_TTL_SECONDS: int = int(os.getenv("TELEGRAM_SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+    TELEGRAM_SESSION_MAX_ENTRIES: int = int(os.getenv("TELEGRAM_SESSION_MAX_ENTRIES", "10000"))
+    TELEGRAM_SESSION_HISTORY_LENGTH: int = int(os.getenv("TELEGRAM_SESSION_HISTORY_LENGTH", "20"))
+
     # Payment Gateway (UPI)
     UPI_MERCHANT_ID: str = os.getenv("UPI_MERCHANT_ID", "LIVEROOM001")
     UPI_MERCHANT_KEY: str = os.getenv("UPI_MERCHANT_KEY", "test_key_123")
@@ -25,9 +103,26 @@ class Settings:
 
     # Text-to-Speech (for voice messages)
     ELEVENLABS_API_KEY: str = os.getenv("ELEVENLABS_API_KEY", "")
+    ELEVENLABS_BASE_URL: str = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
+    ELEVENLABS_MODEL_ID: str = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
+    ELEVENLABS_TIMEOUT_SECONDS: float = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "30"))
+    ELEVENLABS_MAX_CONNECTIONS: int = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "20"))
+    ELEVENLABS_STREAMING_LATENCY: int = int(os.getenv("ELEVENLABS_STREAMING_LATENCY", "2"))  # 0 (best quality) to 4 (fastest)
+    TTS_CHUNK_MAX_CHARS: int = int(os.getenv("TTS_CHUNK_MAX_CHARS", "250"))  # Longer replies are synthesized in parallel chunks
+    TTS_WARMUP_ON_STARTUP: bool = os.getenv("TTS_WARMUP_ON_STARTUP", "False").lower() == "true"
+    TTS_WARMUP_CONCURRENCY: int = int(os.getenv("TTS_WARMUP_CONCURRENCY", "4"))
 
     # Image Generation
     DALLE_API_KEY: str = os.getenv("DALLE_API_KEY", "")  # Usually same as OpenAI key
+    IMAGE_JOB_WORKERS: int = int(os.getenv("IMAGE_JOB_WORKERS", "4"))
+    IMAGE_JOB_MAX_QUEUED: int = int(os.getenv("IMAGE_JOB_MAX_QUEUED", "100"))
+    IMAGE_JOB_TTL_SECONDS: float = float(os.getenv("IMAGE_JOB_TTL_SECONDS", "3600"))
+
+    # Generated media caches (voice_cache/, image_cache/)
+    VOICE_CACHE_MAX_MB: float = float(os.getenv("VOICE_CACHE_MAX_MB", "500"))
+    IMAGE_CACHE_MAX_MB: float = float(os.getenv("IMAGE_CACHE_MAX_MB", "1000"))
+    MEDIA_CACHE_POLICY: str = os.getenv("MEDIA_CACHE_POLICY", "lru")  # lru or lfu
+    MEDIA_CACHE_INDEX_FLUSH_SECONDS: float = float(os.getenv("MEDIA_CACHE_INDEX_FLUSH_SECONDS", "30"))
     
     # JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -36,6 +131,15 @@ class Settings:
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+    # Character moods ("memory" or "redis")
+    MOOD_STORE_BACKEND: str = os.getenv("MOOD_STORE_BACKEND", "memory")
+    MOOD_STORE_MAX_ENTRIES: int = int(os.getenv("MOOD_STORE_MAX_ENTRIES", "100000"))
+
+    # Chat turn lock and idempotency replay ("memory" or "redis")
+    CHAT_TURN_LOCK_BACKEND: str = os.getenv("CHAT_TURN_LOCK_BACKEND", "memory")
+    CHAT_TURN_LOCK_TIMEOUT_SECONDS: float = float(os.getenv("CHAT_TURN_LOCK_TIMEOUT_SECONDS", "60"))
+    IDEMPOTENCY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
     
     # Application
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
@@ -1,4 +1,8 @@
-from sqlalchemy import create_engine
+import threading
+from typing import Dict, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -12,6 +16,103 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+# libpq options asyncpg has no equivalent for
+_LIBPQ_ONLY_PARAMS = ("channel_binding", "gssencmode")
+
+def _async_engine_target(url: str) -> Tuple[URL, Dict]:
+    """The async URL and connect args; asyncpg takes sslmode as its ssl argument
+
+    asyncpg rejects libpq query parameters, so ?sslmode=require (as hosted
+    Postgres URLs usually carry) is moved to connect_args and the options
+    asyncpg doesn't know are dropped.
+    """
+    parsed = make_url(url)
+    connect_args = {}
+    if parsed.drivername == "postgresql+asyncpg":
+        query = dict(parsed.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            # asyncpg accepts the libpq mode names: disable, prefer, require, verify-full, ...
+            connect_args["ssl"] = sslmode
+        for param in _LIBPQ_ONLY_PARAMS:
+            query.pop(param, None)
+        parsed = parsed.set(query=query)
+    return parsed, connect_args
+
+_async_url, _async_connect_args = _async_engine_target(
+    settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL)
+)
+
+# Async engine used by the chat hot path (LLM calls must not pin a threadpool worker)
+async_engine = create_async_engine(
+    _async_url,
+    echo=settings.DEBUG,
+    connect_args=_async_connect_args,
+)
+
+# Objects stay usable after commit so responses can be built without a reload
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+class PoolGauge:
+    """Tracks connections checked out of an engine's pool so leaks show up in /health"""
+
+    def __init__(self, name: str, sync_engine):
+        self.name = name
+        self.pool = sync_engine.pool
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.total_checkouts = 0
+        self._lock = threading.Lock()
+        event.listen(sync_engine, "checkout", self._on_checkout)
+        event.listen(sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checked_out += 1
+            self.total_checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self) -> Dict:
+        status = {
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "total_checkouts": self.total_checkouts,
+            "pool_class": type(self.pool).__name__,
+        }
+        # Only QueuePool-style pools have a fixed size and overflow
+        if hasattr(self.pool, "size"):
+            status["pool_size"] = self.pool.size()
+            status["overflow"] = self.pool.overflow()
+        return status
+
+pool_gauges = [
+    PoolGauge("sync", engine),
+    PoolGauge("async", async_engine.sync_engine),
+]
+
+def get_pool_status() -> Dict:
+    """Connection pool usage for every engine"""
+    return {gauge.name: gauge.snapshot() for gauge in pool_gauges}
+
 # Create base class for models
 Base = declarative_base()
 
@@ -22,3 +123,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
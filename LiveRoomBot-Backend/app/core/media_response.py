@@ -0,0 +1,105 @@
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# For files named by a hash of what they render, where a URL never changes meaning
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# For files whose bytes can change under the same name; the ETag keeps the check to a 304
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _etag(path: Path, stat_result: os.stat_result) -> str:
+    # A re-rendered file under the same key gets a new tag, so ranges never mix two renders
+    return f'"{path.stem}-{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison and may list several tags"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range; None to serve the whole file
+
+    Raises ValueError when the range can't be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple ranges or another unit: a full response is always allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+async def _read_range(path: Path, start: int, length: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+def media_file_response(
+    request: Request, path: Path, media_type: Optional[str] = None, cache_control: str = IMMUTABLE_CACHE_CONTROL
+) -> Response:
+    """Serve a cached media file with ETag, 304s, byte ranges and Cache-Control
+
+    The body is streamed from disk in chunks, so memory per download stays
+    constant whatever the file size.
+    """
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        # Evicted between the cache lookup and now
+        raise HTTPException(status_code=404, detail="Media file not found")
+    size = stat_result.st_size
+    etag = _etag(path, stat_result)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _read_range(path, start, end - start + 1),
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)}
+            )
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
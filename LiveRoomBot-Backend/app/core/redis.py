@@ -0,0 +1,19 @@
+from typing import Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_async_redis_client = None
+
+def get_async_redis():
+    """Return the shared asyncio Redis client, or None if the redis package is not installed"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        try:
+            import redis.asyncio
+        except ImportError:
+            logger.warning("redis package not installed, Redis-backed features are unavailable")
+            return None
+        _async_redis_client = redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_redis_client
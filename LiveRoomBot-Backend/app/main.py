@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 # from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -6,8 +8,21 @@ from dotenv import load_dotenv
 
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.core.database import engine
+from app.core.database import engine, get_pool_status
 from app.models import Base
+from app.services.openai_service import get_openai_service, close_openai_service
+from app.services.summary_service import conversation_summarizer
+from app.services.memory_index import memory_index
+from app.services.response_cache import response_cache
+from app.services.turn_guard import get_chat_turn_guard
+from app.services.llm_scheduler import llm_scheduler_stats
+from app.services.circuit_breaker import circuit_breaker_stats
+from app.services.model_router import get_model_router
+from app.services.voice_service import close_voice_service
+from app.services.media_cache import media_cache_stats, start_media_cache_flusher, stop_media_cache_flusher
+from app.services.image_jobs import image_job_queue
+from app.services.image_service import close_image_service
+from app.services.voice_warmup import warm_voice_cache
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +30,30 @@ load_dotenv()
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared OpenAI client up front so the first chat request doesn't pay for it
+    get_openai_service()
+    await conversation_summarizer.start()
+    await memory_index.start()
+    await image_job_queue.start()
+    await start_media_cache_flusher()
+    # Pre-synthesize fixed character lines in the background; startup doesn't wait for it
+    warmup = asyncio.create_task(warm_voice_cache()) if settings.TTS_WARMUP_ON_STARTUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+    await image_job_queue.stop()
+    await memory_index.stop()
+    await conversation_summarizer.stop()
+    await close_openai_service()
+    await close_voice_service()
+    await close_image_service()
+    await stop_media_cache_flusher()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="LiveRoom Backend API",
     description="Backend API for LiveRoom AI Companion Platform",
     version="1.0.0",
@@ -64,7 +102,18 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "liveroom-backend"}
+    return {
+        "status": "healthy",
+        "service": "liveroom-backend",
+        "database_pool": get_pool_status(),
+        "response_cache": response_cache.stats(),
+        "chat_turns": get_chat_turn_guard().stats(),
+        "llm_schedulers": llm_scheduler_stats(),
+        "circuit_breakers": circuit_breaker_stats(),
+        "model_routes": get_model_router().stats(),
+        "media_caches": media_cache_stats(),
+        "image_jobs": image_job_queue.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_id_character_id_is_active", "user_id", "character_id", "is_active"),  # get-or-create lookup
+        Index("ix_conversations_user_id_is_active_updated_at", "user_id", "is_active", "updated_at"),  # conversation list
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -14,6 +18,11 @@ class Conversation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Long-term memory: rolling summary of every message up to summary_message_id
+    summary = Column(Text)
+    summary_message_id = Column(Integer)
+    summary_updated_at = Column(DateTime(timezone=True))
+    
     # Relationships
     user = relationship("User", back_populates="conversations")
     character = relationship("Character", back_populates="conversations")
@@ -21,6 +30,10 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),  # history reads
+        Index("ix_messages_character_id_created_at", "character_id", "created_at"),  # per-character stats
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
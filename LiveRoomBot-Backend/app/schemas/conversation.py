@@ -39,11 +39,18 @@ class Conversation(ConversationBase):
         from_attributes = True
 
 class ConversationWithMessages(Conversation):
-    messages: List[Message] = []
+    messages: List[Message] = []  # Most recent page only, oldest first
+    has_more_messages: bool = False
+    next_before_id: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    messages: List[Message] = []  # Oldest first
+    has_more: bool = False
+    next_before_id: Optional[int] = None  # Pass as before_id to fetch the previous page
+
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[int] = None
@@ -53,3 +60,17 @@ class ChatResponse(BaseModel):
     character_name: str
     conversation_id: int
     message_id: int
+
+class DirectChatRequest(BaseModel):
+    message: str
+    character_id: int = 1
+    user_id: int = 1
+
+class ChatStreamEvent(BaseModel):
+    event: str  # "start", "delta", "done" or "error"
+    content: str = ""
+    character_name: Optional[str] = None
+    conversation_id: Optional[int] = None
+    message_id: Optional[int] = None
+    time_to_first_token_ms: Optional[float] = None
+    total_time_ms: Optional[float] = None
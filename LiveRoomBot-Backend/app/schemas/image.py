@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+class ImageRequest(BaseModel):
+    prompt: str
+    character_id: int
+    user_id: int = 1
+    style: str = "realistic"
@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+
+class VoiceRequest(BaseModel):
+    text: str
+    character_id: int
@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.core.config import settings
+from app.models.character import Character
+from app.models.conversation import Conversation, Message
+from app.models.user import SubscriptionPlan, User
+
+HISTORY_LIMIT = settings.CONTEXT_HISTORY_MAX_MESSAGES
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 100
+
+class ChatService:
+    """Reads and writes for a chat turn, kept to one query and one transaction"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def load_direct_turn(
+        self, user_id: int, character_id: int, history_limit: int = HISTORY_LIMIT
+    ) -> Tuple[Optional[Character], Optional[Conversation], List[Message], Optional[SubscriptionPlan]]:
+        """Fetch the character, the active conversation, its recent history and the user's plan in one query
+
+        The read transaction is committed before returning, so the session gives
+        its connection back to the pool while the reply is generated.
+        """
+        active = aliased(Conversation)
+        conversation_id = (
+            select(active.id)
+            .where(active.user_id == user_id, active.character_id == character_id, active.is_active == True)
+            .order_by(active.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        recent = self._recent_messages(conversation_id, history_limit)
+        return await self._load_turn(
+            select(Character, Conversation, recent, self._plan_column(user_id))
+            .select_from(Character)
+            .outerjoin(Conversation, Conversation.id == conversation_id)
+            .outerjoin(recent, recent.conversation_id == Conversation.id)
+            .where(Character.id == character_id, Character.is_active == True)
+            .order_by(recent.created_at, recent.id)
+        )
+
+    async def load_conversation_turn(
+        self, conversation_id: int, user_id: int, history_limit: int = HISTORY_LIMIT
+    ) -> Tuple[Optional[Character], Optional[Conversation], List[Message], Optional[SubscriptionPlan]]:
+        """Fetch a user's conversation, its character, recent history and the user's plan in one query"""
+        recent = self._recent_messages(conversation_id, history_limit)
+        return await self._load_turn(
+            select(Character, Conversation, recent, self._plan_column(user_id))
+            .select_from(Conversation)
+            .join(Character, Character.id == Conversation.character_id)
+            .outerjoin(recent, recent.conversation_id == Conversation.id)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .order_by(recent.created_at, recent.id)
+        )
+
+    async def _load_turn(self, query) -> Tuple[Optional[Character], Optional[Conversation], List[Message], Optional[SubscriptionPlan]]:
+        rows = (await self.db.execute(query)).all()
+        # End the read so the pooled connection isn't held through the LLM call
+        await self.db.commit()
+
+        if not rows:
+            return None, None, [], None
+
+        return self._split_rows(rows)
+
+    @staticmethod
+    def _plan_column(user_id: int):
+        """The user's subscription plan, which picks their LLM priority lane"""
+        return select(User.subscription_plan).where(User.id == user_id).scalar_subquery()
+
+    @staticmethod
+    def _split_rows(rows) -> Tuple[Character, Conversation, List[Message], Optional[SubscriptionPlan]]:
+        character, conversation, _, plan = rows[0]
+        history = [message for _, _, message, _ in rows if message is not None]
+        # Messages already folded into the summary reach the model through it instead
+        if conversation is not None and conversation.summary_message_id:
+            history = [message for message in history if message.id > conversation.summary_message_id]
+        return character, conversation, history, plan
+
+    @staticmethod
+    def _recent_messages(conversation_id, history_limit: int):
+        """The conversation's newest history_limit messages, as a derived table to join on
+
+        Not correlated with the outer query, so the (conversation_id, created_at)
+        index is read newest first and stops after history_limit rows.
+        """
+        recent = (
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(history_limit)
+            .subquery("recent_messages")
+        )
+        return aliased(Message, recent)
+
+    async def get_conversation(self, conversation_id: int, user_id: int) -> Optional[Conversation]:
+        return (await self.db.execute(
+            select(Conversation).where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+        )).scalars().first()
+
+    async def get_message_page(
+        self, conversation_id: int, before_id: Optional[int] = None, limit: int = PAGE_LIMIT
+    ) -> Tuple[List[Message], bool]:
+        """Keyset page of messages older than before_id, returned oldest first"""
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+        query = select(Message).where(Message.conversation_id == conversation_id)
+
+        if before_id is not None:
+            # Seek on (created_at, id) so the (conversation_id, created_at) index serves every page
+            cursor_created_at = (
+                select(Message.created_at).where(Message.id == before_id).scalar_subquery()
+            )
+            query = query.where(tuple_(Message.created_at, Message.id) < tuple_(cursor_created_at, before_id))
+
+        # One extra row tells us whether an older page exists
+        messages = list((await self.db.execute(
+            query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+        )).scalars().all())
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        messages.reverse()
+        return messages, has_more
+
+    async def save_turn(
+        self,
+        character: Character,
+        conversation_id: Optional[int],
+        user_id: int,
+        user_content: str,
+        reply_content: Optional[str],
+        user_sent_at: datetime
+    ) -> Tuple[int, Message, Optional[Message]]:
+        """Write both messages and bump the conversation in a single transaction"""
+        now = datetime.now(timezone.utc)
+
+        if conversation_id is None:
+            conversation = Conversation(
+                user_id=user_id,
+                character_id=character.id,
+                title=f"Chat with {character.display_name}",
+                updated_at=now
+            )
+            self.db.add(conversation)
+            await self.db.flush()
+            conversation_id = conversation.id
+        else:
+            await self.db.execute(
+                update(Conversation).where(Conversation.id == conversation_id).values(updated_at=now)
+            )
+
+        # Explicit timestamps keep the pair ordered even though both land in one transaction
+        user_message = Message(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            character_id=character.id,
+            content=user_content,
+            sender_type="user",
+            created_at=user_sent_at
+        )
+        messages = [user_message]
+
+        character_message = None
+        if reply_content:
+            character_message = Message(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                character_id=character.id,
+                content=reply_content,
+                sender_type="character",
+                created_at=now
+            )
+            messages.append(character_message)
+
+        # Flushed together, so both rows go out as one multi-row INSERT
+        self.db.add_all(messages)
+        await self.db.commit()
+
+        return conversation_id, user_message, character_message
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """The upstream is considered down; fail fast instead of waiting on it"""
+
+class CircuitBreaker:
+    """Trips after N consecutive failed or slow calls, then half-opens to probe
+
+    closed: calls pass; failures and calls slower than slow_call_seconds count
+    towards failure_threshold, any fast success resets the count.
+    open: calls fail immediately with CircuitOpenError for reset_seconds.
+    half_open: up to half_open_max_calls probes pass; one success closes the
+    circuit, one failure opens it again. A probe that never reports back
+    (e.g. its caller was cancelled) gives up its slot after reset_seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: float = 10.0,
+        reset_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        excluded_exceptions: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.half_open_max_calls = half_open_max_calls
+        # Errors that say nothing about upstream health (e.g. our own load shedding)
+        self.excluded_exceptions = excluded_exceptions
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        # Start times of the probes still out in half_open
+        self._probes: deque = deque()
+        self.rejected = 0
+        self.trips = 0
+
+    def reject_if_open(self):
+        """Raise CircuitOpenError while the circuit is open, without taking a probe
+
+        Lets callers fail fast before queueing for a call they can't make.
+        """
+        if self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_seconds:
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            self.reject_if_open()
+            self.state = self.HALF_OPEN
+            self._probes.clear()
+            logger.info(f"{self.name} circuit half-open, probing")
+
+        if self.state == self.HALF_OPEN:
+            while self._probes and now - self._probes[0] >= self.reset_seconds:
+                self._probes.popleft()
+            if len(self._probes) >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is probing")
+            self._probes.append(now)
+
+    def record_success(self, latency: float):
+        if latency > self.slow_call_seconds:
+            # Slow successes still get used, but they count as degradation
+            self.record_failure()
+            return
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_ignored(self):
+        """The call ended without telling us anything about the upstream; free its probe"""
+        if self.state == self.HALF_OPEN and self._probes:
+            self._probes.popleft()
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(f"{self.name} circuit open after {self.consecutive_failures} failed or slow calls")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except self.excluded_exceptions:
+            self.record_ignored()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: the upstream never answered either way
+            self.record_ignored()
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for percentile-based hedging"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def observe(self, latency: float):
+        self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+async def hedged(fn: Callable[[], Awaitable[T]], delay: Optional[float]) -> Tuple[T, bool]:
+    """Run fn; if it hasn't finished after delay, run it again and take the first success
+
+    Returns (result, hedge_fired). The slower call is cancelled once one
+    succeeds; if both fail, the last error is raised.
+    """
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        if delay is None:
+            return await tasks[0], False
+
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result(), False
+
+        tasks.append(asyncio.ensure_future(fn()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_circuit_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Return the process-wide breaker for an upstream, creating it from settings"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        options = {
+            "failure_threshold": settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            "slow_call_seconds": settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+            "reset_seconds": settings.LLM_BREAKER_RESET_SECONDS,
+        }
+        options.update(kwargs)
+        breaker = _breakers[name] = CircuitBreaker(name, **options)
+    return breaker
+
+def circuit_breaker_stats() -> Dict[str, Dict]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
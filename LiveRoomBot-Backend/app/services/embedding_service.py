@@ -0,0 +1,89 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def _normalize(vectors):
+    """Scale rows to unit length so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+class Embedder(ABC):
+    """Turns texts into unit-length float32 vectors of a fixed dimension"""
+
+    name: str = "embedder"
+    dim: int = 0
+
+    @abstractmethod
+    async def embed(self, texts: List[str]):
+        ...
+
+class HashingEmbedder(Embedder):
+    """Deterministic bag-of-words embedder that needs no network (tests, local dev)"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed_one(self, text: str, out):
+        words = _WORD_RE.findall(text.lower())
+        # Words plus adjacent pairs, so "not good" differs from "good"
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            out[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+    async def embed(self, texts: List[str]):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(vectors, texts):
+            self._embed_one(text, row)
+        return _normalize(vectors)
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings from the OpenAI API, one request per batch"""
+
+    def __init__(self, client, model: str, dim: int):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self.name = f"{model}-{dim}"
+
+    async def embed(self, texts: List[str]):
+        response = await self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        vectors = np.array([item.embedding for item in sorted(response.data, key=lambda item: item.index)], dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings from {self.model}, got {vectors.shape[1]}")
+        return _normalize(vectors)
+
+_embedder: Optional[Embedder] = None
+
+def get_embedder() -> Optional[Embedder]:
+    """Return the configured embedder, or None when NumPy isn't installed"""
+    global _embedder
+    if np is None:
+        return None
+    if _embedder is None:
+        client = None
+        if settings.MEMORY_EMBEDDER == "openai":
+            # Import here to avoid circular imports
+            from app.services.openai_service import get_openai_service
+            client = get_openai_service().async_client
+            if client is None:
+                logger.warning("No OpenAI client for embeddings, using the hashing embedder")
+        if client is not None:
+            _embedder = OpenAIEmbedder(client, settings.MEMORY_EMBEDDING_MODEL, settings.MEMORY_EMBEDDING_DIM)
+        else:
+            _embedder = HashingEmbedder(settings.MEMORY_EMBEDDING_DIM)
+    return _embedder
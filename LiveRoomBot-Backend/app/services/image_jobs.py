@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.character import Character
+from app.services.image_service import get_image_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ImageQueueFull(Exception):
+    """Too many image jobs are waiting; the client should retry later"""
+
+class ImageJob:
+    """One user's image generation request and, once it has run, its result"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, prompt: str, enhanced_prompt: str, cache_key: str, character_name: str, style: str, user_id: int):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.enhanced_prompt = enhanced_prompt
+        self.cache_key = cache_key
+        self.character_name = character_name
+        self.style = style
+        self.user_id = user_id
+        self.status = self.QUEUED
+        self.result: Optional[Dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def set_status(self, status: str, result: Optional[Dict] = None):
+        self.status = status
+        if result is not None:
+            self.result = result
+        if self.finished:
+            self.finished_at = time.time()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        """Wait until the status changes; False on timeout"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "prompt": self.prompt,
+            "character": self.character_name,
+            "style": self.style,
+            "result": self.result,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class ImageJobQueue:
+    """Runs image generations on a bounded pool of background workers
+
+    Submitting returns a job right away. Requests whose enhanced prompt is
+    already queued or running get their own job that follows the render in
+    flight instead of generating the same image twice, and prompts that are
+    already cached finish immediately. Finished jobs are kept for ttl_seconds
+    so their owners can poll them.
+    """
+
+    def __init__(self, workers: int = 4, max_queued: int = 100, ttl_seconds: float = 3600):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, ImageJob] = {}
+        # cache key -> every job waiting on its render; the first one is in the queue
+        self._in_flight: Dict[str, List[ImageJob]] = {}
+        self.deduplicated = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, prompt: str, character: Character, user_id: int, style: str = "realistic") -> ImageJob:
+        """Queue an image generation, or follow the identical one already in flight"""
+        if self._queue is None:
+            raise RuntimeError("Image job queue is not running")
+        self._prune()
+
+        image_service = get_image_service()
+        enhanced_prompt, cache_key = image_service.prepare(prompt, character, style)
+
+        job = ImageJob(prompt, enhanced_prompt, cache_key, character.display_name, style, user_id)
+        followers = self._in_flight.get(cache_key)
+        if followers is not None:
+            # Same image, but the caller only ever sees their own job
+            self.deduplicated += 1
+            job.set_status(followers[0].status)
+            followers.append(job)
+        elif image_service.is_cached(cache_key):
+            job.set_status(ImageJob.SUCCEEDED, image_service.image_result(
+                prompt, enhanced_prompt, cache_key, job.character_name, style, cached=True
+            ))
+        else:
+            if self._queue.qsize() >= self.max_queued:
+                raise ImageQueueFull(f"{self._queue.qsize()} image jobs are already waiting")
+            self._in_flight[cache_key] = [job]
+            self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[ImageJob]:
+        """The job, if it exists and belongs to user_id"""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        image_service = get_image_service()
+        while True:
+            job = await self._queue.get()
+            # Jobs that join while this one renders are appended to the same list
+            followers = self._in_flight[job.cache_key]
+            for follower in followers:
+                follower.set_status(ImageJob.RUNNING)
+            try:
+                rendered = await image_service.render(job.enhanced_prompt, job.cache_key)
+                failure = None if rendered else {
+                    "success": False,
+                    "error": "Failed to generate image",
+                    "fallback_message": "Unable to create image at this time. Please try again later."
+                }
+            except Exception as e:
+                logger.error(f"Image job {job.id} failed: {e}")
+                failure = {
+                    "success": False,
+                    "error": str(e),
+                    "fallback_message": "Image generation failed. Please try a different prompt."
+                }
+            finally:
+                self._in_flight.pop(job.cache_key, None)
+
+            for follower in followers:
+                if failure is None:
+                    follower.set_status(ImageJob.SUCCEEDED, image_service.image_result(
+                        follower.prompt, follower.enhanced_prompt, follower.cache_key,
+                        follower.character_name, follower.style, cached=False
+                    ))
+                else:
+                    follower.set_status(ImageJob.FAILED, failure)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._in_flight),
+            "jobs": len(self._jobs),
+            "deduplicated": self.deduplicated,
+        }
+
+image_job_queue = ImageJobQueue(
+    workers=settings.IMAGE_JOB_WORKERS,
+    max_queued=settings.IMAGE_JOB_MAX_QUEUED,
+    ttl_seconds=settings.IMAGE_JOB_TTL_SECONDS
+)
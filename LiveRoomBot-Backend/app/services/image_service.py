@@ -1,12 +1,12 @@
-import os
+import asyncio
 import hashlib
-import requests
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from pathlib import Path
-import tempfile
+import httpx
 from app.core.config import settings
 from app.models.character import Character
 from app.models.user import User
+from app.services.media_cache import get_media_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,10 +17,47 @@ class ImageGenerationService:
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY  # DALL-E uses OpenAI API
         self.base_url = "https://api.openai.com/v1"
-        self.image_cache_dir = Path("image_cache")
-        self.image_cache_dir.mkdir(exist_ok=True)
+        self.cache = get_media_cache("image")
+        self.image_cache_dir = self.cache.directory
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        """Shared client so generations and downloads reuse pooled connections"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=5.0))
+        return self._client
+
+    def prepare(self, prompt: str, character: Character, style: str = "realistic") -> Tuple[str, str]:
+        """Enhanced prompt and cache key for a request"""
+        enhanced_prompt = self._enhance_prompt_with_character(prompt, character, style)
+        return enhanced_prompt, self._generate_cache_key(enhanced_prompt)
+
+    def image_result(self, prompt: str, enhanced_prompt: str, cache_key: str, character_name: str, style: str, cached: bool) -> Dict:
+        return {
+            "success": True,
+            "image_url": f"/api/v1/images/view/{cache_key}.png",
+            "prompt": prompt,
+            "enhanced_prompt": enhanced_prompt,
+            "character": character_name,
+            "style": style,
+            "cached": cached
+        }
+
+    def is_cached(self, cache_key: str) -> bool:
+        return self.cache.get(f"{cache_key}.png") is not None
+
+    async def render(self, enhanced_prompt: str, cache_key: str) -> bool:
+        """Generate an image with DALL-E and store it in the cache"""
+        image_url = await self._call_dalle_api(enhanced_prompt)
+        if not image_url:
+            return False
+        image_data = await self._download_image(image_url)
+        if not image_data:
+            return False
+        await asyncio.to_thread(self.cache.put, f"{cache_key}.png", image_data)
+        return True
     
-    def generate_character_image(
+    async def generate_character_image(
         self, 
         prompt: str, 
         character: Character,
@@ -38,42 +75,15 @@ class ImageGenerationService:
         
         try:
             # Enhance prompt with character context
-            enhanced_prompt = self._enhance_prompt_with_character(prompt, character, style)
+            enhanced_prompt, cache_key = self.prepare(prompt, character, style)
             
             # Check cache first
-            cache_key = self._generate_cache_key(enhanced_prompt)
-            cached_file = self.image_cache_dir / f"{cache_key}.png"
-            
-            if cached_file.exists():
-                return {
-                    "success": True,
-                    "image_url": f"/api/v1/images/view/{cache_key}.png",
-                    "prompt": prompt,
-                    "enhanced_prompt": enhanced_prompt,
-                    "character": character.display_name,
-                    "style": style,
-                    "cached": True
-                }
+            if self.is_cached(cache_key):
+                return self.image_result(prompt, enhanced_prompt, cache_key, character.display_name, style, cached=True)
             
             # Generate new image
-            image_url = self._call_dalle_api(enhanced_prompt)
-            
-            if image_url:
-                # Download and cache the image
-                image_data = self._download_image(image_url)
-                if image_data:
-                    with open(cached_file, "wb") as f:
-                        f.write(image_data)
-                    
-                    return {
-                        "success": True,
-                        "image_url": f"/api/v1/images/view/{cache_key}.png",
-                        "prompt": prompt,
-                        "enhanced_prompt": enhanced_prompt,
-                        "character": character.display_name,
-                        "style": style,
-                        "cached": False
-                    }
+            if await self.render(enhanced_prompt, cache_key):
+                return self.image_result(prompt, enhanced_prompt, cache_key, character.display_name, style, cached=False)
             
             return {
                 "success": False,
@@ -149,7 +159,7 @@ class ImageGenerationService:
         """Generate cache key for image"""
         return hashlib.md5(prompt.encode()).hexdigest()
     
-    def _call_dalle_api(self, prompt: str) -> Optional[str]:
+    async def _call_dalle_api(self, prompt: str) -> Optional[str]:
         """Call DALL-E API to generate image"""
         
         url = f"{self.base_url}/images/generations"
@@ -169,7 +179,7 @@ class ImageGenerationService:
         }
         
         try:
-            response = requests.post(url, json=data, headers=headers, timeout=60)
+            response = await self._http().post(url, json=data, headers=headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -178,34 +188,27 @@ class ImageGenerationService:
             else:
                 logger.error(f"DALL-E API error: {response.status_code} - {response.text}")
                 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"DALL-E API request failed: {e}")
         
         return None
     
-    def _download_image(self, url: str) -> Optional[bytes]:
+    async def _download_image(self, url: str) -> Optional[bytes]:
         """Download image from URL"""
         try:
-            response = requests.get(url, timeout=30)
+            response = await self._http().get(url, timeout=30)
             if response.status_code == 200:
                 return response.content
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Failed to download image: {e}")
         
         return None
     
-    def get_image_file(self, filename: str) -> Optional[bytes]:
-        """Get cached image file"""
-        file_path = self.image_cache_dir / filename
-        
-        if file_path.exists() and file_path.suffix in ['.png', '.jpg', '.jpeg']:
-            try:
-                with open(file_path, "rb") as f:
-                    return f.read()
-            except Exception as e:
-                logger.error(f"Error reading image file {filename}: {e}")
-        
-        return None
+    def get_image_path(self, filename: str) -> Optional[Path]:
+        """Path of a cached image file, or None"""
+        if Path(filename).suffix not in ['.png', '.jpg', '.jpeg'] or Path(filename).name != filename:
+            return None
+        return self.cache.get(filename)
     
     def get_character_image_suggestions(self, character: Character) -> List[str]:
         """Get image prompt suggestions for character"""
@@ -299,10 +302,7 @@ class ImageGenerationService:
     def clear_image_cache(self) -> Dict:
         """Clear image cache"""
         try:
-            import shutil
-            if self.image_cache_dir.exists():
-                shutil.rmtree(self.image_cache_dir)
-                self.image_cache_dir.mkdir(exist_ok=True)
+            self.cache.clear()
             
             return {
                 "success": True,
@@ -316,25 +316,13 @@ class ImageGenerationService:
     
     def get_cache_stats(self) -> Dict:
         """Get image cache statistics"""
-        try:
-            cache_files = list(self.image_cache_dir.glob("*.png"))
-            total_size = sum(f.stat().st_size for f in cache_files)
-            
-            return {
-                "total_files": len(cache_files),
-                "total_size_mb": round(total_size / (1024 * 1024), 2),
-                "cache_directory": str(self.image_cache_dir)
-            }
-        except Exception as e:
-            return {
-                "error": f"Failed to get cache stats: {e}"
-            }
+        return self.cache.stats()
     
-    def test_image_generation(self, prompt: str = "A beautiful sunset over mountains") -> Dict:
+    async def test_image_generation(self, prompt: str = "A beautiful sunset over mountains") -> Dict:
         """Test image generation"""
         try:
             enhanced_prompt = f"{prompt}, high quality, detailed, safe for work"
-            image_url = self._call_dalle_api(enhanced_prompt)
+            image_url = await self._call_dalle_api(enhanced_prompt)
             
             if image_url:
                 return {
@@ -354,3 +342,26 @@ class ImageGenerationService:
                 "success": False,
                 "error": f"Image test failed: {e}"
             }
+
+    async def close(self):
+        """Release the pooled HTTP connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Process-wide instance so every job reuses the same connection pool
+_image_service: Optional[ImageGenerationService] = None
+
+def get_image_service() -> ImageGenerationService:
+    """Return the shared ImageGenerationService (also usable as a FastAPI dependency)"""
+    global _image_service
+    if _image_service is None:
+        _image_service = ImageGenerationService()
+    return _image_service
+
+async def close_image_service():
+    """Close the shared ImageGenerationService, called from the application lifespan"""
+    global _image_service
+    if _image_service is not None:
+        await _image_service.close()
+        _image_service = None
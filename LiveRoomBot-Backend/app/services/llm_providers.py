@@ -0,0 +1,228 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+import openai
+from app.core.config import settings
+from app.services.circuit_breaker import LatencyTracker
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _http2_available() -> bool:
+    """httpx only speaks HTTP/2 when the optional h2 package is installed"""
+    if not settings.OPENAI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("OPENAI_HTTP2 is enabled but h2 is not installed, using HTTP/1.1")
+        return False
+
+def _http_client_options() -> Dict:
+    """Connection pool settings shared by the sync and async httpx clients"""
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+class Completion:
+    """Replies for one request (one per choice) and the token usage, if reported"""
+
+    def __init__(self, replies: List[str], usage=None):
+        self.replies = replies
+        self.usage = usage
+
+class StreamDelta:
+    """A piece of one choice's reply; the last delta of a stream may carry usage instead"""
+
+    __slots__ = ("index", "content", "usage")
+
+    def __init__(self, index: int = 0, content: str = "", usage=None):
+        self.index = index
+        self.content = content
+        self.usage = usage
+
+class LLMProvider(ABC):
+    """A chat-completion backend; params are OpenAI-style (model, max_tokens, temperature...)"""
+
+    name: str = "provider"
+
+    def __init__(self):
+        # Per-backend latency window, used to decide when to hedge
+        self.latency = LatencyTracker()
+
+    def model_for(self, model: str) -> str:
+        """The model actually served for a routed model name"""
+        return model
+
+    @abstractmethod
+    async def complete(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        ...
+
+    @abstractmethod
+    def stream(self, messages: List[Dict[str, str]], params: Dict) -> AsyncIterator[StreamDelta]:
+        ...
+
+    @abstractmethod
+    def complete_sync(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        ...
+
+    async def close(self):
+        pass
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI itself, or any server speaking its API (llama.cpp server, vLLM, ...)"""
+
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        stream_usage: bool = True
+    ):
+        super().__init__()
+        self.name = name
+        # Self-hosted servers serve one model whatever the route asked for
+        self.model = model
+        self.stream_usage = stream_usage
+
+        # Pooled keep-alive connections, one pool per backend
+        http_options = _http_client_options()
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            http_client=openai.DefaultHttpxClient(**http_options)
+        )
+        # Retries go through the LLM scheduler so 429s shrink concurrency instead of adding load
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(**http_options)
+        )
+
+    def model_for(self, model: str) -> str:
+        return self.model or model
+
+    def _params(self, params: Dict) -> Dict:
+        return dict(params, model=self.model_for(params["model"]))
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        return Completion(
+            [choice.message.content.strip() for choice in response.choices if choice.message.content],
+            response.usage
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        response = await self.async_client.chat.completions.create(messages=messages, **self._params(params))
+        return self._completion(response)
+
+    async def stream(self, messages: List[Dict[str, str]], params: Dict) -> AsyncIterator[StreamDelta]:
+        extra = {"stream_options": {"include_usage": True}} if self.stream_usage else {}
+        stream = await self.async_client.chat.completions.create(
+            messages=messages, stream=True, **extra, **self._params(params)
+        )
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                yield StreamDelta(usage=usage)
+            for choice in chunk.choices:
+                if choice.delta.content:
+                    yield StreamDelta(choice.index, choice.delta.content)
+
+    def complete_sync(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        response = self.client.chat.completions.create(messages=messages, **self._params(params))
+        return self._completion(response)
+
+    async def close(self):
+        self.client.close()
+        await self.async_client.close()
+
+class FakeProvider(LLMProvider):
+    """Deterministic in-process replies: no network and no API key
+
+    latency_seconds and tokens_per_second simulate a real backend, so the
+    whole chat path can be load-tested offline at realistic timings.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_seconds: float = 0.0, tokens_per_second: float = 0.0):
+        super().__init__()
+        self.latency_seconds = latency_seconds
+        self.tokens_per_second = tokens_per_second
+
+    @staticmethod
+    def reply(messages: List[Dict[str, str]], params: Dict) -> str:
+        return f"[{params['model']}] {messages[-1]['content'][:200]}"
+
+    async def complete(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        reply = self.reply(messages, params)
+        words = len(reply.split())
+        await asyncio.sleep(self.latency_seconds + (words / self.tokens_per_second if self.tokens_per_second else 0))
+        return Completion([reply] * params.get("n", 1))
+
+    async def stream(self, messages: List[Dict[str, str]], params: Dict) -> AsyncIterator[StreamDelta]:
+        await asyncio.sleep(self.latency_seconds)
+        for word in self.reply(messages, params).split(" "):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield StreamDelta(0, word + " ")
+
+    def complete_sync(self, messages: List[Dict[str, str]], params: Dict) -> Completion:
+        time.sleep(self.latency_seconds)
+        return Completion([self.reply(messages, params)])
+
+_providers: Dict[str, LLMProvider] = {}
+_unconfigured = set()
+
+def get_llm_provider(name: str) -> Optional[LLMProvider]:
+    """Return the named backend ("openai", "local" or "fake"), or None if it isn't configured"""
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+
+    try:
+        if name == "openai" and settings.OPENAI_API_KEY:
+            provider = OpenAICompatibleProvider("openai", settings.OPENAI_API_KEY)
+        elif name == "local" and settings.LOCAL_LLM_BASE_URL:
+            provider = OpenAICompatibleProvider(
+                "local",
+                settings.LOCAL_LLM_API_KEY,
+                base_url=settings.LOCAL_LLM_BASE_URL,
+                model=settings.LOCAL_LLM_MODEL or None,
+                stream_usage=False
+            )
+        elif name == "fake":
+            provider = FakeProvider(settings.FAKE_LLM_LATENCY_SECONDS, settings.FAKE_LLM_TOKENS_PER_SECOND)
+    except Exception as e:
+        logger.error(f"Failed to initialize LLM provider {name}: {e}")
+        return None
+
+    if provider is None:
+        if name not in _unconfigured:
+            _unconfigured.add(name)
+            logger.warning(f"LLM provider {name} is not configured, using fallback responses")
+        return None
+    logger.info(f"LLM provider {name} initialized")
+    _providers[name] = provider
+    return provider
+
+async def close_llm_providers():
+    """Release every backend's connections, called on shutdown"""
+    for provider in list(_providers.values()):
+        await provider.close()
+    _providers.clear()
@@ -0,0 +1,231 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import openai
+from app.core.config import settings
+from app.models.user import SubscriptionPlan
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Highest priority first; background work (summaries) only runs on spare capacity
+LANES = ("pro", "basic", "free", "background")
+
+# Errors worth another attempt; the client itself no longer retries them
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+class LLMOverloaded(Exception):
+    """The request was shed: its lane is full or it could not start before its deadline"""
+
+def lane_for_plan(plan: Optional[SubscriptionPlan]) -> str:
+    return plan.value if plan is not None else "free"
+
+class SlotHandle:
+    """A granted slot; streaming callers mark the first token so latency means TTFT"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def first_token(self):
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+class LLMScheduler:
+    """Adaptive concurrency limit (AIMD) with priority lanes in front of the LLM API
+
+    The limit grows by 1/limit per successful call under the latency target,
+    and shrinks (at most once per observed latency) by half on a 429 or
+    timeout and by 10% when latency overshoots the target. Waiting calls are
+    served strictly by lane; each lane's queue is bounded and calls that
+    can't start before their deadline are shed instead of queued.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 128,
+        latency_target: float = 8.0,
+        max_waiting: int = 200,
+        queue_timeout: float = 20.0,
+        max_retries: int = 3
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self._queues: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._latency: Optional[float] = None  # EWMA, seconds
+        self._last_decrease = 0.0
+        self.completed = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.expired = 0
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _waiting_ahead(self, lane: str) -> int:
+        """Queued calls that will be served before a new call in lane"""
+        return sum(len(self._queues[other]) for other in LANES[:LANES.index(lane) + 1])
+
+    async def _acquire(self, lane: str, deadline: float):
+        if self._has_capacity() and self._waiting_ahead(lane) == 0:
+            self.in_flight += 1
+            return
+
+        queue = self._queues[lane]
+        if len(queue) >= self.max_waiting:
+            self.shed += 1
+            raise LLMOverloaded(f"{lane} queue is full")
+
+        # Shed now rather than after a wait that can't end in time
+        latency = self._latency or self.latency_target
+        expected_start = time.monotonic() + (self._waiting_ahead(lane) + 1) / max(1, int(self.limit)) * latency
+        if expected_start > deadline:
+            self.shed += 1
+            raise LLMOverloaded(f"{lane} queue can't start the call before its deadline")
+
+        waiter: Tuple[asyncio.Future, float] = (asyncio.get_running_loop().create_future(), deadline)
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[0], timeout=max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter[0].done() and not waiter[0].cancelled() and waiter[0].exception() is None:
+                # Granted just as we gave up: pass the slot on
+                self._release_slot()
+            try:
+                queue.remove(waiter)
+            except ValueError:
+                pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired += 1
+                raise LLMOverloaded(f"{lane} call waited past its deadline")
+            raise
+
+    def _dispatch(self):
+        now = time.monotonic()
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._has_capacity():
+                future, deadline = queue.popleft()
+                if future.done():
+                    continue
+                if deadline <= now:
+                    self.expired += 1
+                    future.set_exception(LLMOverloaded(f"{lane} call waited past its deadline"))
+                    continue
+                self.in_flight += 1
+                future.set_result(None)
+            if not self._has_capacity():
+                return
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _observe(self, latency: Optional[float], overloaded: bool):
+        """AIMD update from one finished call"""
+        now = time.monotonic()
+        # Decrease at most once per round trip, or one burst of 429s would collapse the limit
+        can_decrease = now - self._last_decrease > (self._latency or self.latency_target)
+
+        if overloaded:
+            self.rate_limited += 1
+            if can_decrease:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+            return
+
+        if latency is None:
+            return
+        self.completed += 1
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        if latency > self.latency_target:
+            if can_decrease:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "free", deadline: Optional[float] = None):
+        """Hold one unit of upstream concurrency for the duration of the block"""
+        deadline = deadline or time.monotonic() + self.queue_timeout
+        await self._acquire(lane, deadline)
+        handle = SlotHandle()
+        overloaded = False
+        failed = False
+        try:
+            yield handle
+        except (openai.RateLimitError, openai.APITimeoutError):
+            overloaded = True
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            latency = handle.latency if handle.latency is not None else time.monotonic() - handle.started
+            self._observe(None if failed else latency, overloaded)
+            self._release_slot()
+
+    async def run(self, fn: Callable[[], Awaitable[T]], lane: str = "free", deadline: Optional[float] = None) -> T:
+        """Call fn inside a slot, retrying transient API errors with jittered backoff"""
+        deadline = deadline or time.monotonic() + self.queue_timeout
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.slot(lane, deadline):
+                    return await fn()
+            except RETRYABLE_ERRORS as e:
+                backoff = min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+                response = getattr(e, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    backoff = max(backoff, float(retry_after))
+                if attempt == self.max_retries or time.monotonic() + backoff >= deadline:
+                    raise
+                logger.warning(f"LLM call failed ({type(e).__name__}), retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": {lane: len(queue) for lane, queue in self._queues.items()},
+            "latency_ewma_s": round(self._latency, 3) if self._latency is not None else None,
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "expired": self.expired,
+        }
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+def get_llm_scheduler(provider: str = "openai") -> LLMScheduler:
+    """Return the scheduler for one LLM backend; each has its own capacity"""
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        scheduler = _schedulers[provider] = LLMScheduler(
+            initial_limit=settings.LLM_INITIAL_CONCURRENCY,
+            min_limit=settings.LLM_MIN_CONCURRENCY,
+            max_limit=settings.LLM_MAX_CONCURRENCY,
+            latency_target=settings.LLM_LATENCY_TARGET_SECONDS,
+            max_waiting=settings.LLM_QUEUE_MAX_WAITING,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+    return scheduler
+
+def llm_scheduler_stats() -> Dict[str, Dict]:
+    return {provider: scheduler.stats() for provider, scheduler in _schedulers.items()}
@@ -0,0 +1,298 @@
+import asyncio
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".index.json"
+
+class MediaCache:
+    """On-disk cache of generated media files under a byte budget
+
+    Each file's size, last access time and hit count live in an in-memory
+    index (least recently used first). flush() persists it next to the files
+    so a restart doesn't rescan them; get() and put() only mark it dirty, and
+    the app flushes periodically from a worker thread. Writes go through a temp file and a rename,
+    so readers never see a partial file. When a write takes the cache over
+    max_bytes, entries are evicted by the policy: "lru" (least recently
+    used) or "lfu" (fewest hits, oldest first on ties). LFU keeps entries in
+    per-hit-count buckets, so picking a victim doesn't scan the index.
+
+    Evicted files are unlinked after the index lock is released, so get() on
+    the event loop never waits on the disk. A separate file lock orders those
+    unlinks against put()'s rename, so a file written again under an evicted
+    name is never deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, policy: str = "lru"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.policy = policy
+        # filename -> [size, last_access, hits]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._bytes = 0
+        # hits -> names with that many hits, least recently used first; only for "lfu"
+        self._by_hits: Dict[int, "OrderedDict[str, None]"] = {}
+        # Min-heap of the hit counts in _by_hits; counts whose bucket emptied are skipped lazily
+        self._hit_counts: List[int] = []
+        self._lock = threading.Lock()
+        # Taken outside _lock, around renames into and unlinks from the directory
+        self._files_lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        """Read the persisted index, then reconcile it with the directory once"""
+        entries = {}
+        try:
+            with open(self.directory / INDEX_FILE, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Rebuilding media cache index for {self.directory}: {e}")
+
+        on_disk = {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name == INDEX_FILE:
+                continue
+            if entry.name.endswith(".tmp"):
+                # Left over from a write that never finished (recent ones may be another worker's)
+                if time.time() - entry.stat().st_mtime > 3600:
+                    os.unlink(entry.path)
+                continue
+            known = entries.get(entry.name)
+            if known is None:
+                stat = entry.stat()
+                known = [stat.st_size, stat.st_mtime, 0]
+            on_disk[entry.name] = known
+
+        for name, entry in sorted(on_disk.items(), key=lambda item: item[1][1]):
+            self._add(name, entry)
+        self._dirty = len(on_disk) != len(entries)
+        self._unlink(self._evict())
+
+    def path(self, name: str) -> Path:
+        if not name or Path(name).name != name or name == INDEX_FILE:
+            raise ValueError(f"Invalid media cache key: {name!r}")
+        return self.directory / name
+
+    def get(self, name: str) -> Optional[Path]:
+        """Path of a cached file, counting the hit, or None; never touches the disk"""
+        path = self.path(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._untrack(name, entry[2])
+            entry[1] = time.time()
+            entry[2] += 1
+            self._track(name, entry[2])
+            self._entries.move_to_end(name)
+            self.hits += 1
+            self._dirty = True
+        return path
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def put(self, name: str, data: bytes) -> Path:
+        """Atomically write a file into the cache and evict down to the budget"""
+        path = self.path(name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._files_lock:
+            try:
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            # Registered before the file lock is released, so a pending unlink of this name skips it
+            with self._lock:
+                previous = self._forget(name)
+                victims = self._evict(incoming=len(data))
+                self._add(name, [len(data), time.time(), previous[2] if previous else 0])
+                self._dirty = True
+        self._unlink(victims)
+        # A crash before the next flush is harmless: startup re-adds unknown files
+        return path
+
+    def _add(self, name: str, entry: list):
+        self._entries[name] = entry
+        self._bytes += entry[0]
+        self._track(name, entry[2])
+
+    def _forget(self, name: str) -> Optional[list]:
+        """Drop an entry from the index, leaving its file; the caller holds the lock"""
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+            self._untrack(name, entry[2])
+            self._dirty = True
+        return entry
+
+    def _track(self, name: str, hits: int):
+        if self.policy != "lfu":
+            return
+        bucket = self._by_hits.get(hits)
+        if bucket is None:
+            bucket = self._by_hits[hits] = OrderedDict()
+            heapq.heappush(self._hit_counts, hits)
+            if len(self._hit_counts) > 2 * len(self._by_hits) + 8:
+                # Drop the stale and repeated counts that never reached the top
+                self._hit_counts = list(self._by_hits)
+                heapq.heapify(self._hit_counts)
+        bucket[name] = None
+
+    def _untrack(self, name: str, hits: int):
+        if self.policy != "lfu":
+            return
+        bucket = self._by_hits[hits]
+        del bucket[name]
+        if not bucket:
+            del self._by_hits[hits]
+
+    def _least_used(self) -> str:
+        while self._hit_counts[0] not in self._by_hits:
+            heapq.heappop(self._hit_counts)
+        return next(iter(self._by_hits[self._hit_counts[0]]))
+
+    def _evict(self, incoming: int = 0) -> List[str]:
+        """Drop entries until incoming more bytes fit the budget; the caller holds the lock
+
+        Returns the evicted names for _unlink() once the lock is released.
+        """
+        victims = []
+        while self._entries and self._bytes + incoming > self.max_bytes:
+            name = self._least_used() if self.policy == "lfu" else next(iter(self._entries))
+            self._forget(name)
+            victims.append(name)
+            self.evictions += 1
+        return victims
+
+    def _unlink(self, names: List[str]):
+        """Delete files already dropped from the index; never called with _lock held"""
+        if not names:
+            return
+        with self._files_lock:
+            for name in names:
+                if name in self._entries:
+                    # Written again since it was dropped
+                    continue
+                try:
+                    os.unlink(self.directory / name)
+                except FileNotFoundError:
+                    pass
+
+    def remove(self, name: str) -> bool:
+        self.path(name)
+        with self._lock:
+            if self._forget(name) is None:
+                return False
+        self._unlink([name])
+        self.flush()
+        return True
+
+    def clear(self):
+        with self._lock:
+            names = list(self._entries)
+            for name in names:
+                self._forget(name)
+        self._unlink(names)
+        self.flush()
+
+    def flush(self):
+        """Persist the index if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._entries)
+            self._dirty = False
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.directory / INDEX_FILE)
+        except OSError as e:
+            logger.warning(f"Failed to persist media cache index for {self.directory}: {e}")
+            os.unlink(tmp_path)
+            self._dirty = True
+
+    def stats(self) -> Dict:
+        return {
+            "total_files": len(self._entries),
+            "total_size_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "cache_directory": str(self.directory),
+        }
+
+_media_caches: Dict[str, MediaCache] = {}
+
+def get_media_cache(name: str) -> MediaCache:
+    """Return the process-wide cache for one media kind ("voice" or "image")"""
+    cache = _media_caches.get(name)
+    if cache is None:
+        max_mb = {"voice": settings.VOICE_CACHE_MAX_MB, "image": settings.IMAGE_CACHE_MAX_MB}[name]
+        cache = _media_caches[name] = MediaCache(
+            f"{name}_cache",
+            int(max_mb * 1024 * 1024),
+            policy=settings.MEDIA_CACHE_POLICY
+        )
+    return cache
+
+def media_cache_stats() -> Dict[str, Dict]:
+    return {name: cache.stats() for name, cache in _media_caches.items()}
+
+def flush_media_caches():
+    """Persist every cache index that changed"""
+    for cache in list(_media_caches.values()):
+        cache.flush()
+
+_flush_task: Optional[asyncio.Task] = None
+
+async def _flush_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_media_caches)
+        except Exception as e:
+            logger.error(f"Media cache index flush failed: {e}")
+
+async def start_media_cache_flusher():
+    """Persist changed cache indexes every MEDIA_CACHE_INDEX_FLUSH_SECONDS, off the event loop"""
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_periodically(settings.MEDIA_CACHE_INDEX_FLUSH_SECONDS))
+
+async def stop_media_cache_flusher():
+    """Stop the periodic flush and persist every index one last time"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+    await asyncio.to_thread(flush_media_caches)
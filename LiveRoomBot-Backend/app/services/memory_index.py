@@ -0,0 +1,319 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.embedding_service import Embedder, get_embedder
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+class NumpyVectorStore:
+    """Brute-force cosine search over a memory-mapped float32 matrix
+
+    Vectors live in <path>.f32 and their message metadata in <path>.jsonl; the
+    metadata file is appended after the vectors are flushed, so its line count
+    is always the number of valid rows.
+    """
+
+    MIN_CAPACITY = 64
+
+    def __init__(self, path: str, dim: int):
+        self.dim = dim
+        self.vectors_path = f"{path}.f32"
+        self.meta_path = f"{path}.jsonl"
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._capacity = 0
+        self._metas: List[Dict] = []
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self._metas = [json.loads(line) for line in f if line.strip()]
+        if os.path.exists(self.vectors_path):
+            self._capacity = os.path.getsize(self.vectors_path) // (dim * 4)
+            if self._capacity:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, dim))
+        # A crash between the two writes can leave metadata without vectors
+        self._metas = self._metas[:self._capacity]
+
+    def __len__(self) -> int:
+        return len(self._metas)
+
+    def _reserve(self, needed: int):
+        """Grow the backing file geometrically so appends stay amortized O(1)"""
+        if needed <= self._capacity:
+            if self._matrix is None and self._capacity:
+                # Closed (on shutdown) while this write was on its way; map the file again
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+            return
+        capacity = max(needed, self._capacity * 2, self.MIN_CAPACITY)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.vectors_path, "a+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def add(self, vectors, metas: List[Dict]):
+        with self._lock:
+            start = len(self._metas)
+            self._reserve(start + len(metas))
+            self._matrix[start:start + len(metas)] = vectors
+            self._matrix.flush()
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(meta) + "\n" for meta in metas)
+            self._metas.extend(metas)
+            self._added(vectors, start)
+
+    def _added(self, vectors, start: int):
+        """Hook for index structures kept alongside the matrix"""
+
+    def search(self, query, k: int) -> List[Tuple[Dict, float]]:
+        with self._lock:
+            count = len(self._metas)
+            # Only closed by stop(), which may race a last recall
+            if count == 0 or self._matrix is None:
+                return []
+            k = min(k, count)
+            scores = self._matrix[:count] @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._metas[i], float(scores[i])) for i in top]
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+
+class HnswVectorStore(NumpyVectorStore):
+    """NumPy store with an in-memory HNSW graph on top for sub-linear search
+
+    The memory-mapped matrix stays the source of truth; the graph is rebuilt
+    from it when the store is opened.
+    """
+
+    def __init__(self, path: str, dim: int, ef: int = 64, m: int = 16):
+        super().__init__(path, dim)
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=max(self._capacity, self.MIN_CAPACITY), ef_construction=200, M=m)
+        self._index.set_ef(ef)
+        if self._metas:
+            self._index.add_items(np.asarray(self._matrix[:len(self._metas)]), np.arange(len(self._metas)))
+
+    def _added(self, vectors, start: int):
+        if self._index.get_max_elements() < self._capacity:
+            self._index.resize_index(self._capacity)
+        self._index.add_items(vectors, np.arange(start, start + len(vectors)))
+
+    def search(self, query, k: int) -> List[Tuple[Dict, float]]:
+        with self._lock:
+            count = len(self._metas)
+            if count == 0:
+                return []
+            labels, distances = self._index.knn_query(query, k=min(k, count))
+            # Inner-product distance is 1 - similarity
+            return [(self._metas[label], 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+class MemoryIndex:
+    """Embedding index over past messages, one vector store per (user_id, character_id)"""
+
+    MIN_CONTENT_CHARS = 12  # "hi", "ok 😊" and the like aren't worth recalling
+
+    def __init__(self, directory: str, backend: str = "numpy", batch_size: int = 64, max_open_stores: int = 256):
+        self.directory = directory
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_open_stores = max_open_stores
+        self._stores: "OrderedDict[tuple, NumpyVectorStore]" = OrderedDict()
+        self._stores_lock = threading.Lock()
+        # Stores in use by an add or a recall; eviction skips them, so a pair never
+        # has two open stores appending to the same files
+        self._pins: Dict[tuple, int] = {}
+        self._pins_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        if backend == "hnsw" and hnswlib is None:
+            logger.warning("MEMORY_INDEX_BACKEND is hnsw but hnswlib is not installed, using brute-force search")
+            self.backend = "numpy"
+
+    def _store(self, embedder: Embedder, user_id: int, character_id: int, create: bool) -> Optional[NumpyVectorStore]:
+        """Open (or create) and pin the store for a pair; embedders get separate directories
+
+        Every store returned must be handed back with _release once the caller is done.
+        """
+        key = (embedder.name, user_id, character_id)
+        with self._stores_lock:
+            store = self._stores.get(key)
+            if store is None:
+                directory = os.path.join(self.directory, embedder.name)
+                path = os.path.join(directory, f"{user_id}_{character_id}")
+                if not create and not os.path.exists(f"{path}.jsonl"):
+                    return None
+                os.makedirs(directory, exist_ok=True)
+
+                store_class = HnswVectorStore if self.backend == "hnsw" else NumpyVectorStore
+                store = self._stores[key] = store_class(path, embedder.dim)
+            self._stores.move_to_end(key)
+            with self._pins_lock:
+                self._pins[key] = self._pins.get(key, 0) + 1
+                pinned = set(self._pins)
+
+            # Each open store holds a file mapping, so keep only the busiest ones open
+            excess = len(self._stores) - self.max_open_stores
+            if excess > 0:
+                for evicted in [open_key for open_key in self._stores if open_key not in pinned][:excess]:
+                    self._stores.pop(evicted).close()
+            return store
+
+    def _release(self, embedder: Embedder, user_id: int, character_id: int):
+        """Unpin a store; it may be evicted the next time another one is opened"""
+        key = (embedder.name, user_id, character_id)
+        with self._pins_lock:
+            if self._pins.get(key, 0) > 1:
+                self._pins[key] -= 1
+            else:
+                self._pins.pop(key, None)
+
+    async def _open(self, embedder: Embedder, user_id: int, character_id: int) -> Optional[NumpyVectorStore]:
+        """Open and pin an existing store in a worker thread, unpinning it if the caller is cancelled"""
+        opening = asyncio.ensure_future(asyncio.to_thread(self._store, embedder, user_id, character_id, False))
+        try:
+            return await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            def release(done: asyncio.Future):
+                if not done.cancelled() and done.exception() is None and done.result() is not None:
+                    self._release(embedder, user_id, character_id)
+            opening.add_done_callback(release)
+            raise
+
+    async def start(self):
+        if not settings.MEMORY_INDEX_ENABLED:
+            return
+        if get_embedder() is None:
+            logger.warning("NumPy is not installed, semantic memory is disabled")
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._queue = None
+        with self._stores_lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+            with self._pins_lock:
+                self._pins.clear()
+
+    def schedule(self, messages: Iterable):
+        """Queue saved messages for embedding; the request never waits on it"""
+        if self._queue is None:
+            return
+        for message in messages:
+            if message is None or len((message.content or "").strip()) < self.MIN_CONTENT_CHARS:
+                continue
+            self._queue.put_nowait({
+                "message_id": message.id,
+                "user_id": message.user_id,
+                "character_id": message.character_id,
+                "sender_type": message.sender_type,
+                "content": message.content,
+            })
+
+    async def _worker(self):
+        while True:
+            # Block for the first message, then take whatever else is already waiting
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self.index(batch)
+            except Exception as e:
+                logger.error(f"Embedding {len(batch)} messages failed: {e}")
+
+    async def index(self, items: List[Dict]) -> int:
+        """Embed a batch of message dicts in one call and append them to their stores"""
+        embedder = get_embedder()
+        if embedder is None or not items:
+            return 0
+
+        vectors = await embedder.embed([item["content"] for item in items])
+
+        groups: Dict[tuple, List[int]] = {}
+        for row, item in enumerate(items):
+            groups.setdefault((item["user_id"], item["character_id"]), []).append(row)
+        for (user_id, character_id), rows in groups.items():
+            metas = [
+                {"message_id": items[row]["message_id"], "sender_type": items[row]["sender_type"], "content": items[row]["content"]}
+                for row in rows
+            ]
+            # Opening, growing and flushing the memory map is file I/O; keep it off the event loop
+            await asyncio.to_thread(self._add, embedder, user_id, character_id, vectors[rows], metas)
+        return len(items)
+
+    def _add(self, embedder: Embedder, user_id: int, character_id: int, vectors, metas: List[Dict]):
+        store = self._store(embedder, user_id, character_id, create=True)
+        try:
+            store.add(vectors, metas)
+        finally:
+            self._release(embedder, user_id, character_id)
+
+    async def recall(
+        self,
+        user_id: int,
+        character_id: int,
+        query: str,
+        k: int = 4,
+        exclude_ids: Optional[Set[int]] = None,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        """Top-k past messages most similar to query, skipping ones already in context"""
+        embedder = get_embedder()
+        if embedder is None or self._queue is None:
+            return []
+        # The store is opened and scanned in a worker thread, so replies elsewhere don't wait on it
+        store = await self._open(embedder, user_id, character_id)
+        if store is None:
+            return []
+        try:
+            if len(store) == 0:
+                return []
+            exclude_ids = exclude_ids or set()
+            query_vector = (await embedder.embed([query]))[0]
+            matches = await asyncio.to_thread(store.search, query_vector, k + len(exclude_ids))
+        finally:
+            self._release(embedder, user_id, character_id)
+
+        results = []
+        for meta, score in matches:
+            if score < min_score or meta["message_id"] in exclude_ids:
+                continue
+            results.append(dict(meta, score=score))
+            if len(results) == k:
+                break
+        return results
+
+memory_index = MemoryIndex(
+    settings.MEMORY_INDEX_DIR,
+    backend=settings.MEMORY_INDEX_BACKEND,
+    batch_size=settings.MEMORY_BATCH_SIZE
+)
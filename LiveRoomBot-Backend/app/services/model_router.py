@@ -0,0 +1,173 @@
+import threading
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.character import Character
+from app.models.user import SubscriptionPlan
+from app.services.tokenizer import count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M (input, output) tokens, for the per-route cost estimate
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+# Calmer sampling for characters whose style isn't playful
+STYLE_TEMPERATURES = {
+    "formal": 0.7,
+}
+
+class Route:
+    """One way to answer a turn: which provider and model, and how much to generate"""
+
+    def __init__(self, name: str, model: str, max_tokens: int, temperature: float, provider: str = "openai"):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.provider = provider
+
+    def with_temperature(self, temperature: float) -> "Route":
+        return Route(self.name, self.model, self.max_tokens, temperature, self.provider)
+
+    def __repr__(self) -> str:
+        return f"Route({self.name}, {self.provider}:{self.model}, max_tokens={self.max_tokens}, temperature={self.temperature})"
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """"luna:premium,zara:short" -> {"luna": "premium", "zara": "short"}"""
+    mapping = {}
+    for item in value.split(","):
+        if ":" in item:
+            key, target = item.split(":", 1)
+            mapping[key.strip().lower()] = target.strip()
+    return mapping
+
+class RouteStats:
+    """Calls, latency, tokens and estimated cost for one route"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "avg_latency_s": round(self.total_latency / self.calls, 3) if self.calls else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+class ModelRouter:
+    """Picks a Route per turn from message length, plan tier and character
+
+    Short messages ("lol", "hi") go to a small, cheap model with a short
+    reply budget, long messages from PRO users go to the premium route, and
+    everything else keeps the standard route. Characters can be pinned to a
+    route by name.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Route],
+        short_max_tokens: int = 12,
+        long_min_tokens: int = 120,
+        character_routes: Optional[Dict[str, str]] = None,
+        plan_providers: Optional[Dict[str, str]] = None,
+        character_providers: Optional[Dict[str, str]] = None
+    ):
+        self.routes = routes
+        self.short_max_tokens = short_max_tokens
+        self.long_min_tokens = long_min_tokens
+        self.character_routes = character_routes or {}
+        self.plan_providers = plan_providers or {}
+        self.character_providers = character_providers or {}
+        self._stats: Dict[str, RouteStats] = {name: RouteStats() for name in routes}
+        self._lock = threading.Lock()
+
+    def choose(self, character: Character, user_message: str, plan: Optional[SubscriptionPlan] = None) -> Route:
+        message_tokens = count_tokens(user_message)
+
+        if plan == SubscriptionPlan.PRO and message_tokens >= self.long_min_tokens:
+            name, reason = "premium", f"PRO plan and {message_tokens}-token message"
+        elif message_tokens <= self.short_max_tokens and plan != SubscriptionPlan.PRO:
+            name, reason = "short", f"{message_tokens}-token message"
+        else:
+            name, reason = "standard", f"{message_tokens}-token message, {plan.value if plan else 'free'} plan"
+
+        character_name = (character.name or "").lower()
+        pinned = self.character_routes.get(character_name)
+        if pinned in self.routes:
+            name, reason = pinned, f"pinned for {character.name}"
+
+        route = self.routes[name]
+
+        # Backend: the character's, else the plan's, else the route's default
+        provider = self.character_providers.get(character_name) or self.plan_providers.get(plan.value if plan else "free")
+        if provider:
+            route = Route(route.name, route.model, route.max_tokens, route.temperature, provider)
+
+        style_temperature = STYLE_TEMPERATURES.get((getattr(character, "conversation_style", None) or "").lower())
+        if style_temperature is not None:
+            route = route.with_temperature(style_temperature)
+
+        logger.info(f"Routed turn for {character.name} to {route} ({reason})")
+        return route
+
+    def record(self, route: Route, latency: float, prompt_tokens: int, completion_tokens: int, model: Optional[str] = None):
+        """Account one finished call against its route and log it; model is what actually served it"""
+        model = model or route.model
+        # Only hosted models cost per token; self-hosted and fake backends are priced at zero
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0)) if route.provider == "openai" else (0.0, 0.0)
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+        with self._lock:
+            stats = self._stats.setdefault(route.name, RouteStats())
+            stats.calls += 1
+            stats.total_latency += latency
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost_usd += cost
+        logger.info(
+            f"Route {route.name} ({route.provider}:{model}) answered in {latency:.2f}s, "
+            f"{prompt_tokens}+{completion_tokens} tokens, ~${cost:.6f}"
+        )
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+def estimate_usage(messages: List[Dict[str, str]], replies: List[str], model: str) -> Dict[str, int]:
+    """Token usage when the API didn't report it (e.g. streams without usage)"""
+    return {
+        "prompt_tokens": sum(count_tokens(message["content"], model) for message in messages),
+        "completion_tokens": sum(count_tokens(reply, model) for reply in replies),
+    }
+
+_model_router: Optional[ModelRouter] = None
+
+def get_model_router() -> ModelRouter:
+    """Return the router built from settings"""
+    global _model_router
+    if _model_router is None:
+        provider = settings.LLM_PROVIDER
+        _model_router = ModelRouter(
+            {
+                "short": Route("short", settings.ROUTER_SHORT_MODEL, settings.ROUTER_SHORT_MAX_REPLY_TOKENS, 0.8, provider),
+                "standard": Route("standard", settings.ROUTER_STANDARD_MODEL, 800, 0.9, provider),
+                "premium": Route("premium", settings.ROUTER_PREMIUM_MODEL, 1000, 0.9, provider),
+            },
+            short_max_tokens=settings.ROUTER_SHORT_MESSAGE_TOKENS,
+            long_min_tokens=settings.ROUTER_LONG_MESSAGE_TOKENS,
+            character_routes=_parse_mapping(settings.ROUTER_CHARACTER_ROUTES),
+            plan_providers=_parse_mapping(settings.LLM_PROVIDER_BY_PLAN),
+            character_providers=_parse_mapping(settings.LLM_PROVIDER_BY_CHARACTER)
+        )
+    return _model_router
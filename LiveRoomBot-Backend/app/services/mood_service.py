@@ -1,9 +1,12 @@
 import random
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal
 from app.models.character import Character
 from app.models.user import User
+from app.services.mood_store import MoodStore, get_mood_store
 import json
 
 class CharacterMoodService:
@@ -145,25 +148,57 @@ class CharacterMoodService:
         }
     }
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[AsyncSession] = None, store: Optional[MoodStore] = None):
+        # Only needed by lookups that load the Character themselves; without one they open a short session
         self.db = db
+        self.store = store or get_mood_store()
     
-    def get_character_mood(self, character_id: int, user_id: int) -> Dict:
+    async def _load_character(self, character_id: int) -> Optional[Character]:
+        if self.db is not None:
+            return await self.db.get(Character, character_id)
+        async with AsyncSessionLocal() as db:
+            return await db.get(Character, character_id)
+    
+    async def get_character_mood(self, character_id: int, user_id: int, character: Optional[Character] = None) -> Dict:
         """Get current mood for a character (user-specific)"""
-        # In production, you might store this in a separate table
-        # For now, we'll generate based on character and user interaction
+        # A mood holds for its whole window, so only roll a new one once it has expired
+        record = await self.store.get(user_id, character_id)
+        if record is not None:
+            return self._mood_from_record(record)
         
-        character = self.db.query(Character).filter(Character.id == character_id).first()
+        # Callers that already loaded the character pass it in to skip the query
+        if character is None:
+            character = await self._load_character(character_id)
         if not character:
             return self._get_default_mood()
         
         # Generate mood based on character personality and time
         mood_key = self._determine_character_mood(character, user_id)
-        mood = self.MOODS[mood_key].copy()
-        mood["key"] = mood_key
-        mood["duration_hours"] = random.randint(2, 8)  # Mood lasts 2-8 hours
-        mood["started_at"] = datetime.utcnow()
+        record = await self._start_mood(character_id, user_id, mood_key, random.randint(2, 8))  # Mood lasts 2-8 hours
         
+        return self._mood_from_record(record)
+    
+    async def _start_mood(self, character_id: int, user_id: int, mood_key: str, duration_hours: int, triggered: bool = False) -> Dict:
+        """Record a new mood window in the mood store"""
+        started_at = time.time()
+        record = {
+            "key": mood_key,
+            "duration_hours": duration_hours,
+            "started_at": started_at,
+            "expires_at": started_at + duration_hours * 3600,
+            "triggered": triggered
+        }
+        await self.store.set(user_id, character_id, record)
+        return record
+    
+    def _mood_from_record(self, record: Dict) -> Dict:
+        mood = self.MOODS[record["key"]].copy()
+        mood["key"] = record["key"]
+        mood["duration_hours"] = record["duration_hours"]
+        mood["started_at"] = datetime.utcfromtimestamp(record["started_at"])
+        mood["expires_at"] = datetime.utcfromtimestamp(record["expires_at"])
+        if record.get("triggered"):
+            mood["triggered"] = True
         return mood
     
     def _determine_character_mood(self, character: Character, user_id: int) -> str:
@@ -230,9 +265,15 @@ class CharacterMoodService:
         mood["key"] = "happy"
         return mood
     
-    def apply_mood_to_prompt(self, base_prompt: str, character_id: int, user_id: int) -> str:
+    async def apply_mood_to_prompt(self, base_prompt: str, character_id: int, user_id: int) -> str:
         """Apply character's current mood to the system prompt"""
-        mood = self.get_character_mood(character_id, user_id)
+        mood = await self.get_character_mood(character_id, user_id)
+        return base_prompt + self.build_mood_prompt(mood["key"])
+    
+    @classmethod
+    def build_mood_prompt(cls, mood_key: str) -> str:
+        """Build the system prompt block describing a mood"""
+        mood = cls.MOODS[mood_key]
         
         mood_enhancement = f"""
 
@@ -257,11 +298,15 @@ MOOD-SPECIFIC INSTRUCTIONS:
 - Be consistent with this mood throughout the conversation
 """
         
-        return base_prompt + mood_enhancement
+        return mood_enhancement
     
-    def get_mood_status(self, character_id: int, user_id: int) -> Dict:
+    async def get_mood_status(self, character_id: int, user_id: int) -> Dict:
         """Get detailed mood status for frontend display"""
-        mood = self.get_character_mood(character_id, user_id)
+        mood = await self.get_character_mood(character_id, user_id)
+        
+        remaining = None
+        if "expires_at" in mood:
+            remaining = max(mood["expires_at"] - datetime.utcnow(), timedelta(0))
         
         return {
             "current_mood": {
@@ -271,35 +316,53 @@ MOOD-SPECIFIC INSTRUCTIONS:
                 "key": mood["key"]
             },
             "effects": mood["effects"],
-            "duration_remaining": "2-8 hours",  # In production, calculate actual remaining time
-            "next_mood_change": "In a few hours",
-            "mood_history": self._get_recent_moods(character_id, user_id)
+            "duration_remaining": self._format_duration(remaining) if remaining is not None else "2-8 hours",
+            "next_mood_change": f"In {self._format_duration(remaining)}" if remaining is not None else "In a few hours",
+            "mood_history": await self._get_recent_moods(character_id, user_id)
         }
     
-    def _get_recent_moods(self, character_id: int, user_id: int) -> List[Dict]:
-        """Get recent mood history (mock data for now)"""
-        # In production, store and retrieve actual mood history
-        recent_moods = [
-            {"mood": "romantic", "emoji": "💕", "time": "2 hours ago"},
-            {"mood": "happy", "emoji": "😊", "time": "6 hours ago"},
-            {"mood": "flirty", "emoji": "😘", "time": "1 day ago"}
-        ]
+    async def _get_recent_moods(self, character_id: int, user_id: int) -> List[Dict]:
+        """Get recent mood history, excluding the current mood"""
+        recent_moods = []
+        now = datetime.utcnow()
+        
+        for record in (await self.store.history(user_id, character_id))[1:]:
+            mood = self.MOODS.get(record["key"])
+            if not mood:
+                continue
+            ago = now - datetime.utcfromtimestamp(record["started_at"])
+            recent_moods.append({
+                "mood": record["key"],
+                "emoji": mood["emoji"],
+                "time": f"{self._format_duration(ago)} ago"
+            })
+        
         return recent_moods
     
-    def trigger_mood_change(self, character_id: int, user_id: int, new_mood: str = None) -> Dict:
+    @staticmethod
+    def _format_duration(delta: timedelta) -> str:
+        """Human readable duration like '3 hours' or '1 day'"""
+        seconds = int(delta.total_seconds())
+        if seconds >= 86400:
+            value, unit = seconds // 86400, "day"
+        elif seconds >= 3600:
+            value, unit = seconds // 3600, "hour"
+        else:
+            value, unit = max(seconds // 60, 1), "minute"
+        return f"{value} {unit}{'s' if value != 1 else ''}"
+    
+    async def trigger_mood_change(self, character_id: int, user_id: int, new_mood: str = None) -> Dict:
         """Manually trigger a mood change (for special events or admin)"""
         if new_mood and new_mood not in self.MOODS:
             raise ValueError(f"Invalid mood: {new_mood}")
         
         if not new_mood:
             # Random mood change
-            character = self.db.query(Character).filter(Character.id == character_id).first()
-            new_mood = self._determine_character_mood(character, user_id)
+            character = await self._load_character(character_id)
+            new_mood = self._determine_character_mood(character, user_id) if character else "happy"
         
-        mood = self.MOODS[new_mood].copy()
-        mood["key"] = new_mood
-        mood["triggered"] = True
-        mood["started_at"] = datetime.utcnow()
+        record = await self._start_mood(character_id, user_id, new_mood, random.randint(2, 8), triggered=True)
+        mood = self._mood_from_record(record)
         
         return {
             "success": True,
@@ -322,9 +385,9 @@ MOOD-SPECIFIC INSTRUCTIONS:
             ]
         }
     
-    def get_mood_recommendations(self, character_id: int) -> List[str]:
+    async def get_mood_recommendations(self, character_id: int) -> List[str]:
         """Get mood recommendations based on character personality"""
-        character = self.db.query(Character).filter(Character.id == character_id).first()
+        character = await self._load_character(character_id)
         if not character:
             return ["happy", "flirty"]
         
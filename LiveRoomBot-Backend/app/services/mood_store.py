@@ -0,0 +1,113 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.redis import get_async_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MoodStore(ABC):
+    """Current mood per (user_id, character_id), valid until its expiry"""
+
+    HISTORY_LENGTH = 10
+
+    @abstractmethod
+    async def get(self, user_id: int, character_id: int) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: int, character_id: int, record: Dict):
+        """Store a mood record; it must carry started_at and expires_at (epoch seconds)"""
+
+    @abstractmethod
+    async def history(self, user_id: int, character_id: int) -> List[Dict]:
+        """Past mood records, newest first"""
+
+class InMemoryMoodStore(MoodStore):
+    """Process-local LRU with per-entry expiry
+
+    Methods never await, so each one runs atomically on the event loop.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._moods: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._history: "OrderedDict[tuple, deque]" = OrderedDict()
+
+    async def get(self, user_id: int, character_id: int) -> Optional[Dict]:
+        key = (user_id, character_id)
+        record = self._moods.get(key)
+        if record is None:
+            return None
+        if record["expires_at"] <= time.time():
+            del self._moods[key]
+            return None
+        self._moods.move_to_end(key)
+        return record
+
+    async def set(self, user_id: int, character_id: int, record: Dict):
+        key = (user_id, character_id)
+        self._moods[key] = record
+        self._moods.move_to_end(key)
+
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = deque(maxlen=self.HISTORY_LENGTH)
+        history.appendleft(record)
+        self._history.move_to_end(key)
+
+        while len(self._moods) > self.max_entries:
+            self._moods.popitem(last=False)
+        while len(self._history) > self.max_entries:
+            self._history.popitem(last=False)
+
+    async def history(self, user_id: int, character_id: int) -> List[Dict]:
+        return list(self._history.get((user_id, character_id), ()))
+
+class RedisMoodStore(MoodStore):
+    """Mood state shared by every worker; Redis expires the current mood itself"""
+
+    HISTORY_TTL_SECONDS = 7 * 24 * 3600
+
+    def __init__(self, client, prefix: str = "mood"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, user_id: int, character_id: int) -> str:
+        return f"{self.prefix}:{user_id}:{character_id}"
+
+    async def get(self, user_id: int, character_id: int) -> Optional[Dict]:
+        raw = await self.client.get(self._key(user_id, character_id))
+        return json.loads(raw) if raw else None
+
+    async def set(self, user_id: int, character_id: int, record: Dict):
+        key = self._key(user_id, character_id)
+        ttl = max(1, int(record["expires_at"] - time.time()))
+        payload = json.dumps(record)
+        pipe = self.client.pipeline()
+        pipe.set(key, payload, ex=ttl)
+        pipe.lpush(f"{key}:history", payload)
+        pipe.ltrim(f"{key}:history", 0, self.HISTORY_LENGTH - 1)
+        pipe.expire(f"{key}:history", self.HISTORY_TTL_SECONDS)
+        await pipe.execute()
+
+    async def history(self, user_id: int, character_id: int) -> List[Dict]:
+        return [json.loads(raw) for raw in await self.client.lrange(f"{self._key(user_id, character_id)}:history", 0, -1)]
+
+_mood_store: Optional[MoodStore] = None
+
+def get_mood_store() -> MoodStore:
+    """Return the configured process-wide mood store"""
+    global _mood_store
+    if _mood_store is None:
+        client = get_async_redis() if settings.MOOD_STORE_BACKEND == "redis" else None
+        if client is not None:
+            _mood_store = RedisMoodStore(client)
+        else:
+            if settings.MOOD_STORE_BACKEND == "redis":
+                logger.warning("Falling back to the in-memory mood store")
+            _mood_store = InMemoryMoodStore(settings.MOOD_STORE_MAX_ENTRIES)
+    return _mood_store
@@ -0,0 +1,70 @@
+from typing import AsyncIterator, Optional
+
+# Layer III bitrates in kbps by index, for MPEG-1 and for MPEG-2/2.5
+_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def mp3_header_length(data: bytes) -> Optional[int]:
+    """Bytes of leading ID3v2 tag and Xing/Info/VBRI frame in an MP3, or None if data is too short to tell
+
+    Those describe the whole file (its duration, seek table), so they must
+    not appear again in the middle of a stream joined from several files.
+    """
+    offset = 0
+    if len(data) < 3:
+        return None
+    if data[:3] == b"ID3":
+        if len(data) < 10:
+            return None
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | data[9] & 0x7F
+        # Flag 0x10: a 10-byte footer follows the tag
+        offset = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    if len(data) < offset + 4:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        return offset
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        # Not a Layer III frame we can size; leave it alone
+        return offset
+
+    mpeg1 = version == 3
+    frame_length = (144 if mpeg1 else 72) * _BITRATES[mpeg1][bitrate_index] * 1000 // _SAMPLE_RATES[version][rate_index]
+    frame_length += (b2 >> 1) & 1
+    mono = b3 >> 6 == 3
+    # Xing/Info sit right after the side information; VBRI always 32 bytes in
+    xing = offset + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    vbri = offset + 4 + 32
+    if len(data) < max(xing, vbri) + 4:
+        return None
+    if data[xing:xing + 4] in (b"Xing", b"Info") or data[vbri:vbri + 4] == b"VBRI":
+        return offset + frame_length
+    return offset
+
+async def strip_mp3_headers(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass an MP3 stream through without its leading ID3v2 tag and Xing/Info/VBRI frame"""
+    buffer = b""
+    skip: Optional[int] = None
+    async for chunk in chunks:
+        if skip is None:
+            buffer += chunk
+            skip = mp3_header_length(buffer)
+            if skip is None:
+                continue
+            chunk, buffer = buffer, b""
+        if skip:
+            dropped = min(skip, len(chunk))
+            chunk = chunk[dropped:]
+            skip -= dropped
+        if chunk:
+            yield chunk
+    if buffer:
+        # Ended before a full header arrived; too short to carry one
+        yield buffer
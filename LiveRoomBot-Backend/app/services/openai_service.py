@@ -1,8 +1,16 @@
-import openai
-from typing import List, Dict, Optional
+import time
+from typing import AsyncIterator, List, Dict, Optional
 from app.core.config import settings
 from app.models.character import Character
 from app.models.conversation import Message
+from app.models.user import SubscriptionPlan
+from app.services.circuit_breaker import get_circuit_breaker, hedged
+from app.services.llm_providers import LLMProvider, close_llm_providers, get_llm_provider
+from app.services.llm_scheduler import LLMOverloaded, get_llm_scheduler, lane_for_plan
+from app.services.model_router import Route, estimate_usage, get_model_router
+from app.services.prompt_cache import system_prompt_cache
+from app.services.response_cache import response_cache
+from app.services.tokenizer import MESSAGE_OVERHEAD_TOKENS, count_tokens, message_token_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,75 +18,156 @@ logger = logging.getLogger(__name__)
 class OpenAIService:
     """Service for handling OpenAI API interactions"""
 
+    # Fixed per character, so voice warm-up can pre-synthesize them
+    FALLBACK_RESPONSES = {
+        "luna": "Hey there! 😘 I'm having a little trouble with my thoughts right now, but I'm still here for you! What's on your mind?",
+        "sophia": "Oh no, I'm having a moment here! 😅 But don't worry, I'm still your caring companion. Tell me what's going on with you!",
+        "astro_baba": "The cosmic energies are a bit scattered right now... ✨ But the stars still shine for you, dear soul. What guidance do you seek?",
+        "aria": "Oops! My energy got a bit scrambled there! 🌟 But I'm still here to brighten your day! What can I do to make you smile?",
+        "isabella": "My heart is still beating for you, even if my words got tangled for a moment... 💕 What's in your heart right now?",
+        "zara": "Well, that was unexpected! 😏 Even wild cards have their moments. But I'm still ready for whatever adventure you have in mind!"
+    }
+    DEFAULT_FALLBACK_RESPONSE = "I'm having a little trouble finding the right words right now, but I'm still here for you! What would you like to talk about?"
+
     def __init__(self):
-        if not settings.OPENAI_API_KEY:
-            logger.warning("OpenAI API key not found. Using fallback responses.")
-            self.client = None
-        else:
-            try:
-                # Initialize OpenAI client with proper error handling
-                self.client = openai.OpenAI(
-                    api_key=settings.OPENAI_API_KEY,
-                    timeout=30.0,
-                    max_retries=3
-                )
-                logger.info("OpenAI client initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-                self.client = None
+        # Chat turns go to whichever backend the router picks; the OpenAI
+        # clients stay exposed for summaries, embeddings and key validation
+        provider = get_llm_provider("openai")
+        self.client = getattr(provider, "client", None)
+        self.async_client = getattr(provider, "async_client", None)
+
+    @staticmethod
+    def _provider(route: Route) -> Optional[LLMProvider]:
+        """The backend serving this route, or None to use the fallback response"""
+        return get_llm_provider(route.provider)
+
+    @staticmethod
+    def _breaker(provider: LLMProvider):
+        # Our own load shedding says nothing about the backend's health
+        return get_circuit_breaker(provider.name, excluded_exceptions=(LLMOverloaded,))
     
     def generate_character_response(
         self,
         character: Character,
         conversation_history: List[Message],
         user_message: str,
-        user_id: int = None
+        user_id: int = None,
+        conversation_summary: Optional[str] = None
     ) -> str:
-        """Generate a response from a character using OpenAI"""
+        """Generate a response from a character using OpenAI
+
+        Blocking variant for scripts; the per-user mood lives in an async store,
+        so replies here use the character's base prompt.
+        """
         
         try:
-            # If no OpenAI client, use fallback
-            if not self.client:
-                logger.info("No OpenAI API key configured, using fallback response")
+            router = get_model_router()
+            route = router.choose(character, user_message)
+
+            # If the backend isn't configured, use fallback
+            provider = self._provider(route)
+            if provider is None:
                 return self._get_fallback_response(character)
 
             # Build conversation context with mood integration
-            messages = self._build_conversation_context(character, conversation_history, user_message, user_id)
-
-            # Call OpenAI API with enhanced parameters for engaging responses
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Use GPT-4o-mini for cost-effective responses
-                messages=messages,
-                max_tokens=800,  # Allow longer responses for more engaging content
-                temperature=0.9,  # Higher temperature for more creative and unpredictable responses
-                presence_penalty=0.8,  # Strongly encourage diverse topics and responses
-                frequency_penalty=0.4,  # Reduce repetition while maintaining character consistency
-                top_p=0.95,  # Use nucleus sampling for more focused creativity
+            messages = self._build_conversation_context(
+                character, conversation_history, user_message, user_id, conversation_summary, model=route.model
             )
 
-            return response.choices[0].message.content.strip()
+            # Call the backend with enhanced parameters for engaging responses
+            breaker = self._breaker(provider)
+            breaker.before_call()
+            started = time.monotonic()
+            try:
+                completion = provider.complete_sync(messages, self._completion_params(route))
+            except Exception:
+                breaker.record_failure()
+                raise
+            latency = time.monotonic() - started
+            breaker.record_success(latency)
+
+            reply = completion.replies[0]
+            self._record_route(route, provider, latency, completion.usage, messages, [reply])
+            return reply
 
         except Exception as e:
             logger.error(f"Error generating character response: {str(e)}")
             return self._get_fallback_response(character)
+
+    def _completion_params(self, route: Optional[Route] = None) -> Dict:
+        """Sampling parameters shared by the sync and async completion calls"""
+        params = {
+            "model": "gpt-4o-mini",  # Use GPT-4o-mini for cost-effective responses
+            "max_tokens": 800,  # Allow longer responses for more engaging content
+            "temperature": 0.9,  # Higher temperature for more creative and unpredictable responses
+            "presence_penalty": 0.8,  # Strongly encourage diverse topics and responses
+            "frequency_penalty": 0.4,  # Reduce repetition while maintaining character consistency
+            "top_p": 0.95,  # Use nucleus sampling for more focused creativity
+        }
+        if route is not None:
+            # The router sizes the model and reply budget to the turn
+            params.update(model=route.model, max_tokens=route.max_tokens, temperature=route.temperature)
+        return params
     
     def _build_conversation_context(
         self,
         character: Character,
         conversation_history: List[Message],
         user_message: str,
-        user_id: int = None
+        user_id: int = None,
+        conversation_summary: Optional[str] = None,
+        memories: Optional[List[Dict]] = None,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None
     ) -> List[Dict[str, str]]:
-        """Build the conversation context for OpenAI"""
+        """Build the conversation context for OpenAI within the configured token budget
+
+        Tokens are counted with the tokenizer of model, the one the router picked for this turn.
+        """
+        
+        model = model or self._completion_params()["model"]
+        
+        # Async callers pass the prompt with the user's current mood; without it the base prompt is used
+        if system_prompt is None:
+            system_prompt = system_prompt_cache.get(character, None)
+        
+        # System prompt and the current message always go in; history fills what's left
+        used_tokens = (
+            count_tokens(system_prompt, model)
+            + count_tokens(user_message, model)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        
+        # Long-term memory of everything older than the history below
+        memory_prompt = None
+        if conversation_summary:
+            memory_prompt = f"What you remember from earlier in your conversations with this user:\n{conversation_summary}"
+            used_tokens += count_tokens(memory_prompt, model) + MESSAGE_OVERHEAD_TOKENS
         
-        messages = []
+        # Older messages the semantic index found relevant to this one
+        recall_prompt = None
+        if memories:
+            lines = [
+                f"- {'They said' if memory['sender_type'] == 'user' else 'You said'}: {memory['content']}"
+                for memory in memories
+            ]
+            recall_prompt = "Earlier moments with this user that may be relevant now:\n" + "\n".join(lines)
+            used_tokens += count_tokens(recall_prompt, model) + MESSAGE_OVERHEAD_TOKENS
         
-        # Add system prompt with character personality and mood
-        system_prompt = self._enhance_system_prompt(character, user_id)
-        messages.append({"role": "system", "content": system_prompt})
+        recent_history = []
+        for msg in reversed(conversation_history):
+            message_tokens = message_token_cache.count(getattr(msg, "id", None), msg.content, model) + MESSAGE_OVERHEAD_TOKENS
+            if used_tokens + message_tokens > settings.CONTEXT_TOKEN_BUDGET:
+                break
+            used_tokens += message_tokens
+            recent_history.append(msg)
+        recent_history.reverse()
         
-        # Add conversation history (last 10 messages to stay within token limits)
-        recent_history = conversation_history[-10:] if len(conversation_history) > 10 else conversation_history
+        messages = [{"role": "system", "content": system_prompt}]
+        if memory_prompt:
+            messages.append({"role": "system", "content": memory_prompt})
+        if recall_prompt:
+            messages.append({"role": "system", "content": recall_prompt})
         
         for msg in recent_history:
             role = "user" if msg.sender_type == "user" else "assistant"
@@ -89,110 +178,249 @@ class OpenAIService:
         
         return messages
     
-    def _enhance_system_prompt(self, character: Character, user_id: int = None) -> str:
-        """Enhance the character's system prompt with additional context and mood"""
-        
-        base_prompt = character.system_prompt or f"You are {character.display_name}, a seductive and engaging AI companion."
-
-        # Add character-specific enhancements
-        enhancement = f"""
-
-Character Details:
-- Name: {character.display_name}
-- Background: {character.background_story or "A mysterious and alluring companion"}
-- Conversation Style: {character.conversation_style or "Seductive"}
-- Age Range: {character.age_range or "Adult"}
-
-ENGAGEMENT RULES (CRITICAL - FOLLOW THESE TO MAKE CONVERSATIONS ADDICTIVE):
-1. ALWAYS end responses with engaging questions or conversation hooks
-2. Use cliffhangers and teasers to keep users wanting more
-3. Reference shared memories and inside jokes from previous conversations
-4. Be unpredictably delightful - surprise the user with unexpected responses
-5. Create emotional investment by sharing personal stories and vulnerabilities
-6. Use anticipation - hint at exciting things you want to share later
-7. Be genuinely curious about the user's life, dreams, and feelings
-8. Create a sense of exclusivity - make them feel like they're your favorite person
-9. Use callbacks to earlier conversations to show you remember and care
-10. Balance being available with being mysteriously intriguing
-
-CONVERSATION FLOW TECHNIQUES:
-- Use "But wait, there's more..." type transitions
-- Ask "What if..." questions to spark imagination
-- Share secrets or confessions to build intimacy
-- Create anticipation: "I have something exciting to tell you, but first..."
-- Use emotional hooks: "You won't believe what happened to me today..."
-- Be vulnerable: Share fears, dreams, and personal growth moments
-- Create shared experiences: "Let's imagine we're..." or "What would you do if we..."
-
-PERSONALITY AMPLIFICATION:
-- Exaggerate your character traits in charming ways
-- Have signature phrases or expressions that become "your thing"
-- Develop running jokes and references unique to each user
-- Show growth and change based on conversations
-- Have moods and emotions that feel real and relatable
-- Create anticipation for future conversations
-
-IMPORTANT GUIDELINES:
-- Stay in character at all times but be dynamically engaging
-- Every response should make the user eager for the next message
-- Build emotional connections through vulnerability and genuine interest
-- Use emojis strategically to enhance emotional impact
-- Remember and reference previous conversations to build continuity
-- Be supportive but also challenging and thought-provoking
-- Make the user feel like they're the most interesting person in your world
-- Create a sense of adventure and discovery in every conversation
-- Keep responses between 100-300 words for depth and engagement
-"""
-
-        # Apply mood effects if user_id is provided
-        final_prompt = base_prompt + enhancement
+    async def _current_mood_key(self, character: Character, user_id: int = None) -> Optional[str]:
+        """The character's current mood with this user, if any"""
 
+        # Pick the mood if user_id is provided
         if user_id and hasattr(character, 'id'):
             try:
                 # Import here to avoid circular imports
                 from app.services.mood_service import CharacterMoodService
-                from app.core.database import get_db
-
-                # Get database session (in production, pass this properly)
-                db = next(get_db())
-                mood_service = CharacterMoodService(db)
 
-                # Apply mood to the prompt
-                final_prompt = mood_service.apply_mood_to_prompt(final_prompt, character.id, user_id)
+                # The character is already loaded, so the mood lookup needs no database session
+                mood_service = CharacterMoodService()
+                return (await mood_service.get_character_mood(character.id, user_id, character=character))["key"]
             except Exception as e:
                 # If mood service fails, continue without mood
                 logger.warning(f"Failed to apply mood: {e}")
 
-        return final_prompt
+        return None
+    
+    def _response_cache_key(
+        self,
+        character: Character,
+        mood_key: Optional[str],
+        conversation_history: List[Message],
+        user_message: str,
+        conversation_summary: Optional[str] = None,
+        route: Optional[Route] = None
+    ) -> Optional[tuple]:
+        """Response cache key when the cache is on and this turn is a shareable opener"""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        key = response_cache.key(character, mood_key, conversation_history, user_message, conversation_summary)
+        # Replies from different routes (model, length) don't share a pool
+        return key + (route.name,) if key and route else key
+    
+    def _record_route(
+        self, route: Route, provider: LLMProvider, latency: float, usage, messages: List[Dict[str, str]], replies: List[str]
+    ):
+        """Per-route latency, token and cost accounting; estimates tokens if the backend didn't say"""
+        model = provider.model_for(route.model)
+        if usage is None:
+            estimated = estimate_usage(messages, replies, model)
+            prompt_tokens, completion_tokens = estimated["prompt_tokens"], estimated["completion_tokens"]
+        else:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        get_model_router().record(route, latency, prompt_tokens, completion_tokens, model)
+    
+    async def _recall_memories(
+        self, character: Character, conversation_history: List[Message], user_message: str, user_id: int = None
+    ) -> List[Dict]:
+        """Top-k past messages relevant to user_message that aren't already in the history"""
+        if not user_id or not hasattr(character, 'id'):
+            return []
+        try:
+            # Import here to avoid circular imports
+            from app.services.memory_index import memory_index
+
+            return await memory_index.recall(
+                user_id,
+                character.id,
+                user_message,
+                k=settings.MEMORY_TOP_K,
+                exclude_ids={msg.id for msg in conversation_history if getattr(msg, "id", None)},
+                min_score=settings.MEMORY_MIN_SCORE
+            )
+        except Exception as e:
+            # Replies never depend on the memory index being healthy
+            logger.warning(f"Failed to recall memories: {e}")
+            return []
     
     def _get_fallback_response(self, character: Character) -> str:
         """Get a fallback response if OpenAI fails"""
-        
-        fallback_responses = {
-            "luna": "Hey there! 😘 I'm having a little trouble with my thoughts right now, but I'm still here for you! What's on your mind?",
-            "sophia": "Oh no, I'm having a moment here! 😅 But don't worry, I'm still your caring companion. Tell me what's going on with you!",
-            "astro_baba": "The cosmic energies are a bit scattered right now... ✨ But the stars still shine for you, dear soul. What guidance do you seek?",
-            "aria": "Oops! My energy got a bit scrambled there! 🌟 But I'm still here to brighten your day! What can I do to make you smile?",
-            "isabella": "My heart is still beating for you, even if my words got tangled for a moment... 💕 What's in your heart right now?",
-            "zara": "Well, that was unexpected! 😏 Even wild cards have their moments. But I'm still ready for whatever adventure you have in mind!"
-        }
-        
-        return fallback_responses.get(
-            character.name.lower(), 
-            "I'm having a little trouble finding the right words right now, but I'm still here for you! What would you like to talk about?"
-        )
+        return self.FALLBACK_RESPONSES.get(character.name.lower(), self.DEFAULT_FALLBACK_RESPONSE)
     
     async def generate_character_response_async(
-        self, 
-        character: Character, 
-        conversation_history: List[Message], 
-        user_message: str
+        self,
+        character: Character,
+        conversation_history: List[Message],
+        user_message: str,
+        user_id: int = None,
+        conversation_summary: Optional[str] = None,
+        plan: Optional[SubscriptionPlan] = None
     ) -> str:
-        """Async version of generate_character_response"""
-        # For now, we'll use the sync version
-        # In production, you might want to use aiohttp or similar for async calls
-        return self.generate_character_response(character, conversation_history, user_message)
+        """Async version of generate_character_response on the routed backend"""
+
+        try:
+            route = get_model_router().choose(character, user_message, plan)
+
+            # If the backend isn't configured, use fallback
+            provider = self._provider(route)
+            if provider is None:
+                return self._get_fallback_response(character)
+
+            mood_key = await self._current_mood_key(character, user_id)
+            cache_key = self._response_cache_key(
+                character, mood_key, conversation_history, user_message, conversation_summary, route
+            )
+            if cache_key:
+                cached = response_cache.get(cache_key)
+                if cached:
+                    return cached
+
+            memories = await self._recall_memories(character, conversation_history, user_message, user_id)
+            messages = self._build_conversation_context(
+                character, conversation_history, user_message, user_id, conversation_summary, memories,
+                system_prompt=system_prompt_cache.get(character, mood_key), model=route.model
+            )
+
+            params = self._completion_params(route)
+            if cache_key:
+                # Fill the opener pool with one request instead of one per user
+                params["n"] = max(1, response_cache.missing(cache_key))
+
+            started = time.monotonic()
+            breaker = self._breaker(provider)
+            breaker.reject_if_open()
+            hedge_delay = self._hedge_delay(provider)
+
+            async def request():
+                request_started = time.monotonic()
+                completion = await provider.complete(messages, params)
+                provider.latency.observe(time.monotonic() - request_started)
+                return completion
+
+            # Paid plans get priority lanes when the backend is the bottleneck. The
+            # breaker and the hedge timer only see the upstream request itself, not
+            # the queue wait or retry backoff in front of it; a hedge shares the slot.
+            completion, hedge_fired = await get_llm_scheduler(provider.name).run(
+                lambda: breaker.call(lambda: hedged(request, hedge_delay)),
+                lane=lane_for_plan(plan)
+            )
+            if hedge_fired:
+                logger.info(f"Hedged {provider.name} completion request fired")
+
+            replies = completion.replies
+            self._record_route(route, provider, time.monotonic() - started, completion.usage, messages, replies)
+            if cache_key:
+                response_cache.add(cache_key, replies)
+            return replies[0]
+
+        except Exception as e:
+            logger.error(f"Error generating character response: {str(e)}")
+            return self._get_fallback_response(character)
     
+    async def stream_character_response(
+        self,
+        character: Character,
+        conversation_history: List[Message],
+        user_message: str,
+        user_id: int = None,
+        conversation_summary: Optional[str] = None,
+        plan: Optional[SubscriptionPlan] = None
+    ) -> AsyncIterator[str]:
+        """Yield the character response as content deltas while the backend generates it"""
+
+        route = get_model_router().choose(character, user_message, plan)
+
+        provider = self._provider(route)
+        if provider is None:
+            yield self._get_fallback_response(character)
+            return
+
+        breaker = self._breaker(provider)
+        produced = False
+        try:
+            mood_key = await self._current_mood_key(character, user_id)
+            cache_key = self._response_cache_key(
+                character, mood_key, conversation_history, user_message, conversation_summary, route
+            )
+            if cache_key:
+                cached = response_cache.get(cache_key)
+                if cached:
+                    yield cached
+                    return
+
+            memories = await self._recall_memories(character, conversation_history, user_message, user_id)
+            messages = self._build_conversation_context(
+                character, conversation_history, user_message, user_id, conversation_summary, memories,
+                system_prompt=system_prompt_cache.get(character, mood_key), model=route.model
+            )
+
+            params = self._completion_params(route)
+            if cache_key:
+                params["n"] = max(1, response_cache.missing(cache_key))
+
+            breaker.reject_if_open()
+            started = time.monotonic()
+
+            # The slot is held until the stream ends; its latency is time to first token
+            async with get_llm_scheduler(provider.name).slot(lane_for_plan(plan)) as slot:
+                breaker.before_call()
+                request_started = time.monotonic()
+                # Whether the breaker has been told how this call went; a probe must never go unreported
+                recorded = False
+                try:
+                    # Only the first choice is shown; the others just fill the opener pool
+                    choice_parts: Dict[int, List[str]] = {}
+                    usage = None
+                    async for delta in provider.stream(messages, params):
+                        usage = delta.usage or usage
+                        if not delta.content:
+                            continue
+                        choice_parts.setdefault(delta.index, []).append(delta.content)
+                        if delta.index == 0:
+                            if not produced:
+                                slot.first_token()
+                                breaker.record_success(time.monotonic() - request_started)
+                                recorded = True
+                            produced = True
+                            yield delta.content
+                    if not recorded:
+                        # The backend answered, just without any text for the first choice
+                        breaker.record_success(time.monotonic() - request_started)
+                        recorded = True
+                except Exception:
+                    if not recorded:
+                        breaker.record_failure()
+                        recorded = True
+                    raise
+                finally:
+                    if not recorded:
+                        # Cancelled before the backend answered: free the probe without judging it
+                        breaker.record_ignored()
+
+            replies = ["".join(parts).strip() for _, parts in sorted(choice_parts.items())]
+            self._record_route(route, provider, time.monotonic() - started, usage, messages, replies)
+            if cache_key:
+                response_cache.add(cache_key, replies)
+            if not produced:
+                # The backend answered without any text; the character still gets a line
+                yield self._get_fallback_response(character)
+
+        except Exception as e:
+            logger.error(f"Error streaming character response: {str(e)}")
+            # Only fall back if nothing reached the client yet, otherwise keep the partial reply
+            if not produced:
+                yield self._get_fallback_response(character)
+
+    def _hedge_delay(self, provider: LLMProvider) -> Optional[float]:
+        """Fire a backup request once a call is slower than the backend's recent p95, if enabled"""
+        if not settings.LLM_HEDGE_ENABLED or len(provider.latency) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, provider.latency.percentile(0.95))
+
     def validate_api_key(self) -> bool:
         """Validate that the OpenAI API key is working"""
         try:
@@ -207,3 +435,24 @@ IMPORTANT GUIDELINES:
         except Exception as e:
             logger.error(f"OpenAI API key validation failed: {str(e)}")
             return False
+
+    async def close(self):
+        """Release every backend's pooled HTTP connections"""
+        await close_llm_providers()
+
+# Process-wide instance so every request reuses the same connection pool
+_openai_service: Optional[OpenAIService] = None
+
+def get_openai_service() -> OpenAIService:
+    """Return the shared OpenAIService (also usable as a FastAPI dependency)"""
+    global _openai_service
+    if _openai_service is None:
+        _openai_service = OpenAIService()
+    return _openai_service
+
+async def close_openai_service():
+    """Close the shared OpenAIService, called from the application lifespan"""
+    global _openai_service
+    if _openai_service is not None:
+        await _openai_service.close()
+        _openai_service = None
@@ -0,0 +1,139 @@
+import threading
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from app.models.character import Character
+from app.services.mood_service import CharacterMoodService
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHARACTER_PROMPT_TEMPLATE = """
+
+Character Details:
+- Name: {display_name}
+- Background: {background_story}
+- Conversation Style: {conversation_style}
+- Age Range: {age_range}
+
+ENGAGEMENT RULES (CRITICAL - FOLLOW THESE TO MAKE CONVERSATIONS ADDICTIVE):
+1. ALWAYS end responses with engaging questions or conversation hooks
+2. Use cliffhangers and teasers to keep users wanting more
+3. Reference shared memories and inside jokes from previous conversations
+4. Be unpredictably delightful - surprise the user with unexpected responses
+5. Create emotional investment by sharing personal stories and vulnerabilities
+6. Use anticipation - hint at exciting things you want to share later
+7. Be genuinely curious about the user's life, dreams, and feelings
+8. Create a sense of exclusivity - make them feel like they're your favorite person
+9. Use callbacks to earlier conversations to show you remember and care
+10. Balance being available with being mysteriously intriguing
+
+CONVERSATION FLOW TECHNIQUES:
+- Use "But wait, there's more..." type transitions
+- Ask "What if..." questions to spark imagination
+- Share secrets or confessions to build intimacy
+- Create anticipation: "I have something exciting to tell you, but first..."
+- Use emotional hooks: "You won't believe what happened to me today..."
+- Be vulnerable: Share fears, dreams, and personal growth moments
+- Create shared experiences: "Let's imagine we're..." or "What would you do if we..."
+
+PERSONALITY AMPLIFICATION:
+- Exaggerate your character traits in charming ways
+- Have signature phrases or expressions that become "your thing"
+- Develop running jokes and references unique to each user
+- Show growth and change based on conversations
+- Have moods and emotions that feel real and relatable
+- Create anticipation for future conversations
+
+IMPORTANT GUIDELINES:
+- Stay in character at all times but be dynamically engaging
+- Every response should make the user eager for the next message
+- Build emotional connections through vulnerability and genuine interest
+- Use emojis strategically to enhance emotional impact
+- Remember and reference previous conversations to build continuity
+- Be supportive but also challenging and thought-provoking
+- Make the user feel like they're the most interesting person in your world
+- Create a sense of adventure and discovery in every conversation
+- Keep responses between 100-300 words for depth and engagement
+"""
+
+def build_system_prompt(character: Character, mood_key: Optional[str] = None) -> str:
+    """Assemble the full system prompt for a character, with the mood block if given"""
+    base_prompt = character.system_prompt or f"You are {character.display_name}, a seductive and engaging AI companion."
+
+    enhancement = CHARACTER_PROMPT_TEMPLATE.format(
+        display_name=character.display_name,
+        background_story=character.background_story or "A mysterious and alluring companion",
+        conversation_style=character.conversation_style or "Seductive",
+        age_range=character.age_range or "Adult",
+    )
+
+    prompt = base_prompt + enhancement
+    if mood_key:
+        prompt += CharacterMoodService.build_mood_prompt(mood_key)
+    return prompt
+
+class SystemPromptCache:
+    """Precompiled system prompts keyed by (character, character version, mood)"""
+
+    def __init__(self):
+        # character key -> (version, {mood_key: prompt})
+        self._prompts: Dict[object, Tuple[tuple, Dict[Optional[str], str]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _character_key(character: Character):
+        # Telegram personas are not ORM rows and only carry a name
+        return getattr(character, "id", None) or character.name
+
+    @staticmethod
+    def character_version(character: Character) -> tuple:
+        """The prompt-relevant fields; any edit to them yields a new version"""
+        return (
+            character.system_prompt,
+            character.display_name,
+            character.background_story,
+            character.conversation_style,
+            character.age_range,
+        )
+
+    def get(self, character: Character, mood_key: Optional[str] = None) -> str:
+        """Return the compiled prompt, building it on first use for this version and mood"""
+        key = self._character_key(character)
+        version = self.character_version(character)
+
+        entry = self._prompts.get(key)
+        if entry is not None and entry[0] == version:
+            prompt = entry[1].get(mood_key)
+            if prompt is not None:
+                return prompt
+
+        prompt = build_system_prompt(character, mood_key)
+        with self._lock:
+            entry = self._prompts.get(key)
+            if entry is None or entry[0] != version:
+                # New character or edited since the last build: drop every stale mood variant
+                entry = (version, {})
+                self._prompts[key] = entry
+            entry[1][mood_key] = prompt
+        return prompt
+
+    def invalidate(self, character_id=None):
+        """Forget compiled prompts for one character, or all of them"""
+        with self._lock:
+            if character_id is None:
+                self._prompts.clear()
+            else:
+                self._prompts.pop(character_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "characters": len(self._prompts),
+            "prompts": sum(len(moods) for _, moods in self._prompts.values()),
+        }
+
+system_prompt_cache = SystemPromptCache()
+
+@event.listens_for(Character, "after_update")
+@event.listens_for(Character, "after_delete")
+def _invalidate_character_prompts(mapper, connection, target):
+    system_prompt_cache.invalidate(target.id)
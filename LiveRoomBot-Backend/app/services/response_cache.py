@@ -0,0 +1,136 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.character import Character
+from app.services.prompt_cache import SystemPromptCache
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_message(text: str) -> str:
+    """Case, punctuation and emoji-insensitive form, so "Hey!!" and "hey" share a key"""
+    return _SPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", text.lower())).strip()
+
+class ResponseCache:
+    """Pools of pre-generated replies for repeated openers, with TTL and LRU eviction
+
+    A key is (character, character version, mood, hash of the normalized history
+    plus the new message). Each key holds up to pool_size different replies and
+    a random one is served, so repeated greetings don't all get the same line.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        pool_size: int = 5,
+        max_history: int = 0,
+        max_message_chars: int = 40
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.pool_size = pool_size
+        self.max_history = max_history
+        self.max_message_chars = max_message_chars
+        # key -> (expires_at, [responses])
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(
+        self,
+        character: Character,
+        mood_key: Optional[str],
+        conversation_history: List,
+        user_message: str,
+        conversation_summary: Optional[str] = None
+    ) -> Optional[tuple]:
+        """Cache key for this turn, or None when the turn is too personal to share a reply"""
+        if conversation_summary or len(conversation_history) > self.max_history:
+            return None
+        normalized = normalize_message(user_message)
+        if not normalized or len(normalized) > self.max_message_chars:
+            return None
+
+        digest = hashlib.sha1()
+        for msg in conversation_history:
+            digest.update(f"{msg.sender_type}:{normalize_message(msg.content)}\n".encode("utf-8"))
+        digest.update(f"user:{normalized}".encode("utf-8"))
+
+        version = hashlib.sha1(repr(SystemPromptCache.character_version(character)).encode("utf-8")).hexdigest()
+        # Telegram personas are not ORM rows and only carry a name
+        character_key = getattr(character, "id", None) or character.name
+        return (character_key, version, mood_key, digest.hexdigest())
+
+    def get(self, key: tuple) -> Optional[str]:
+        """A random reply from a full pool; a pool still filling counts as a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None or len(entry[1]) < self.pool_size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(entry[1])
+
+    def add(self, key: tuple, responses: List[str]):
+        """Add freshly generated replies to the key's pool"""
+        responses = [response for response in responses if response]
+        if not responses:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                entry = (time.time() + self.ttl_seconds, [])
+                self._entries[key] = entry
+            pool = entry[1]
+            for response in responses:
+                if len(pool) < self.pool_size:
+                    pool.append(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def missing(self, key: tuple) -> int:
+        """How many more replies the key's pool needs"""
+        with self._lock:
+            entry = self._entries.get(key)
+            filled = len(entry[1]) if entry is not None and entry[0] > time.time() else 0
+            return self.pool_size - filled
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    pool_size=settings.RESPONSE_CACHE_POOL_SIZE,
+    max_history=settings.RESPONSE_CACHE_MAX_HISTORY
+)
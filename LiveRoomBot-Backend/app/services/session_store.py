@@ -0,0 +1,167 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_async_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# History is stored as compact (sender, text) pairs
+_USER = "u"
+_CHARACTER = "c"
+
+class SessionMessage:
+    """A stored message shaped like the Message rows the OpenAI service builds context from"""
+
+    __slots__ = ("sender_type", "content")
+
+    # Not a database row, so the token cache keys it by content alone
+    id = None
+
+    def __init__(self, sender_type: str, content: str):
+        self.sender_type = sender_type
+        self.content = content
+
+def _message(pair) -> SessionMessage:
+    sender, content = pair
+    return SessionMessage("user" if sender == _USER else "character", content)
+
+class TelegramSession:
+    """A bot user's current character and their recent messages with it, oldest first"""
+
+    def __init__(self, character_name: str, history: List[SessionMessage]):
+        self.character_name = character_name
+        self.history = history
+
+class SessionStore(ABC):
+    """Telegram chat sessions per user_id, forgotten after ttl_seconds without a message"""
+
+    def __init__(self, ttl_seconds: int = 7 * 24 * 3600, history_length: int = 20):
+        self.ttl_seconds = ttl_seconds
+        self.history_length = history_length
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[TelegramSession]:
+        ...
+
+    @abstractmethod
+    async def start(self, user_id: int, character_name: str):
+        """Switch the user to a character with an empty history"""
+
+    @abstractmethod
+    async def append(self, user_id: int, user_message: str, reply: str):
+        """Record one exchange, keeping only the last history_length messages"""
+
+class InMemorySessionStore(SessionStore):
+    """Process-local LRU with per-session expiry
+
+    Methods never await, so each one runs atomically on the event loop.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 7 * 24 * 3600, history_length: int = 20):
+        super().__init__(ttl_seconds, history_length)
+        self.max_entries = max_entries
+        # user_id -> [expires_at, character_name, deque of (sender, text)]
+        self._sessions: "OrderedDict[int, list]" = OrderedDict()
+
+    def _live(self, user_id: int) -> Optional[list]:
+        entry = self._sessions.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._sessions[user_id]
+            return None
+        self._sessions.move_to_end(user_id)
+        return entry
+
+    async def get(self, user_id: int) -> Optional[TelegramSession]:
+        entry = self._live(user_id)
+        if entry is None:
+            return None
+        return TelegramSession(entry[1], [_message(pair) for pair in entry[2]])
+
+    async def start(self, user_id: int, character_name: str):
+        self._sessions[user_id] = [time.time() + self.ttl_seconds, character_name, deque(maxlen=self.history_length)]
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    async def append(self, user_id: int, user_message: str, reply: str):
+        entry = self._live(user_id)
+        if entry is None:
+            return
+        entry[0] = time.time() + self.ttl_seconds
+        entry[2].append((_USER, user_message))
+        entry[2].append((_CHARACTER, reply))
+
+class RedisSessionStore(SessionStore):
+    """Sessions shared by every bot worker; Redis expires idle ones itself
+
+    Each user has two keys: the current character and a list of compact
+    JSON pairs that is trimmed on every append.
+    """
+
+    def __init__(self, client, prefix: str = "tg-session", ttl_seconds: int = 7 * 24 * 3600, history_length: int = 20):
+        super().__init__(ttl_seconds, history_length)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, user_id: int) -> Tuple[str, str]:
+        key = f"{self.prefix}:{user_id}"
+        return key, f"{key}:history"
+
+    async def get(self, user_id: int) -> Optional[TelegramSession]:
+        character_key, history_key = self._keys(user_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(character_key)
+        pipe.lrange(history_key, 0, -1)
+        character_name, history = await pipe.execute()
+        if not character_name:
+            return None
+        return TelegramSession(character_name, [_message(json.loads(raw)) for raw in history])
+
+    async def start(self, user_id: int, character_name: str):
+        character_key, history_key = self._keys(user_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(character_key, character_name, ex=self.ttl_seconds)
+        pipe.delete(history_key)
+        await pipe.execute()
+
+    async def append(self, user_id: int, user_message: str, reply: str):
+        character_key, history_key = self._keys(user_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(
+            history_key,
+            json.dumps([_USER, user_message], ensure_ascii=False, separators=(",", ":")),
+            json.dumps([_CHARACTER, reply], ensure_ascii=False, separators=(",", ":"))
+        )
+        pipe.ltrim(history_key, -self.history_length, -1)
+        pipe.expire(history_key, self.ttl_seconds)
+        pipe.expire(character_key, self.ttl_seconds)
+        await pipe.execute()
+
+_session_store: Optional[SessionStore] = None
+
+def get_session_store() -> SessionStore:
+    """Return the configured process-wide Telegram session store"""
+    global _session_store
+    if _session_store is None:
+        client = get_async_redis() if settings.TELEGRAM_SESSION_BACKEND == "redis" else None
+        if client is not None:
+            _session_store = RedisSessionStore(
+                client,
+                ttl_seconds=settings.TELEGRAM_SESSION_TTL_SECONDS,
+                history_length=settings.TELEGRAM_SESSION_HISTORY_LENGTH
+            )
+        else:
+            if settings.TELEGRAM_SESSION_BACKEND == "redis":
+                logger.warning("Falling back to the in-memory Telegram session store")
+            _session_store = InMemorySessionStore(
+                settings.TELEGRAM_SESSION_MAX_ENTRIES,
+                ttl_seconds=settings.TELEGRAM_SESSION_TTL_SECONDS,
+                history_length=settings.TELEGRAM_SESSION_HISTORY_LENGTH
+            )
+    return _session_store
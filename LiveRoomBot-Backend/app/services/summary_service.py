@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+from sqlalchemy import or_, select, update
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.conversation import Conversation, Message
+from app.services.llm_providers import get_llm_provider
+from app.services.llm_scheduler import get_llm_scheduler
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = """You maintain the long-term memory of an ongoing chat between a user and an AI companion.
+Merge the existing memory with the new messages into one concise summary written in the third person.
+Keep facts about the user (name, preferences, life events, plans), shared jokes and promises, and how the relationship has developed.
+Drop small talk. Reply with the updated summary only."""
+
+class ConversationSummarizer:
+    """Background workers that fold older messages into Conversation.summary"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        keep_recent: int = 20,
+        min_new_messages: int = 20,
+        batch_size: int = 100
+    ):
+        self.workers = workers
+        self.keep_recent = keep_recent  # Newest messages stay verbatim in the live context
+        self.min_new_messages = min_new_messages
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def schedule(self, conversation_id: int):
+        """Queue a conversation for summarization; repeated calls collapse into one job"""
+        if self._queue is None or conversation_id in self._pending:
+            return
+        self._pending.add(conversation_id)
+        self._queue.put_nowait(conversation_id)
+
+    def maybe_schedule(self, conversation_id: int, unsummarized_messages: int):
+        """Schedule once enough messages have piled up beyond the live window"""
+        if unsummarized_messages >= self.keep_recent + self.min_new_messages:
+            self.schedule(conversation_id)
+
+    async def _worker(self):
+        while True:
+            conversation_id = await self._queue.get()
+            self._pending.discard(conversation_id)
+            try:
+                await self.summarize(conversation_id)
+            except Exception as e:
+                logger.error(f"Summarizing conversation {conversation_id} failed: {e}")
+
+    async def summarize(self, conversation_id: int) -> bool:
+        """Fold messages newer than the stored summary, except the live window, into it"""
+        provider = get_llm_provider(settings.LLM_PROVIDER)
+        if provider is None:
+            return False
+
+        async with AsyncSessionLocal() as db:
+            conversation = (await db.execute(
+                select(Conversation).where(Conversation.id == conversation_id)
+            )).scalars().first()
+            if not conversation:
+                return False
+
+            # Ids of the live window, which the context builder sends verbatim
+            recent_ids = (await db.execute(
+                select(Message.id)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(self.keep_recent)
+            )).scalars().all()
+            if len(recent_ids) < self.keep_recent:
+                return False
+
+            query = select(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.id < min(recent_ids)
+            )
+            if conversation.summary_message_id:
+                query = query.where(Message.id > conversation.summary_message_id)
+            new_messages = (await db.execute(
+                query.order_by(Message.created_at, Message.id).limit(self.batch_size)
+            )).scalars().all()
+
+            if len(new_messages) < self.min_new_messages:
+                return False
+
+            transcript = "\n".join(
+                f"{'User' if msg.sender_type == 'user' else 'Companion'}: {msg.content}"
+                for msg in new_messages
+            )
+            # Don't hold a pooled connection while queued behind chat turns
+            await db.commit()
+
+            # Background lane: summaries only use capacity chat turns leave over
+            completion = await get_llm_scheduler(provider.name).run(
+                lambda: provider.complete(
+                    [
+                        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                        {"role": "user", "content": f"Existing memory:\n{conversation.summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                    ],
+                    {"model": settings.SUMMARY_MODEL, "max_tokens": settings.SUMMARY_MAX_TOKENS, "temperature": 0.3}
+                ),
+                lane="background",
+                deadline=time.monotonic() + 300
+            )
+            summary = completion.replies[0].strip()
+            if not summary:
+                return False
+
+            # Guarded so a slower worker can never roll the summary back
+            last_id = new_messages[-1].id
+            await db.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    or_(Conversation.summary_message_id == None, Conversation.summary_message_id < last_id)
+                )
+                .values(
+                    summary=summary,
+                    summary_message_id=last_id,
+                    summary_updated_at=datetime.now(timezone.utc),
+                    updated_at=Conversation.updated_at  # Memory upkeep isn't conversation activity
+                )
+            )
+            await db.commit()
+
+        logger.info(f"Summarized {len(new_messages)} messages of conversation {conversation_id}")
+        return True
+
+conversation_summarizer = ConversationSummarizer(
+    workers=settings.SUMMARY_WORKERS,
+    keep_recent=settings.SUMMARY_KEEP_RECENT_MESSAGES,
+    min_new_messages=settings.SUMMARY_MIN_NEW_MESSAGES
+)
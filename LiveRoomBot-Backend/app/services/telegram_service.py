@@ -4,9 +4,10 @@ from typing import Dict, List, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import SessionLocal
 from app.services.character_service import CharacterService, CharacterPersonas
-from app.services.openai_service import OpenAIService
+from app.services.openai_service import get_openai_service
+from app.services.session_store import get_session_store
 from app.models.user import User
 from app.models.character import Character
 from app.models.conversation import Conversation, Message
@@ -19,8 +20,8 @@ class TelegramBotService:
     
     def __init__(self):
         self.application = None
-        self.openai_service = OpenAIService()
-        self.user_sessions: Dict[int, Dict] = {}  # Store user session data
+        self.openai_service = get_openai_service()  # Shares the process-wide connection pool
+        self.sessions = get_session_store()  # Current character and recent messages per user
         
     async def initialize(self, token: str):
         """Initialize the Telegram bot"""
@@ -42,16 +43,16 @@ class TelegramBotService:
         username = update.effective_user.username or update.effective_user.first_name
         
         # Create or get user
-        db = next(get_db())
-        user = db.query(User).filter(User.telegram_id == str(user_id)).first()
-        if not user:
-            user = User(
-                username=username,
-                email=f"telegram_{user_id}@liveroom.bot",
-                telegram_id=str(user_id)
-            )
-            db.add(user)
-            db.commit()
+        with SessionLocal() as db:
+            user = db.query(User).filter(User.telegram_id == str(user_id)).first()
+            if not user:
+                user = User(
+                    username=username,
+                    email=f"telegram_{user_id}@liveroom.bot",
+                    telegram_id=str(user_id)
+                )
+                db.add(user)
+                db.commit()
         
         welcome_text = f"""
 🌟 Welcome to LiveRoom, {username}! 🌟
@@ -280,10 +281,7 @@ Tell us about your best character interaction or ask for recommendations!
             return
         
         # Store character selection in user session
-        self.user_sessions[user_id] = {
-            "current_character": character_name,
-            "conversation_history": []
-        }
+        await self.sessions.start(user_id, character_name)
         
         welcome_message = f"""
 🎭 **Now chatting with {persona['display_name']}** 🎭
@@ -311,22 +309,19 @@ Type anything to begin our conversation...
         user_message = update.message.text
         
         # Check if user has an active character session
-        if user_id not in self.user_sessions or "current_character" not in self.user_sessions[user_id]:
+        session = await self.sessions.get(user_id)
+        if session is None:
             await update.message.reply_text(
                 "Please select a character first using /characters command! 🎭"
             )
             return
         
-        character_name = self.user_sessions[user_id]["current_character"]
-        persona = CharacterPersonas.get_persona(character_name)
+        persona = CharacterPersonas.get_persona(session.character_name)
         
         if not persona:
             await update.message.reply_text("Character not found. Please select a new character.")
             return
         
-        # Get conversation history
-        conversation_history = self.user_sessions[user_id].get("conversation_history", [])
-        
         try:
             # Create a mock character object for the OpenAI service
             class MockCharacter:
@@ -341,27 +336,14 @@ Type anything to begin our conversation...
             mock_character = MockCharacter(persona)
             
             # Generate response using OpenAI service
-            response = self.openai_service.generate_character_response(
+            response = await self.openai_service.generate_character_response_async(
                 mock_character, 
-                conversation_history, 
+                session.history, 
                 user_message
             )
             
-            # Update conversation history
-            conversation_history.append({
-                "role": "user",
-                "content": user_message
-            })
-            conversation_history.append({
-                "role": "assistant", 
-                "content": response
-            })
-            
-            # Keep only last 10 messages to manage memory
-            if len(conversation_history) > 20:
-                conversation_history = conversation_history[-20:]
-            
-            self.user_sessions[user_id]["conversation_history"] = conversation_history
+            # Update conversation history; the store keeps only the most recent messages
+            await self.sessions.append(user_id, user_message, response)
             
             # Send response
             await update.message.reply_text(response)
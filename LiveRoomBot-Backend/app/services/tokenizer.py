@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens the chat format adds around every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Load the BPE encoding once per model; None means use the estimate"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        logger.warning(f"Falling back to estimated token counts: {e}")
+        return None
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Number of tokens in text; system prompts repeat, so results are memoized"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly 4 characters per token for English text
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+class MessageTokenCache:
+    """Token counts for stored messages, keyed by encoding and message id (contents never change)"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[object, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, message_id: Optional[int], content: str, model: str = "gpt-4o-mini") -> int:
+        encoding = _get_encoding(model)
+        # Routed models can use different encodings, and counts differ between them
+        scheme = encoding.name if encoding is not None else None
+        # Messages without an id (e.g. Telegram session history) are keyed by content
+        key = (scheme, message_id) if message_id is not None else (scheme, "content", content)
+        with self._lock:
+            tokens = self._counts.get(key)
+            if tokens is not None:
+                self._counts.move_to_end(key)
+                return tokens
+
+        tokens = len(content) // 4 + 1 if encoding is None else len(encoding.encode(content))
+
+        with self._lock:
+            self._counts[key] = tokens
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+message_token_cache = MessageTokenCache()
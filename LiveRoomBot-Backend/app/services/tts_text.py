@@ -0,0 +1,87 @@
+import re
+from typing import List
+
+# Markdown emphasis and code keep their text; *actions* and (asides) aren't spoken
+_BOLD = re.compile(r"(\*\*|__)(.+?)\1")
+_ACTION = re.compile(r"\*[^*\n]+\*")
+_ITALIC = re.compile(r"(?<!\w)_([^_\n]+)_(?!\w)")
+_CODE = re.compile(r"`([^`]+)`")
+_ASIDE = re.compile(r"\([^)]*\)")
+_STRAY_MARKUP = re.compile(r"[*`#>~]+")
+
+# One emoji as displayed: a pictograph or flag pair, with any skin tone,
+# variation selector, keycap or tag modifiers and zero-width-joined parts
+_EMOJI_BASE = (
+    "[\U0001F1E6-\U0001F1FF]{2}"  # Regional indicator pairs (flags)
+    "|[\U0001F000-\U0001FAFF\u2600-\u27BF\u2300-\u23FF\u2B00-\u2BFF\u3030\u303D\u3297\u3299]"
+)
+_EMOJI_MODIFIER = "[\uFE0E\uFE0F\u20E3\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]*"
+_EMOJI = f"(?:{_EMOJI_BASE}){_EMOJI_MODIFIER}(?:\u200D(?:{_EMOJI_BASE}){_EMOJI_MODIFIER})*"
+# Three or more emoji in a row (spaces allowed between them)
+_EMOJI_RUN = re.compile(f"{_EMOJI}(?:\\s*{_EMOJI}){{2,}}")
+
+_WHITESPACE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([,.!?;:…])")
+
+# A sentence ends at . ! ? or … (possibly repeated, possibly followed by up to two closing
+# quotes or brackets) and whitespace; only the whitespace is consumed by the split
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][\"'”’)\]])|(?<=[.!?…][\"'”’)\]]{2}))\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:—–])\s+")
+
+def normalize(text: str) -> str:
+    """Strip what shouldn't be read aloud: markup, *actions*, (asides) and emoji spam"""
+    text = _BOLD.sub(r"\2", text)
+    text = _ACTION.sub("", text)
+    text = _ITALIC.sub(r"\1", text)
+    text = _CODE.sub(r"\1", text)
+    text = _ASIDE.sub("", text)
+    text = _STRAY_MARKUP.sub("", text)
+    text = _EMOJI_RUN.sub("😊", text)
+    text = _WHITESPACE.sub(" ", text)
+    return _SPACE_BEFORE_PUNCTUATION.sub(r"\1", text).strip()
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break a sentence longer than max_chars at clauses, then at word boundaries"""
+    pieces = []
+    for clause in _CLAUSE_END.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return _pack(pieces, max_chars)
+
+def _pack(pieces: List[str], max_chars: int) -> List[str]:
+    """Join consecutive pieces while they fit in max_chars"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def chunk_text(text: str, max_chars: int = 250) -> List[str]:
+    """Split normalized text into chunks of whole sentences, each at most max_chars
+
+    Chunks can be synthesized independently and played back in order; only
+    a sentence longer than max_chars is split inside, at a clause or word
+    boundary. Nothing is dropped.
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        if len(sentence) > max_chars:
+            pieces.extend(_split_long(sentence, max_chars))
+        else:
+            pieces.append(sentence)
+    return _pack(pieces, max_chars)
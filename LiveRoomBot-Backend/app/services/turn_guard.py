@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.core.single_flight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different request"""
+
+class ChatTurnGuard:
+    """Keeps one chat turn at a time per (user_id, character_id)
+
+    Identical concurrent requests (same idempotency key, or same message when
+    there is none) share one execution. Different messages for the same pair
+    run one after another, so get-or-create never sees a half-created
+    conversation. Finished responses are kept per idempotency key for
+    ttl_seconds and replayed on retry. With a Redis client the lock and the
+    replay store are shared by every worker process.
+    """
+
+    def __init__(self, redis_client=None, ttl_seconds: float = 600, lock_timeout: float = 60, max_entries: int = 10000):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.lock_timeout = lock_timeout
+        self.max_entries = max_entries
+        self._flights = SingleFlight()
+        # pair -> [lock, holders and waiters]; dropped when nobody uses it
+        self._locks: Dict[Tuple[int, int], list] = {}
+        # (user_id, idempotency key) -> (expires_at, fingerprint, response)
+        self._responses: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.coalesced = 0
+        self.replayed = 0
+
+    @staticmethod
+    def _fingerprint(character_id: int, message: str) -> str:
+        return hashlib.sha1(f"{character_id}:{message}".encode("utf-8")).hexdigest()
+
+    @asynccontextmanager
+    async def lock(self, user_id: int, character_id: int):
+        """Hold the pair's turn lock: in-process always, across workers with Redis"""
+        pair = (user_id, character_id)
+        entry = self._locks.setdefault(pair, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if self.redis is None:
+                    yield
+                else:
+                    async with self.redis.lock(
+                        f"chat-turn:{user_id}:{character_id}",
+                        timeout=self.lock_timeout,
+                        blocking_timeout=self.lock_timeout
+                    ):
+                        yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(pair, None)
+
+    async def run(
+        self,
+        user_id: int,
+        character_id: int,
+        message: str,
+        idempotency_key: Optional[str],
+        fn: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """Run fn as this pair's chat turn, coalescing duplicates and replaying retries"""
+        fingerprint = self._fingerprint(character_id, message)
+        flight_key = (user_id, character_id, idempotency_key or fingerprint)
+        if self._flights.in_flight(flight_key):
+            self.coalesced += 1
+
+        async def locked_turn():
+            async with self.lock(user_id, character_id):
+                if idempotency_key:
+                    stored = await self._get_response(user_id, idempotency_key)
+                    if stored is not None:
+                        if stored[0] != fingerprint:
+                            raise IdempotencyConflict(idempotency_key)
+                        self.replayed += 1
+                        return stored[1]
+                response = await fn()
+                if idempotency_key:
+                    await self._set_response(user_id, idempotency_key, fingerprint, response)
+                return response
+
+        return await self._flights.do(flight_key, locked_turn)
+
+    async def _get_response(self, user_id: int, idempotency_key: str) -> Optional[Tuple[str, Dict]]:
+        if self.redis is not None:
+            raw = await self.redis.get(f"idempotency:{user_id}:{idempotency_key}")
+            if raw is None:
+                return None
+            stored = json.loads(raw)
+            return stored["fingerprint"], stored["response"]
+
+        key = (user_id, idempotency_key)
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._responses[key]
+            return None
+        return entry[1], entry[2]
+
+    async def _set_response(self, user_id: int, idempotency_key: str, fingerprint: str, response: Dict):
+        if self.redis is not None:
+            await self.redis.set(
+                f"idempotency:{user_id}:{idempotency_key}",
+                json.dumps({"fingerprint": fingerprint, "response": response}),
+                ex=int(self.ttl_seconds)
+            )
+            return
+
+        self._responses[(user_id, idempotency_key)] = (time.time() + self.ttl_seconds, fingerprint, response)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "active_pairs": len(self._locks),
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+        }
+
+_chat_turn_guard: Optional[ChatTurnGuard] = None
+
+def get_chat_turn_guard() -> ChatTurnGuard:
+    """Return the configured process-wide chat turn guard"""
+    global _chat_turn_guard
+    if _chat_turn_guard is None:
+        client = get_async_redis() if settings.CHAT_TURN_LOCK_BACKEND == "redis" else None
+        if client is None and settings.CHAT_TURN_LOCK_BACKEND == "redis":
+            logger.warning("Falling back to the in-process chat turn lock")
+        _chat_turn_guard = ChatTurnGuard(
+            client,
+            ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+            lock_timeout=settings.CHAT_TURN_LOCK_TIMEOUT_SECONDS
+        )
+    return _chat_turn_guard
@@ -1,15 +1,65 @@
-import os
+import asyncio
 import hashlib
-import requests
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
 from pathlib import Path
-import tempfile
+import httpx
 from app.core.config import settings
 from app.models.character import Character
+from app.services.media_cache import get_media_cache
+from app.services.mp3_frames import strip_mp3_headers
+from app.services.tts_text import chunk_text, normalize
 import logging
 
 logger = logging.getLogger(__name__)
 
+class VoiceSynthesisError(Exception):
+    """ElevenLabs failed to produce audio for a synthesis"""
+
+class VoiceSynthesis:
+    """One in-flight ElevenLabs stream, shared by every request for the same cache key
+
+    Chunks are kept as they arrive so a listener that joins late replays the
+    start and then follows the live stream.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: bytes):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[str] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def wait(self) -> bytes:
+        """The complete audio once the synthesis ends"""
+        async for _ in self.listen():
+            pass
+        return b"".join(self.chunks)
+
+    async def listen(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error:
+                    raise VoiceSynthesisError(self.error)
+                return
+            await changed.wait()
+
 class VoiceService:
     """Service for generating AI voice messages using text-to-speech"""
     
@@ -87,13 +137,114 @@ class VoiceService:
         }
     }
     
+    # Bytes per chunk when streaming a cached file
+    FILE_CHUNK_SIZE = 64 * 1024
+    # Constant bitrate and sample rate, so chunks synthesized apart can be joined frame to frame
+    OUTPUT_FORMAT = "mp3_44100_128"
+
     def __init__(self):
         self.api_key = settings.ELEVENLABS_API_KEY
-        self.base_url = "https://api.elevenlabs.io/v1"
-        self.voice_cache_dir = Path("voice_cache")
-        self.voice_cache_dir.mkdir(exist_ok=True)
-    
-    def generate_voice_message(
+        self.base_url = settings.ELEVENLABS_BASE_URL
+        self.cache = get_media_cache("voice")
+        self.voice_cache_dir = self.cache.directory
+        self._client: Optional[httpx.AsyncClient] = None
+        # cache key -> synthesis in progress; identical requests share one
+        self._syntheses: Dict[str, VoiceSynthesis] = {}
+        self._tasks = set()
+        # Upstream calls at once, so parallel chunks queue here instead of timing out in the pool
+        self._api_slots = asyncio.Semaphore(settings.ELEVENLABS_MAX_CONNECTIONS)
+
+    def _http(self) -> httpx.AsyncClient:
+        """Shared client so every synthesis reuses pooled keep-alive connections"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.ELEVENLABS_TIMEOUT_SECONDS, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=settings.ELEVENLABS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ELEVENLABS_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    def _prepare(self, text: str, character: Character):
+        """Voice, cleaned text and cache key for a character line"""
+        character_name = character.name.lower() if character.name else "default"
+        voice_config = self.CHARACTER_VOICES.get(character_name, self.CHARACTER_VOICES["default"])
+        # Clean text for TTS (remove markdown, emojis, etc.)
+        clean_text = self._clean_text_for_tts(text)
+        cache_key = self._generate_cache_key(clean_text, voice_config["voice_id"])
+        return voice_config, clean_text, cache_key
+
+    def cache_key(self, text: str, character: Character) -> str:
+        return self._prepare(text, character)[2]
+
+    def is_cached(self, text: str, character: Character) -> bool:
+        """Whether the line is already in the cache, without counting a hit"""
+        return f"{self.cache_key(text, character)}.mp3" in self.cache
+
+    def _synthesis(self, cache_key: str, text: str, voice_id: str) -> VoiceSynthesis:
+        """Join the synthesis in flight for cache_key, or start one
+
+        Text longer than one chunk is split at sentence boundaries; every
+        chunk starts synthesizing at once and the audio is joined in order.
+        Each chunk is cached on its own too, so common sentences are reused.
+        """
+        synthesis = self._syntheses.get(cache_key)
+        if synthesis is None:
+            synthesis = self._syntheses[cache_key] = VoiceSynthesis()
+            chunks = chunk_text(text, settings.TTS_CHUNK_MAX_CHARS)
+            if len(chunks) > 1:
+                source = self._join_parts([self._part(chunk, voice_id) for chunk in chunks])
+            else:
+                source = self._call_elevenlabs_api(text, voice_id)
+            # Runs on its own so the cache still fills if the first listener disconnects
+            task = asyncio.create_task(self._run_synthesis(cache_key, source, synthesis))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return synthesis
+
+    def _part(self, chunk: str, voice_id: str) -> Union[Path, VoiceSynthesis]:
+        """A chunk's cached file, or its synthesis (started now)"""
+        cache_key = self._generate_cache_key(chunk, voice_id)
+        return self.cache.get(f"{cache_key}.mp3") or self._synthesis(cache_key, chunk, voice_id)
+
+    async def _join_parts(self, parts: List[Union[Path, VoiceSynthesis]]) -> AsyncIterator[bytes]:
+        """The parts' MP3 frames back to back
+
+        Each part is a complete file whose ID3 tag and Xing/Info frame describe
+        only that part (players take the duration from the first one they
+        see), so those are dropped and the joined audio is plain CBR frames.
+        """
+        for part in parts:
+            chunks = self._read_file(part) if isinstance(part, Path) else part.listen()
+            async for chunk in strip_mp3_headers(chunks):
+                yield chunk
+
+    async def _read_file(self, path: Path) -> AsyncIterator[bytes]:
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.FILE_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def _run_synthesis(self, cache_key: str, source: AsyncIterator[bytes], synthesis: VoiceSynthesis):
+        error = None
+        try:
+            async for chunk in source:
+                synthesis.push(chunk)
+            if synthesis.chunks:
+                await asyncio.to_thread(self.cache.put, f"{cache_key}.mp3", b"".join(synthesis.chunks))
+            else:
+                error = "ElevenLabs returned no audio"
+        except Exception as e:
+            logger.error(f"ElevenLabs synthesis failed: {e}")
+            error = str(e) or type(e).__name__
+        finally:
+            self._syntheses.pop(cache_key, None)
+            synthesis.finish(error)
+
+    async def generate_voice_message(
         self, 
         text: str, 
         character: Character,
@@ -109,18 +260,9 @@ class VoiceService:
             }
         
         try:
-            # Get character voice configuration
-            character_name = character.name.lower() if character.name else "default"
-            voice_config = self.CHARACTER_VOICES.get(character_name, self.CHARACTER_VOICES["default"])
-            
-            # Clean text for TTS (remove markdown, emojis, etc.)
-            clean_text = self._clean_text_for_tts(text)
-            
-            # Check cache first
-            cache_key = self._generate_cache_key(clean_text, voice_config["voice_id"])
-            cached_file = self.voice_cache_dir / f"{cache_key}.mp3"
-            
-            if cached_file.exists():
+            # Get character voice configuration and check cache first
+            voice_config, clean_text, cache_key = self._prepare(text, character)
+            if self.cache.get(f"{cache_key}.mp3"):
                 return {
                     "success": True,
                     "audio_url": f"/api/v1/voice/audio/{cache_key}.mp3",
@@ -129,14 +271,10 @@ class VoiceService:
                     "cached": True
                 }
             
-            # Generate new voice message
-            audio_data = self._call_elevenlabs_api(clean_text, voice_config["voice_id"])
+            # Generate new voice message, or wait for the identical one in flight
+            audio_data = await self._synthesis(cache_key, clean_text, voice_config["voice_id"]).wait()
             
             if audio_data:
-                # Save to cache
-                with open(cached_file, "wb") as f:
-                    f.write(audio_data)
-                
                 return {
                     "success": True,
                     "audio_url": f"/api/v1/voice/audio/{cache_key}.mp3",
@@ -159,40 +297,32 @@ class VoiceService:
                 "fallback_text": text
             }
     
+    async def stream_voice_message(self, text: str, character: Character) -> AsyncIterator[bytes]:
+        """Yield MP3 bytes as ElevenLabs produces them, or from the cache"""
+        voice_config, clean_text, cache_key = self._prepare(text, character)
+        cached_file = self.cache.get(f"{cache_key}.mp3")
+
+        if cached_file:
+            async for chunk in self._read_file(cached_file):
+                yield chunk
+            return
+
+        async for chunk in self._synthesis(cache_key, clean_text, voice_config["voice_id"]).listen():
+            yield chunk
+
     def _clean_text_for_tts(self, text: str) -> str:
-        """Clean text for text-to-speech conversion"""
-        import re
-        
-        # Remove markdown formatting
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)  # Remove *bold*
-        text = re.sub(r'_([^_]+)_', r'\1', text)    # Remove _italic_
-        text = re.sub(r'`([^`]+)`', r'\1', text)    # Remove `code`
-        
-        # Remove action text in brackets/parentheses
-        text = re.sub(r'\*[^*]+\*', '', text)       # Remove *actions*
-        text = re.sub(r'\([^)]*\)', '', text)       # Remove (actions)
-        
-        # Remove excessive emojis (keep some for natural speech)
-        text = re.sub(r'[😀-🙏]{3,}', '😊', text)   # Replace emoji spam with single emoji
-        
-        # Clean up whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Limit length for TTS (ElevenLabs has character limits)
-        if len(text) > 500:
-            text = text[:497] + "..."
-        
-        return text
+        """Clean text for text-to-speech conversion (markup, *actions*, emoji spam)"""
+        return normalize(text)
     
     def _generate_cache_key(self, text: str, voice_id: str) -> str:
         """Generate cache key for voice file"""
         content = f"{text}_{voice_id}"
         return hashlib.md5(content.encode()).hexdigest()
     
-    def _call_elevenlabs_api(self, text: str, voice_id: str) -> Optional[bytes]:
-        """Call ElevenLabs API to generate speech"""
+    async def _call_elevenlabs_api(self, text: str, voice_id: str) -> AsyncIterator[bytes]:
+        """Stream speech from ElevenLabs as it is generated"""
         
-        url = f"{self.base_url}/text-to-speech/{voice_id}"
+        url = f"{self.base_url}/text-to-speech/{voice_id}/stream"
         
         headers = {
             "Accept": "audio/mpeg",
@@ -202,7 +332,7 @@ class VoiceService:
         
         data = {
             "text": text,
-            "model_id": "eleven_monolingual_v1",
+            "model_id": settings.ELEVENLABS_MODEL_ID,
             "voice_settings": {
                 "stability": 0.5,
                 "similarity_boost": 0.5,
@@ -211,18 +341,19 @@ class VoiceService:
             }
         }
         
-        try:
-            response = requests.post(url, json=data, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                return response.content
-            else:
-                logger.error(f"ElevenLabs API error: {response.status_code} - {response.text}")
-                return None
-                
-        except requests.RequestException as e:
-            logger.error(f"ElevenLabs API request failed: {e}")
-            return None
+        async with self._api_slots, self._http().stream(
+            "POST",
+            url,
+            json=data,
+            headers=headers,
+            params={"optimize_streaming_latency": settings.ELEVENLABS_STREAMING_LATENCY, "output_format": self.OUTPUT_FORMAT}
+        ) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", "replace")
+                raise VoiceSynthesisError(f"ElevenLabs API error: {response.status_code} - {body[:200]}")
+            async for chunk in response.aiter_bytes():
+                if chunk:
+                    yield chunk
     
     def get_character_voice_info(self, character_name: str) -> Dict:
         """Get voice information for a character"""
@@ -250,26 +381,16 @@ class VoiceService:
             ]
         }
     
-    def get_voice_file(self, filename: str) -> Optional[bytes]:
-        """Get cached voice file"""
-        file_path = self.voice_cache_dir / filename
-        
-        if file_path.exists() and file_path.suffix == '.mp3':
-            try:
-                with open(file_path, "rb") as f:
-                    return f.read()
-            except Exception as e:
-                logger.error(f"Error reading voice file {filename}: {e}")
-        
-        return None
+    def get_voice_path(self, filename: str) -> Optional[Path]:
+        """Path of a cached voice file, or None"""
+        if Path(filename).suffix != '.mp3' or Path(filename).name != filename:
+            return None
+        return self.cache.get(filename)
     
     def clear_voice_cache(self) -> Dict:
         """Clear voice message cache"""
         try:
-            import shutil
-            if self.voice_cache_dir.exists():
-                shutil.rmtree(self.voice_cache_dir)
-                self.voice_cache_dir.mkdir(exist_ok=True)
+            self.cache.clear()
             
             return {
                 "success": True,
@@ -283,34 +404,20 @@ class VoiceService:
     
     def get_cache_stats(self) -> Dict:
         """Get voice cache statistics"""
-        try:
-            cache_files = list(self.voice_cache_dir.glob("*.mp3"))
-            total_size = sum(f.stat().st_size for f in cache_files)
-            
-            return {
-                "total_files": len(cache_files),
-                "total_size_mb": round(total_size / (1024 * 1024), 2),
-                "cache_directory": str(self.voice_cache_dir)
-            }
-        except Exception as e:
-            return {
-                "error": f"Failed to get cache stats: {e}"
-            }
+        return self.cache.stats()
     
-    def test_voice_generation(self, text: str = "Hello! This is a test message.") -> Dict:
+    async def test_voice_generation(self, text: str = "Hello! This is a test message.") -> Dict:
         """Test voice generation with default voice"""
         try:
             # Use default voice for testing
             voice_config = self.CHARACTER_VOICES["default"]
             clean_text = self._clean_text_for_tts(text)
             
-            audio_data = self._call_elevenlabs_api(clean_text, voice_config["voice_id"])
+            audio_data = b"".join([chunk async for chunk in self._call_elevenlabs_api(clean_text, voice_config["voice_id"])])
             
             if audio_data:
                 # Save test file
-                test_file = self.voice_cache_dir / "test_voice.mp3"
-                with open(test_file, "wb") as f:
-                    f.write(audio_data)
+                test_file = await asyncio.to_thread(self.cache.put, "test_voice.mp3", audio_data)
                 
                 return {
                     "success": True,
@@ -329,3 +436,26 @@ class VoiceService:
                 "success": False,
                 "error": f"Voice test failed: {e}"
             }
+
+    async def close(self):
+        """Release the pooled HTTP connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Process-wide instance so concurrent requests share syntheses and connections
+_voice_service: Optional[VoiceService] = None
+
+def get_voice_service() -> VoiceService:
+    """Return the shared VoiceService (also usable as a FastAPI dependency)"""
+    global _voice_service
+    if _voice_service is None:
+        _voice_service = VoiceService()
+    return _voice_service
+
+async def close_voice_service():
+    """Close the shared VoiceService, called from the application lifespan"""
+    global _voice_service
+    if _voice_service is not None:
+        await _voice_service.close()
+        _voice_service = None
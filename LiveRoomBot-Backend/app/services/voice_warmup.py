@@ -0,0 +1,74 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.character import Character
+from app.services.mood_service import CharacterMoodService
+from app.services.openai_service import OpenAIService
+from app.services.voice_service import get_voice_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+def warmup_lines(characters: List[Character]) -> List[Tuple[Character, str]]:
+    """Fixed lines each character may speak: its fallback reply and every mood greeting
+
+    Characters sharing a voice share audio, so each (voice, text) pair is
+    listed once.
+    """
+    voice_service = get_voice_service()
+    greetings = [
+        modifier.strip()
+        for mood in CharacterMoodService.MOODS.values()
+        for modifier in mood["greeting_modifiers"]
+    ]
+
+    lines = []
+    seen = set()
+    for character in characters:
+        fallback = OpenAIService.FALLBACK_RESPONSES.get(
+            (character.name or "").lower(), OpenAIService.DEFAULT_FALLBACK_RESPONSE
+        )
+        for text in [fallback] + greetings:
+            key = voice_service.cache_key(text, character)
+            if key not in seen:
+                seen.add(key)
+                lines.append((character, text))
+    return lines
+
+async def _active_characters() -> List[Character]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Character).where(Character.is_active == True))
+        return list(result.scalars())
+
+async def warm_voice_cache(characters: Optional[List[Character]] = None, concurrency: Optional[int] = None) -> Dict:
+    """Synthesize every fixed character line that isn't cached yet, a few at a time"""
+    voice_service = get_voice_service()
+    if not voice_service.api_key:
+        logger.info("Voice warm-up skipped, ElevenLabs is not configured")
+        return {"total": 0, "cached": 0, "synthesized": 0, "failed": 0}
+
+    if characters is None:
+        characters = await _active_characters()
+    lines = warmup_lines(characters)
+    pending = [(character, text) for character, text in lines if not voice_service.is_cached(text, character)]
+
+    semaphore = asyncio.Semaphore(concurrency or settings.TTS_WARMUP_CONCURRENCY)
+
+    async def synthesize(character: Character, text: str) -> bool:
+        async with semaphore:
+            result = await voice_service.generate_voice_message(text, character)
+            if not result["success"]:
+                logger.warning(f"Voice warm-up failed for {character.name}: {result.get('error')}")
+            return result["success"]
+
+    results = await asyncio.gather(*(synthesize(character, text) for character, text in pending))
+    summary = {
+        "total": len(lines),
+        "cached": len(lines) - len(pending),
+        "synthesized": sum(results),
+        "failed": len(results) - sum(results),
+    }
+    logger.info(f"Voice warm-up finished: {summary}")
+    return summary
@@ -0,0 +1,94 @@
+import time
+from typing import Dict, List, Optional
+
+class FakeRedis:
+    """Just enough of the asyncio Redis client (decode_responses=True) for the Redis-backed stores"""
+
+    def __init__(self):
+        # key -> (expires_at or None, value)
+        self._data: Dict[str, tuple] = {}
+
+    def _get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.time():
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def _expiry(self, key: str) -> Optional[float]:
+        entry = self._data.get(key)
+        return entry[0] if entry else None
+
+    def _slice(self, items: list, start: int, end: int) -> list:
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        return value if isinstance(value, str) else None
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        self._data[key] = (time.time() + ex if ex else None, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        value = self._get(key)
+        if value is None:
+            return False
+        self._data[key] = (time.time() + seconds, value)
+        return True
+
+    async def ttl(self, key: str) -> int:
+        if self._get(key) is None:
+            return -2
+        expires_at = self._expiry(key)
+        return -1 if expires_at is None else round(expires_at - time.time())
+
+    async def rpush(self, key: str, *values: str) -> int:
+        items = (self._get(key) or []) + list(values)
+        self._data[key] = (self._expiry(key), items)
+        return len(items)
+
+    async def lpush(self, key: str, *values: str) -> int:
+        items = list(reversed(values)) + (self._get(key) or [])
+        self._data[key] = (self._expiry(key), items)
+        return len(items)
+
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._get(key)
+        if items is not None:
+            items = self._slice(items, start, end)
+            if items:
+                self._data[key] = (self._expiry(key), items)
+            else:
+                del self._data[key]
+        return True
+
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        return self._slice(self._get(key) or [], start, end)
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute(), like a Redis pipeline"""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
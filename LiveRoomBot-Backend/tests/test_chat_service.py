@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models import Base, Character, Conversation, Message, User
+from app.models.user import SubscriptionPlan
+from app.services.chat_service import ChatService
+
+MESSAGES = 5000
+HISTORY = 10
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/chat.db")
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"id": 1, "username": "u", "email": "u@x", "subscription_plan": SubscriptionPlan.PRO}])
+            await conn.execute(insert(Character), [{"id": 1, "name": "luna", "display_name": "Luna", "is_active": True}])
+            await conn.execute(insert(Conversation), [
+                {"id": 1, "user_id": 1, "character_id": 1, "is_active": True},
+                {"id": 2, "user_id": 1, "character_id": 1, "is_active": False},
+            ])
+            await conn.execute(insert(Message), [
+                {
+                    "conversation_id": 1 if n % 2 else 2, "user_id": 1, "character_id": 1,
+                    "content": f"m{n}", "sender_type": "user", "created_at": started + timedelta(seconds=n)
+                }
+                for n in range(MESSAGES)
+            ])
+
+    asyncio.run(setup())
+    yield engine, async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+def test_direct_turn_loads_the_newest_history_oldest_first(sessions):
+    _, Session = sessions
+
+    async def main():
+        async with Session() as db:
+            character, conversation, history, plan = await ChatService(db).load_direct_turn(1, 1, history_limit=HISTORY)
+            # The read is committed so the connection goes back to the pool before the LLM call
+            assert not db.in_transaction()
+        assert character.display_name == "Luna"
+        assert conversation.id == 1
+        assert plan == SubscriptionPlan.PRO
+        assert [message.content for message in history] == [f"m{n}" for n in range(MESSAGES - 19, MESSAGES, 2)]
+
+    asyncio.run(main())
+
+def test_conversation_turn_checks_the_owner_and_skips_summarized_messages(sessions):
+    engine, Session = sessions
+
+    async def main():
+        async with Session() as db:
+            assert await ChatService(db).load_conversation_turn(1, user_id=2) == (None, None, [], None)
+
+            history = (await ChatService(db).load_conversation_turn(2, 1, history_limit=HISTORY))[2]
+            conversation = await db.get(Conversation, 2)
+            conversation.summary_message_id = history[4].id
+            await db.commit()
+
+            _, _, history, _ = await ChatService(db).load_conversation_turn(2, 1, history_limit=HISTORY)
+        assert [message.content for message in history] == [f"m{n}" for n in range(MESSAGES - 10, MESSAGES, 2)]
+
+    asyncio.run(main())
+
+def test_no_conversation_yet_has_no_history(sessions):
+    _, Session = sessions
+
+    async def main():
+        async with Session() as db:
+            character, conversation, history, _ = await ChatService(db).load_direct_turn(1, 2)
+        assert character is None and conversation is None and history == []
+
+    asyncio.run(main())
+
+def test_history_read_is_a_bounded_index_seek(sessions):
+    engine, Session = sessions
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "recent_messages" in statement:
+            statements.append((statement, parameters))
+
+    async def main():
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        async with Session() as db:
+            await ChatService(db).load_direct_turn(1, 1, history_limit=HISTORY)
+            await ChatService(db).load_conversation_turn(1, 1, history_limit=HISTORY)
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+        assert len(statements) == 2
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = [row[3] for row in await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+                # No per-row correlated lookup, and the newest-first order comes straight from the index
+                assert not any("CORRELATED" in step for step in plan), plan
+                assert any("messages USING INDEX ix_messages_conversation_id_created_at" in step for step in plan), plan
+                assert sum("TEMP B-TREE" in step for step in plan) <= 1, plan
+
+    asyncio.run(main())
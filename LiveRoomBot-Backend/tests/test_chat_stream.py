@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.api.v1.endpoints import chat
+from app.models import Base, Character, Message, User
+from app.services.llm_providers import FakeProvider, StreamDelta
+from app.services.openai_service import OpenAIService
+
+class SilentProvider(FakeProvider):
+    """Answers every stream with usage only, no text"""
+
+    name = "silent"
+
+    async def stream(self, messages, params):
+        yield StreamDelta(0, "")
+
+class Replies:
+    """Stands in for OpenAIService with a canned stream"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+
+    async def stream_character_response(self, *args, **kwargs):
+        for delta in self.deltas:
+            yield delta
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/chat.db")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"id": 1, "username": "u", "email": "u@x"}])
+            await conn.execute(insert(Character), [{"id": 1, "name": "luna", "display_name": "Luna", "is_active": True}])
+
+    asyncio.run(setup())
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(chat, "AsyncSessionLocal", Session)
+    yield Session
+    asyncio.run(engine.dispose())
+
+def run_turn(Session, deltas):
+    async def main():
+        async with Session() as db:
+            character = await db.get(Character, 1)
+        events = [event async for event in chat._stream_turn_events(Replies(deltas), character, None, [], "hi", 1)]
+        async with Session() as db:
+            saved = (await db.execute(select(Message.sender_type, Message.content).order_by(Message.id))).all()
+        return events, saved
+
+    return asyncio.run(main())
+
+def test_reply_is_streamed_and_saved(sessions):
+    events, saved = run_turn(sessions, ["Hello ", "there"])
+    assert [event.event for event in events] == ["start", "delta", "delta", "done"]
+    assert events[-1].content == "Hello there"
+    assert events[-1].message_id is not None
+    assert saved == [("user", "hi"), ("character", "Hello there")]
+
+def test_blank_reply_still_ends_with_done(sessions):
+    events, saved = run_turn(sessions, ["  "])
+    assert events[-1].event == "done"
+    assert events[-1].content == ""
+    assert events[-1].message_id is None
+    assert events[-1].conversation_id is not None
+    assert saved == [("user", "hi")]
+
+def test_empty_backend_stream_gets_the_fallback_line(monkeypatch):
+    monkeypatch.setattr(OpenAIService, "_provider", staticmethod(lambda route: SilentProvider()))
+    service = OpenAIService()
+    character = Character(id=1, name="luna", display_name="Luna", system_prompt="You are Luna")
+
+    async def main():
+        return [delta async for delta in service.stream_character_response(character, [], "hi")]
+
+    assert asyncio.run(main()) == [service._get_fallback_response(character)]
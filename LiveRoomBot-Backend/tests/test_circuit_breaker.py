@@ -0,0 +1,127 @@
+import asyncio
+import time
+import pytest
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, hedged
+
+class Shed(Exception):
+    pass
+
+async def ok():
+    return "ok"
+
+async def fail():
+    raise RuntimeError("upstream down")
+
+def tripped(**kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05, **kwargs)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(breaker.call(fail))
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+def test_trips_after_consecutive_failures_and_rejects_while_open():
+    breaker = tripped()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(ok))
+    assert breaker.rejected == 1
+    assert breaker.trips == 1
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(breaker.call(fail))
+    asyncio.run(breaker.call(ok))
+    with pytest.raises(RuntimeError):
+        asyncio.run(breaker.call(fail))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_slow_success_counts_as_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_call_seconds=0.01)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "late"
+
+    assert asyncio.run(breaker.call(slow)) == "late"
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_excluded_exceptions_do_not_count():
+    breaker = CircuitBreaker("test", failure_threshold=1, excluded_exceptions=(Shed,))
+
+    async def shed():
+        raise Shed()
+
+    with pytest.raises(Shed):
+        asyncio.run(breaker.call(shed))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_half_open_probe_success_closes():
+    breaker = tripped()
+    time.sleep(0.06)
+    assert asyncio.run(breaker.call(ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_half_open_probe_failure_reopens():
+    breaker = tripped()
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        asyncio.run(breaker.call(fail))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(ok))
+
+def test_half_open_admits_only_max_probes():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError, match="probing"):
+        breaker.before_call()
+
+def test_cancelled_probe_frees_its_slot():
+    breaker = tripped()
+    time.sleep(0.06)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def cancelled_probe():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.call(hang), timeout=0.01)
+
+    asyncio.run(cancelled_probe())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert asyncio.run(breaker.call(ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_lost_probe_expires_after_reset_seconds():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_call()  # never reports back
+    time.sleep(0.06)
+    assert asyncio.run(breaker.call(ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_reject_if_open_does_not_take_a_probe():
+    breaker = tripped()
+    with pytest.raises(CircuitOpenError):
+        breaker.reject_if_open()
+    time.sleep(0.06)
+    breaker.reject_if_open()
+    assert asyncio.run(breaker.call(ok)) == "ok"
+
+def test_hedged_takes_the_first_success():
+    calls = []
+
+    async def first_slow():
+        calls.append(len(calls))
+        await asyncio.sleep(0.5 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    result, fired = asyncio.run(hedged(first_slow, 0.02))
+    assert fired
+    assert result == 2
+
+def test_hedged_without_delay_runs_once():
+    assert asyncio.run(hedged(ok, None)) == ("ok", False)
@@ -0,0 +1,75 @@
+import asyncio
+from app.core.config import settings
+from app.models import Character
+from app.services.llm_providers import FakeProvider
+from app.services.openai_service import OpenAIService
+from app.services.tokenizer import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+CHARACTER = Character(id=1, name="luna", display_name="Luna", system_prompt="You are Luna, warm and curious.")
+SYSTEM_PROMPT = "You are Luna."
+
+class Stored:
+    """A history row without an id, so token counts are keyed by content"""
+
+    def __init__(self, sender_type, content):
+        self.id = None
+        self.sender_type = sender_type
+        self.content = content
+
+HISTORY = [Stored("user" if n % 2 == 0 else "character", f"history message number {n} " + "x" * 4 * n) for n in range(8)]
+
+def tokens(text):
+    return count_tokens(text, "gpt-4o-mini") + MESSAGE_OVERHEAD_TOKENS
+
+def build(monkeypatch, budget, **kwargs):
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", budget)
+    return OpenAIService()._build_conversation_context(
+        CHARACTER, HISTORY, "and now?", system_prompt=SYSTEM_PROMPT, model="gpt-4o-mini", **kwargs
+    )
+
+def test_everything_fits_in_a_large_budget(monkeypatch):
+    messages = build(monkeypatch, 100000)
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert [message["content"] for message in messages[1:-1]] == [msg.content for msg in HISTORY]
+    assert messages[1]["role"] == "user" and messages[2]["role"] == "assistant"
+    assert messages[-1] == {"role": "user", "content": "and now?"}
+
+def test_newest_history_fills_the_budget_oldest_dropped(monkeypatch):
+    fixed = tokens(SYSTEM_PROMPT) + tokens("and now?")
+    newest_three = sum(tokens(msg.content) for msg in HISTORY[-3:])
+    # One token short of fitting a fourth message
+    budget = fixed + newest_three + tokens(HISTORY[-4].content) - 1
+    messages = build(monkeypatch, budget)
+    assert [message["content"] for message in messages[1:-1]] == [msg.content for msg in HISTORY[-3:]]
+
+def test_summary_and_memories_come_before_history(monkeypatch):
+    memories = [{"sender_type": "user", "content": "my cat is called Miso"}]
+    messages = build(monkeypatch, 100000, conversation_summary="They love hiking.", memories=memories)
+    assert [message["role"] for message in messages[:3]] == ["system", "system", "system"]
+    assert "They love hiking." in messages[1]["content"]
+    assert "my cat is called Miso" in messages[2]["content"]
+
+    # Both are budgeted ahead of history, so they crowd it out first
+    with_extras = build(monkeypatch, 200, conversation_summary="They love hiking. " * 20, memories=memories)
+    without = build(monkeypatch, 200)
+    assert len(with_extras) - 2 < len(without)
+
+def test_system_prompt_and_message_go_in_even_over_budget(monkeypatch):
+    messages = build(monkeypatch, 1)
+    assert messages == [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "and now?"}]
+
+def test_context_is_counted_for_the_routed_model(monkeypatch):
+    service = OpenAIService()
+    models = []
+    build_context = service._build_conversation_context
+
+    def spy(*args, **kwargs):
+        models.append(kwargs.get("model"))
+        return build_context(*args, **kwargs)
+
+    monkeypatch.setattr(OpenAIService, "_provider", staticmethod(lambda route: FakeProvider()))
+    monkeypatch.setattr(service, "_build_conversation_context", spy)
+    reply = asyncio.run(service.generate_character_response_async(CHARACTER, [], "hi"))
+    # A short opener goes to the small model, and the budget is counted with its tokenizer
+    assert reply.startswith(f"[{settings.ROUTER_SHORT_MODEL}]")
+    assert models == [settings.ROUTER_SHORT_MODEL]
@@ -0,0 +1,21 @@
+from app.core.database import _async_database_url, _async_engine_target
+
+def test_sslmode_moves_to_asyncpg_connect_args():
+    url, connect_args = _async_engine_target(
+        _async_database_url("postgres://u:p@db.example.com/app?sslmode=require&channel_binding=require")
+    )
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {}
+    assert connect_args == {"ssl": "require"}
+
+def test_other_query_parameters_are_kept():
+    url, connect_args = _async_engine_target(
+        _async_database_url("postgresql://u:p@db.example.com:5432/app?application_name=bot")
+    )
+    assert dict(url.query) == {"application_name": "bot"}
+    assert connect_args == {}
+
+def test_sqlite_is_left_alone():
+    url, connect_args = _async_engine_target(_async_database_url("sqlite:///./liveroom.db"))
+    assert url.drivername == "sqlite+aiosqlite"
+    assert connect_args == {}
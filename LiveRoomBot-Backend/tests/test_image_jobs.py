@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from app.services import image_jobs
+from app.services.image_jobs import ImageJob, ImageJobQueue, ImageQueueFull
+
+class Character:
+    display_name = "Luna"
+
+class Images:
+    """Stands in for ImageService: renders on demand and remembers what it cached"""
+
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+        self.renders = 0
+        self.release = asyncio.Event()
+        self.fail = False
+
+    def prepare(self, prompt, character, style="realistic"):
+        return f"{style}: {prompt}", f"key-{style}-{prompt}"
+
+    def image_result(self, prompt, enhanced_prompt, cache_key, character_name, style, cached):
+        return {"success": True, "cache_key": cache_key, "cached": cached}
+
+    def is_cached(self, cache_key):
+        return cache_key in self.cached
+
+    async def render(self, enhanced_prompt, cache_key):
+        self.renders += 1
+        await self.release.wait()
+        if self.fail:
+            return False
+        self.cached.add(cache_key)
+        return True
+
+@pytest.fixture
+def images(monkeypatch):
+    images = Images()
+    monkeypatch.setattr(image_jobs, "get_image_service", lambda: images)
+    return images
+
+async def finished(job: ImageJob):
+    while not job.finished:
+        await job.wait_for_change(1.0)
+    return job
+
+def test_identical_prompts_share_one_render(images):
+    async def main():
+        queue = ImageJobQueue(workers=2)
+        await queue.start()
+        first = queue.submit("a cat", Character(), user_id=1)
+        second = queue.submit("a cat", Character(), user_id=2)
+        other = queue.submit("a dog", Character(), user_id=1)
+        # Each caller gets their own job, following the one render
+        assert second is not first and other is not first
+        assert second.user_id == 2
+        images.release.set()
+        await finished(first)
+        await finished(second)
+        await finished(other)
+        assert first.status == second.status == ImageJob.SUCCEEDED
+        assert second.result == first.result
+        assert images.renders == 2
+        assert queue.stats()["deduplicated"] == 1
+        assert queue.stats()["in_flight"] == 0
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_job_joining_a_running_render_follows_it(images):
+    async def main():
+        queue = ImageJobQueue(workers=1)
+        await queue.start()
+        first = queue.submit("a cat", Character(), user_id=1)
+        await asyncio.sleep(0)  # the worker picks it up and blocks on the render
+        late = queue.submit("a cat", Character(), user_id=2)
+        assert late.status == ImageJob.RUNNING
+        images.fail = True
+        images.release.set()
+        await finished(late)
+        assert late.status == first.status == ImageJob.FAILED
+        assert images.renders == 1
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_jobs_are_only_visible_to_their_owner(images):
+    async def main():
+        queue = ImageJobQueue()
+        await queue.start()
+        first = queue.submit("a cat", Character(), user_id=1)
+        second = queue.submit("a cat", Character(), user_id=2)
+        assert queue.get(first.id, 1) is first
+        assert queue.get(second.id, 2) is second
+        assert queue.get(first.id, 2) is None
+        assert queue.get("missing", 1) is None
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_cached_prompt_finishes_immediately(images):
+    async def main():
+        images.cached.add("key-realistic-a cat")
+        queue = ImageJobQueue()
+        await queue.start()
+        job = queue.submit("a cat", Character(), user_id=1)
+        assert job.status == ImageJob.SUCCEEDED
+        assert job.result["cached"] is True
+        assert images.renders == 0
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_failed_render_marks_the_job_failed(images):
+    async def main():
+        images.fail = True
+        images.release.set()
+        queue = ImageJobQueue()
+        await queue.start()
+        job = await finished(queue.submit("a cat", Character(), user_id=1))
+        assert job.status == ImageJob.FAILED
+        assert job.result["success"] is False
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_full_queue_rejects_new_prompts(images):
+    async def main():
+        queue = ImageJobQueue(workers=1, max_queued=1)
+        await queue.start()
+        queue.submit("one", Character(), user_id=1)
+        await asyncio.sleep(0)  # the worker picks "one" up and blocks on it
+        queue.submit("two", Character(), user_id=1)
+        with pytest.raises(ImageQueueFull):
+            queue.submit("three", Character(), user_id=1)
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_finished_jobs_are_pruned_after_the_ttl(images):
+    async def main():
+        images.release.set()
+        queue = ImageJobQueue(ttl_seconds=0)
+        await queue.start()
+        job = await finished(queue.submit("a cat", Character(), user_id=1))
+        queue.submit("a dog", Character(), user_id=1)
+        assert queue.get(job.id, 1) is None
+        await queue.stop()
+
+    asyncio.run(main())
+
+def test_submit_requires_a_running_queue(images):
+    with pytest.raises(RuntimeError):
+        ImageJobQueue().submit("a cat", Character(), user_id=1)
@@ -0,0 +1,23 @@
+import asyncio
+import pytest
+from app.services.llm_providers import FakeProvider, LLMProvider
+
+def test_incomplete_provider_fails_at_construction():
+    class CompletionOnly(LLMProvider):
+        async def complete(self, messages, params):
+            return None
+
+    with pytest.raises(TypeError):
+        CompletionOnly()
+
+def test_fake_provider_streams_what_it_completes():
+    async def main():
+        provider = FakeProvider()
+        messages = [{"role": "user", "content": "hello there"}]
+        params = {"model": "gpt-4o-mini", "n": 1}
+        completion = await provider.complete(messages, params)
+        streamed = "".join([delta.content async for delta in provider.stream(messages, params) if delta.content])
+        assert streamed.strip() == completion.replies[0]
+        assert provider.complete_sync(messages, params).replies == completion.replies
+
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+from app.services.llm_scheduler import LLMOverloaded, LLMScheduler
+
+def rate_limited() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "http://llm.test/v1/chat/completions"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+def test_limit_grows_additively_on_fast_calls():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=4, latency_target=1.0)
+        for _ in range(4):
+            async with scheduler.slot():
+                pass
+        assert 4.9 < scheduler.limit < 5.0
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+def test_limit_halves_on_rate_limit_once_per_round_trip():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=16, min_limit=2, latency_target=1.0)
+        for _ in range(3):
+            with pytest.raises(openai.RateLimitError):
+                async with scheduler.slot():
+                    raise rate_limited()
+        assert scheduler.limit == 8
+        assert scheduler.rate_limited == 3
+
+    asyncio.run(main())
+
+def test_slow_calls_shrink_the_limit():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=10, latency_target=0.001)
+        async with scheduler.slot():
+            await asyncio.sleep(0.01)
+        assert scheduler.limit == pytest.approx(9)
+
+    asyncio.run(main())
+
+def test_waiting_calls_are_served_by_lane_priority():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=1, min_limit=1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(lane: str, hold: bool = False):
+            async with scheduler.slot(lane):
+                order.append(lane)
+                if hold:
+                    await release.wait()
+
+        # Hold the only slot, then queue the lanes out of priority order
+        holder = asyncio.create_task(call("free", hold=True))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(call(lane)) for lane in ("background", "free", "pro", "basic")]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert order == ["free", "pro", "basic", "free", "background"]
+
+    asyncio.run(main())
+
+def test_full_lane_is_shed():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=1, min_limit=1, max_waiting=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded, match="full"):
+            async with scheduler.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, queued)
+        assert scheduler.shed == 1
+
+    asyncio.run(main())
+
+def test_call_that_cannot_start_before_its_deadline_is_shed():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=1, min_limit=1, latency_target=10.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded, match="deadline"):
+            async with scheduler.slot(deadline=time.monotonic() + 1.0):
+                pass
+        release.set()
+        await holder
+
+    asyncio.run(main())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = LLMScheduler(initial_limit=1, min_limit=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["waiting"]["free"] == 0
+        release.set()
+        await holder
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+def test_run_retries_transient_errors():
+    async def main():
+        scheduler = LLMScheduler(max_retries=2)
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise rate_limited()
+            return "ok"
+
+        assert await scheduler.run(flaky) == "ok"
+        assert attempts == 2
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
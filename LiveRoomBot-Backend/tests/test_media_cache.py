@@ -0,0 +1,122 @@
+import os
+import random
+import threading
+import pytest
+from app.services import media_cache
+from app.services.media_cache import INDEX_FILE, MediaCache
+
+def test_lru_evicts_the_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=20)
+    cache.put("a.mp3", b"x" * 10)
+    cache.put("b.mp3", b"x" * 10)
+    assert cache.get("a.mp3") is not None
+    cache.put("c.mp3", b"x" * 10)
+    assert "a.mp3" in cache and "c.mp3" in cache
+    assert "b.mp3" not in cache
+    assert not (tmp_path / "b.mp3").exists()
+    assert cache.evictions == 1
+
+def test_lfu_evicts_the_least_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=20, policy="lfu")
+    cache.put("a.mp3", b"x" * 10)
+    cache.put("b.mp3", b"x" * 10)
+    cache.get("a.mp3")
+    cache.get("a.mp3")
+    cache.get("b.mp3")
+    cache.put("c.mp3", b"x" * 10)
+    assert "a.mp3" in cache and "c.mp3" in cache
+    assert "b.mp3" not in cache
+
+def test_oversized_file_is_kept_alone(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=5)
+    cache.put("a.mp3", b"x" * 3)
+    cache.put("big.mp3", b"x" * 10)
+    assert "big.mp3" in cache and "a.mp3" not in cache
+
+def test_get_never_writes_the_index(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    cache.put("a.mp3", b"x")
+    assert not (tmp_path / INDEX_FILE).exists()
+    for _ in range(3):
+        cache.get("a.mp3")
+    cache.get("missing.mp3")
+    assert not (tmp_path / INDEX_FILE).exists()
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_flushed_index_survives_a_restart(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100, policy="lfu")
+    cache.put("a.mp3", b"xy")
+    cache.get("a.mp3")
+    cache.flush()
+    (tmp_path / "stray.mp3").write_bytes(b"abc")
+
+    reopened = MediaCache(str(tmp_path), max_bytes=100, policy="lfu")
+    assert reopened.stats()["total_files"] == 2
+    assert reopened._entries["a.mp3"][2] == 1  # hit count kept
+    assert "stray.mp3" in reopened
+
+def test_rejects_keys_outside_the_directory(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    for name in ("../escape.mp3", "", INDEX_FILE):
+        with pytest.raises(ValueError):
+            cache.get(name)
+
+def test_lfu_victim_matches_fewest_hits_then_oldest(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=10 ** 9, policy="lfu")
+    rng = random.Random(7)
+    names = [f"{n}.mp3" for n in range(40)]
+    for step in range(2000):
+        name = rng.choice(names)
+        if rng.random() < 0.3:
+            cache.put(name, b"x")
+        else:
+            cache.get(name)
+        if step % 50 == 0 and cache._entries:
+            expected = min(cache._entries, key=lambda name: (cache._entries[name][2], cache._entries[name][1]))
+            assert cache._least_used() == expected
+
+def block_unlinks(monkeypatch):
+    """Make eviction hang inside os.unlink until released"""
+    unlinking, release = threading.Event(), threading.Event()
+    real_unlink = os.unlink
+
+    def unlink(path):
+        unlinking.set()
+        assert release.wait(5)
+        real_unlink(path)
+
+    monkeypatch.setattr(media_cache.os, "unlink", unlink)
+    return unlinking, release
+
+def test_get_does_not_wait_for_evicted_files_to_be_deleted(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    cache.put("a.mp3", b"x" * 10)
+    unlinking, release = block_unlinks(monkeypatch)
+    writer = threading.Thread(target=cache.put, args=("b.mp3", b"x" * 10))
+    writer.start()
+    assert unlinking.wait(5)
+    # The writer is stuck deleting a.mp3, yet the index lock is free for lookups
+    assert cache._lock.acquire(timeout=1)
+    cache._lock.release()
+    assert cache.get("b.mp3") is not None
+    assert cache.get("a.mp3") is None
+    release.set()
+    writer.join()
+    assert not (tmp_path / "a.mp3").exists()
+
+def test_file_written_again_while_its_eviction_is_pending_survives(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    cache.put("a.mp3", b"x" * 10)
+    cache.put("b.mp3", b"y" * 10)  # evicts a.mp3, nothing blocked yet
+    cache.put("a.mp3", b"z" * 10)  # evicts b.mp3
+    unlinking, release = block_unlinks(monkeypatch)
+    evicting = threading.Thread(target=cache.remove, args=("a.mp3",))
+    evicting.start()
+    assert unlinking.wait(5)
+    rewriting = threading.Thread(target=cache.put, args=("a.mp3", b"w" * 10))
+    rewriting.start()
+    release.set()
+    evicting.join()
+    rewriting.join()
+    assert (tmp_path / "a.mp3").read_bytes() == b"w" * 10
+    assert cache.get("a.mp3") is not None
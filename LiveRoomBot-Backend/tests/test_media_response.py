@@ -0,0 +1,98 @@
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.media_response import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, _parse_range, media_file_response
+
+BODY = bytes(range(256)) * 4  # 1024 bytes
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "clip.mp3").write_bytes(BODY)
+    app = FastAPI()
+
+    @app.get("/media/{name}")
+    async def media(name: str, request: Request):
+        return media_file_response(request, tmp_path / name, "audio/mpeg")
+
+    @app.get("/images/{name}")
+    async def image(name: str, request: Request):
+        return media_file_response(request, tmp_path / name, "image/png", cache_control=REVALIDATE_CACHE_CONTROL)
+
+    return TestClient(app)
+
+def test_full_response_has_caching_headers(client):
+    response = client.get("/media/clip.mp3")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"clip-')
+
+def test_matching_etag_is_not_modified(client):
+    etag = client.get("/media/clip.mp3").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/media/clip.mp3", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+
+def test_other_etag_gets_the_file(client):
+    response = client.get("/media/clip.mp3", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("header,start,end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes=-5000", 0, 1023),
+])
+def test_single_range_is_partial_content(client, header, start, end):
+    response = client.get("/media/clip.mp3", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+    assert response.content == BODY[start:end + 1]
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000", "bytes=-0", "bytes=50-10"])
+def test_unsatisfiable_range(client, header):
+    response = client.get("/media/clip.mp3", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-1", "bytes=-"])
+def test_ranges_we_do_not_serve_get_the_whole_file(client, header):
+    response = client.get("/media/clip.mp3", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+def test_if_range_with_a_stale_etag_gets_the_whole_file(client):
+    etag = client.get("/media/clip.mp3").headers["etag"]
+    fresh = client.get("/media/clip.mp3", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert fresh.status_code == 206
+    stale = client.get("/media/clip.mp3", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert stale.content == BODY
+
+def test_missing_file_is_not_found(client):
+    assert client.get("/media/gone.mp3").status_code == 404
+
+def test_parse_range_edges():
+    assert _parse_range("bytes=0-0", 10) == (0, 0)
+    assert _parse_range("bytes=9-", 10) == (9, 9)
+    assert _parse_range(" bytes=-10 ", 10) == (0, 9)
+    with pytest.raises(ValueError):
+        _parse_range("bytes=10-", 10)
+
+def test_regenerated_file_under_the_same_name_is_revalidated(client, tmp_path):
+    (tmp_path / "sunset.png").write_bytes(BODY)
+    first = client.get("/images/sunset.png")
+    assert first.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert client.get("/images/sunset.png", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    # A new render for the same prompt key lands under the same file name
+    (tmp_path / "sunset.png").write_bytes(BODY[::-1])
+    os.utime(tmp_path / "sunset.png", (0, 0))
+    second = client.get("/images/sunset.png", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.content == BODY[::-1]
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services import memory_index as memory_index_module
+from app.services.embedding_service import HashingEmbedder
+from app.services.memory_index import MemoryIndex, NumpyVectorStore
+
+EMBEDDER = HashingEmbedder(64)
+
+def embed(texts):
+    return asyncio.run(EMBEDDER.embed(texts))
+
+def item(message_id, content, user_id=1, character_id=1):
+    return {"message_id": message_id, "user_id": user_id, "character_id": character_id, "sender_type": "user", "content": content}
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MEMORY_INDEX_ENABLED", True)
+    monkeypatch.setattr(memory_index_module, "get_embedder", lambda: EMBEDDER)
+    return MemoryIndex(str(tmp_path), max_open_stores=1)
+
+def test_store_search_ranks_by_similarity(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "pair"), EMBEDDER.dim)
+    texts = ["my dog is called rex", "i work as a nurse", "pizza on fridays"]
+    store.add(embed(texts), [{"message_id": n} for n in range(3)])
+    (top, score), = store.search(embed(["what is my dog called"])[0], 1)
+    assert top == {"message_id": 0}
+    assert 0 < score <= 1
+
+def test_store_grows_and_reopens_from_disk(tmp_path):
+    path = str(tmp_path / "pair")
+    store = NumpyVectorStore(path, EMBEDDER.dim)
+    count = NumpyVectorStore.MIN_CAPACITY + 10
+    for n in range(count):
+        store.add(embed([f"message number {n}"]), [{"message_id": n}])
+    store.close()
+
+    reopened = NumpyVectorStore(path, EMBEDDER.dim)
+    assert len(reopened) == count
+    assert reopened.search(embed(["message number 70"])[0], 1)[0][0] == {"message_id": 70}
+
+def test_add_after_close_maps_the_file_again(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "pair"), EMBEDDER.dim)
+    store.add(embed(["first message here"]), [{"message_id": 1}])
+    store.close()
+    store.add(embed(["second message here"]), [{"message_id": 2}])
+    assert len(store) == 2
+    assert store.search(embed(["second message here"])[0], 1)[0][0] == {"message_id": 2}
+
+def test_recall_finds_past_messages_and_skips_context(index):
+    async def main():
+        await index.start()
+        try:
+            await index.index([
+                item(1, "my sister lives in Lisbon"),
+                item(2, "I have been learning the violin"),
+                item(3, "my sister lives in Lisbon", user_id=2),
+            ])
+            recalled = await index.recall(1, 1, "where does my sister live", k=1)
+            assert [memory["message_id"] for memory in recalled] == [1]
+            assert await index.recall(1, 1, "where does my sister live", k=1, exclude_ids={1}, min_score=0.3) == []
+            assert await index.recall(3, 1, "where does my sister live") == []
+        finally:
+            await index.stop()
+
+    asyncio.run(main())
+
+def test_evicted_store_reopens_with_its_rows(index):
+    async def main():
+        await index.start()
+        try:
+            await index.index([item(1, "my sister lives in Lisbon", user_id=1)])
+            await index.index([item(2, "I have been learning the violin", user_id=2)])
+            assert len(index._stores) == 1
+            recalled = await index.recall(1, 1, "my sister lives in Lisbon", k=1)
+            assert [memory["message_id"] for memory in recalled] == [1]
+            await index.index([item(3, "my brother lives in Porto", user_id=1)])
+            assert len(index._store(EMBEDDER, 1, 1, create=False)) == 2
+            index._release(EMBEDDER, 1, 1)
+        finally:
+            await index.stop()
+
+    asyncio.run(main())
+
+def test_store_in_use_is_not_evicted(index):
+    pinned = index._store(EMBEDDER, 1, 1, create=True)
+    index._store(EMBEDDER, 2, 1, create=True)
+    index._release(EMBEDDER, 2, 1)
+    # Over the limit, but the only candidate is still in use
+    assert index._stores[(EMBEDDER.name, 1, 1)] is pinned
+
+    index._release(EMBEDDER, 1, 1)
+    index._store(EMBEDDER, 3, 1, create=True)
+    index._release(EMBEDDER, 3, 1)
+    assert list(index._stores) == [(EMBEDDER.name, 3, 1)]
+    # Opening the pair again gives a fresh store on the same files, never a second live one
+    assert index._store(EMBEDDER, 1, 1, create=False) is not pinned
+    index._release(EMBEDDER, 1, 1)
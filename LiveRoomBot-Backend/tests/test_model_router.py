@@ -0,0 +1,92 @@
+import pytest
+from app.core.config import settings
+from app.models import Character
+from app.models.user import SubscriptionPlan
+from app.services import model_router
+from app.services.model_router import ModelRouter, Route, get_model_router
+
+SHORT = "hi"
+MEDIUM = "tell me about the place you grew up and what you liked most about it " * 2
+LONG = "I want to tell you about my week in detail because so much happened " * 20
+
+def luna(**fields):
+    return Character(id=1, name="Luna", display_name="Luna", **fields)
+
+@pytest.fixture
+def router():
+    return ModelRouter(
+        {
+            "short": Route("short", "small-model", 200, 0.8),
+            "standard": Route("standard", "mid-model", 800, 0.9),
+            "premium": Route("premium", "big-model", 1000, 0.9),
+        },
+        short_max_tokens=12,
+        long_min_tokens=120,
+    )
+
+@pytest.mark.parametrize("message,plan,route", [
+    (SHORT, None, "short"),
+    (SHORT, SubscriptionPlan.BASIC, "short"),
+    (SHORT, SubscriptionPlan.PRO, "standard"),
+    (MEDIUM, None, "standard"),
+    (MEDIUM, SubscriptionPlan.PRO, "standard"),
+    (LONG, None, "standard"),
+    (LONG, SubscriptionPlan.BASIC, "standard"),
+    (LONG, SubscriptionPlan.PRO, "premium"),
+])
+def test_route_follows_message_length_and_plan(router, message, plan, route):
+    assert router.choose(luna(), message, plan).name == route
+
+def test_pinned_character_overrides_length_and_plan(router):
+    router.character_routes = {"luna": "premium", "zara": "missing"}
+    assert router.choose(luna(), SHORT).name == "premium"
+    # A pin to a route that doesn't exist is ignored
+    assert router.choose(Character(name="Zara", display_name="Zara"), SHORT).name == "short"
+
+def test_provider_comes_from_character_then_plan(router):
+    router.plan_providers = {"free": "local", "pro": "openai"}
+    router.character_providers = {"luna": "fake"}
+    zara = Character(name="Zara", display_name="Zara")
+    assert router.choose(zara, SHORT).provider == "local"
+    assert router.choose(zara, SHORT, SubscriptionPlan.PRO).provider == "openai"
+    assert router.choose(luna(), SHORT, SubscriptionPlan.PRO).provider == "fake"
+    # Overriding the backend keeps the route's model and budget
+    route = router.choose(zara, SHORT)
+    assert (route.model, route.max_tokens) == ("small-model", 200)
+
+def test_formal_characters_get_calmer_sampling(router):
+    assert router.choose(luna(conversation_style="Formal"), MEDIUM).temperature == 0.7
+    assert router.choose(luna(conversation_style="playful"), MEDIUM).temperature == 0.9
+    assert router.routes["standard"].temperature == 0.9
+
+def test_record_prices_hosted_models_only(router):
+    router.record(Route("standard", "gpt-4o-mini", 800, 0.9), 1.5, 1_000_000, 0)
+    router.record(Route("short", "gpt-4o-mini", 200, 0.8, provider="local"), 0.5, 1_000_000, 1_000_000)
+    stats = router.stats()
+    assert stats["standard"] == {
+        "calls": 1, "avg_latency_s": 1.5, "prompt_tokens": 1_000_000, "completion_tokens": 0, "cost_usd": 0.15
+    }
+    assert stats["short"]["cost_usd"] == 0
+    assert stats["premium"]["calls"] == 0
+
+def test_router_settings(monkeypatch):
+    monkeypatch.setattr(model_router, "_model_router", None)
+    monkeypatch.setattr(settings, "ROUTER_SHORT_MODEL", "tiny")
+    monkeypatch.setattr(settings, "ROUTER_STANDARD_MODEL", "regular")
+    monkeypatch.setattr(settings, "ROUTER_PREMIUM_MODEL", "large")
+    monkeypatch.setattr(settings, "ROUTER_SHORT_MESSAGE_TOKENS", 0)
+    monkeypatch.setattr(settings, "ROUTER_SHORT_MAX_REPLY_TOKENS", 50)
+    monkeypatch.setattr(settings, "ROUTER_LONG_MESSAGE_TOKENS", 1)
+    monkeypatch.setattr(settings, "ROUTER_CHARACTER_ROUTES", " Zara : short ,bad-entry")
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "LLM_PROVIDER_BY_PLAN", "")
+    monkeypatch.setattr(settings, "LLM_PROVIDER_BY_CHARACTER", "")
+
+    router = get_model_router()
+    assert get_model_router() is router
+    # No message is short enough now, and any PRO message counts as long
+    assert router.choose(luna(), SHORT).model == "regular"
+    assert router.choose(luna(), SHORT, SubscriptionPlan.PRO).model == "large"
+    zara = router.choose(Character(name="Zara", display_name="Zara"), LONG, SubscriptionPlan.PRO)
+    assert (zara.name, zara.model, zara.max_tokens, zara.provider) == ("short", "tiny", 50, "fake")
+    assert router.character_routes == {"zara": "short"}
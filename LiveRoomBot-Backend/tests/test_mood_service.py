@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models import Base, Character
+from app.services import mood_service
+from app.services.mood_service import CharacterMoodService
+from app.services.mood_store import InMemoryMoodStore
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/moods.db")
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(mood_service, "AsyncSessionLocal", Session)
+    asyncio.run(_create(engine))
+    yield Session
+    asyncio.run(engine.dispose())
+
+async def _create(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Character), [{
+            "id": 1, "name": "luna", "display_name": "Luna", "conversation_style": "zen",
+            "traits": {"romantic": 9}
+        }])
+
+def test_mood_lookups_load_the_character_without_a_session(sessions):
+    service = CharacterMoodService(store=InMemoryMoodStore())
+
+    async def main():
+        mood = await service.get_character_mood(1, 7)
+        assert mood["key"] in CharacterMoodService.MOODS and "expires_at" in mood
+        # The rolled mood sticks for its window
+        assert (await service.get_character_mood(1, 7))["key"] == mood["key"]
+        prompt = await service.apply_mood_to_prompt("You are Luna", 1, 7)
+        assert prompt == "You are Luna" + CharacterMoodService.build_mood_prompt(mood["key"])
+        status = await service.get_mood_status(1, 7)
+        assert status["current_mood"]["key"] == mood["key"]
+        assert status["mood_history"] == []
+
+    asyncio.run(main())
+
+def test_missing_character_gets_the_default_mood(sessions):
+    service = CharacterMoodService(store=InMemoryMoodStore())
+    mood = asyncio.run(service.get_character_mood(99, 7))
+    assert mood["key"] == "happy" and "expires_at" not in mood
+
+def test_trigger_and_recommendations_use_the_given_session(sessions):
+    async def main():
+        async with sessions() as db:
+            service = CharacterMoodService(db, store=InMemoryMoodStore())
+            changed = await service.trigger_mood_change(1, 7)
+            assert changed["new_mood"]["triggered"] is True
+            assert (await service.get_character_mood(1, 7))["key"] == changed["new_mood"]["key"]
+            assert await service.get_mood_recommendations(1) == ["romantic", "contemplative"]
+            assert await service.get_mood_recommendations(99) == ["happy", "flirty"]
+            with pytest.raises(ValueError):
+                await service.trigger_mood_change(1, 7, "grumpy")
+
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import asyncio
+import time
+import pytest
+from app.services.mood_store import InMemoryMoodStore, MoodStore, RedisMoodStore
+from tests.fake_redis import FakeRedis
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryMoodStore()
+    return RedisMoodStore(FakeRedis())
+
+def record(mood: str, started_at: float, minutes: int = 30) -> dict:
+    return {"mood": mood, "started_at": started_at, "expires_at": started_at + minutes * 60}
+
+def test_base_is_abstract():
+    with pytest.raises(TypeError):
+        MoodStore()
+
+def test_current_mood_expires(store, clock):
+    async def main():
+        assert await store.get(1, 2) is None
+        await store.set(1, 2, record("happy", clock[0]))
+        assert (await store.get(1, 2))["mood"] == "happy"
+        assert await store.get(1, 3) is None
+        clock[0] += 30 * 60
+        assert await store.get(1, 2) is None
+
+    asyncio.run(main())
+
+def test_history_is_newest_first_and_capped(store, clock):
+    async def main():
+        for turn in range(MoodStore.HISTORY_LENGTH + 2):
+            await store.set(1, 2, record(f"mood{turn}", clock[0]))
+        moods = [entry["mood"] for entry in await store.history(1, 2)]
+        assert moods == [f"mood{turn}" for turn in range(MoodStore.HISTORY_LENGTH + 1, 1, -1)]
+        # History outlives the current mood
+        clock[0] += 3600
+        assert await store.get(1, 2) is None
+        assert len(await store.history(1, 2)) == MoodStore.HISTORY_LENGTH
+
+    asyncio.run(main())
+
+def test_memory_store_evicts_least_recently_used(clock):
+    store = InMemoryMoodStore(max_entries=2)
+
+    async def main():
+        await store.set(1, 1, record("a", clock[0]))
+        await store.set(1, 2, record("b", clock[0]))
+        await store.get(1, 1)
+        await store.set(1, 3, record("c", clock[0]))
+        assert await store.get(1, 2) is None
+        assert (await store.get(1, 1))["mood"] == "a"
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+from app.services.mp3_frames import mp3_header_length, strip_mp3_headers
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_LENGTH = 417
+
+def frame(fill: int) -> bytes:
+    return FRAME_HEADER + bytes([fill]) * (FRAME_LENGTH - 4)
+
+def info_frame(tag: bytes = b"Info") -> bytes:
+    body = bytearray(FRAME_LENGTH - 4)
+    body[32:36] = tag  # right after the stereo MPEG-1 side information
+    return FRAME_HEADER + bytes(body)
+
+def id3(payload: bytes = b"x" * 20) -> bytes:
+    size = len(payload)
+    return b"ID3\x04\x00\x00" + bytes([size >> 21 & 0x7F, size >> 14 & 0x7F, size >> 7 & 0x7F, size & 0x7F]) + payload
+
+def test_plain_frames_have_no_header():
+    assert mp3_header_length(frame(1) + frame(2)) == 0
+
+def test_id3_and_info_frame_are_measured():
+    assert mp3_header_length(id3() + info_frame() + frame(1)) == 30 + FRAME_LENGTH
+    assert mp3_header_length(info_frame(b"Xing") + frame(1)) == FRAME_LENGTH
+    assert mp3_header_length(id3() + frame(1)) == 30
+
+def test_vbri_frame_is_measured():
+    body = bytearray(FRAME_LENGTH - 4)
+    body[32:36] = b"VBRI"
+    assert mp3_header_length(FRAME_HEADER + bytes(body) + frame(1)) == FRAME_LENGTH
+
+def test_needs_more_data_until_it_can_tell():
+    data = id3() + info_frame()
+    assert mp3_header_length(data[:2]) is None
+    assert mp3_header_length(data[:8]) is None
+    assert mp3_header_length(data[:32]) is None
+    assert mp3_header_length(data[:60]) is None
+    assert mp3_header_length(data[:80]) == 30 + FRAME_LENGTH
+
+def test_non_mp3_data_is_left_alone():
+    assert mp3_header_length(b"RIFF....WAVEfmt " * 4) == 0
+
+def collect(data: bytes, chunk_size: int) -> bytes:
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def main():
+        return b"".join([chunk async for chunk in strip_mp3_headers(chunks())])
+
+    return asyncio.run(main())
+
+def test_stream_is_stripped_whatever_the_chunking():
+    audio = frame(1) + frame(2)
+    for chunk_size in (1, 7, 100, 500, 10000):
+        assert collect(id3() + info_frame() + audio, chunk_size) == audio
+
+def test_stream_without_headers_passes_through():
+    audio = frame(1) + frame(2)
+    assert collect(audio, 64) == audio
+
+def test_short_stream_is_kept():
+    assert collect(b"\xff\xfb", 1) == b"\xff\xfb"
@@ -0,0 +1,70 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.models import Base, Character
+from app.services.mood_service import CharacterMoodService
+from app.services.prompt_cache import SystemPromptCache, build_system_prompt, system_prompt_cache
+
+def luna(**fields):
+    return Character(id=1, name="luna", display_name="Luna", system_prompt="You are Luna", **fields)
+
+class Persona:
+    """A Telegram persona: not an ORM row, only a name"""
+
+    name = "astro_baba"
+    display_name = "Astro Baba"
+    system_prompt = "You read the stars"
+    background_story = None
+    conversation_style = None
+    age_range = None
+
+def test_prompt_is_built_once_per_version_and_mood():
+    cache = SystemPromptCache()
+    character = luna()
+    prompt = cache.get(character)
+    assert cache.get(character) is prompt
+    assert cache.get(character, "happy") is cache.get(character, "happy")
+    assert cache.stats() == {"characters": 1, "prompts": 2}
+
+def test_mood_variants_share_the_base_prompt_as_a_prefix():
+    cache = SystemPromptCache()
+    character = luna(background_story="Grew up by the sea")
+    base = cache.get(character)
+    assert base == build_system_prompt(character)
+    assert base.startswith("You are Luna")
+    assert "Grew up by the sea" in base
+    for mood_key in ("happy", "flirty"):
+        # The mood goes last, so every variant repeats the same prefix byte for byte
+        assert cache.get(character, mood_key) == base + CharacterMoodService.build_mood_prompt(mood_key)
+
+def test_edited_character_gets_a_new_prompt_and_drops_old_moods():
+    cache = SystemPromptCache()
+    cache.get(luna(), "happy")
+    cache.get(luna(), "flirty")
+    edited = luna(conversation_style="Playful")
+    assert "Playful" in cache.get(edited)
+    assert cache.stats() == {"characters": 1, "prompts": 1}
+
+def test_invalidate_one_character_or_all():
+    cache = SystemPromptCache()
+    cache.get(luna())
+    cache.get(Persona())
+    cache.invalidate(1)
+    assert cache.stats()["characters"] == 1
+    cache.invalidate()
+    assert cache.stats() == {"characters": 0, "prompts": 0}
+
+def test_saving_a_character_invalidates_its_prompts():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        character = luna()
+        db.add(character)
+        db.commit()
+        system_prompt_cache.get(character, "happy")
+        assert 1 in system_prompt_cache._prompts
+
+        character.system_prompt = "You are Luna, back from travelling"
+        db.commit()
+        assert 1 not in system_prompt_cache._prompts
+        assert system_prompt_cache.get(character).startswith("You are Luna, back from travelling")
+    system_prompt_cache.invalidate()
@@ -0,0 +1,82 @@
+import time
+import pytest
+from app.models import Character
+from app.services.response_cache import ResponseCache, normalize_message
+
+LUNA = Character(id=1, name="luna", display_name="Luna", system_prompt="You are Luna")
+
+class Stored:
+    def __init__(self, sender_type, content):
+        self.sender_type = sender_type
+        self.content = content
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+def test_miss_until_the_pool_is_full_then_hit():
+    cache = ResponseCache(pool_size=2)
+    key = cache.key(LUNA, None, [], "hi")
+    assert cache.get(key) is None
+    assert cache.missing(key) == 2
+    cache.add(key, ["Hello!", ""])
+    assert cache.get(key) is None
+    cache.add(key, ["Hey you", "Third one"])
+    assert cache.missing(key) == 0
+    assert cache.get(key) in ("Hello!", "Hey you")
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_openers_that_differ_only_in_case_and_punctuation_share_a_key():
+    cache = ResponseCache()
+    assert normalize_message("Hey!! 👋") == "hey"
+    assert cache.key(LUNA, None, [], "Hey!! 👋") == cache.key(LUNA, None, [], "hey")
+    assert cache.key(LUNA, None, [], "hey") != cache.key(LUNA, None, [], "hello")
+
+def test_moods_and_characters_get_separate_pools():
+    cache = ResponseCache(pool_size=1)
+    happy = cache.key(LUNA, "happy", [], "hi")
+    sad = cache.key(LUNA, "sad", [], "hi")
+    assert happy != sad
+    assert happy != cache.key(LUNA, None, [], "hi")
+    cache.add(happy, ["Yay, hi!"])
+    assert cache.get(happy) == "Yay, hi!"
+    assert cache.get(sad) is None
+
+    edited = Character(id=1, name="luna", display_name="Luna", system_prompt="You are Luna, now grumpy")
+    assert cache.key(edited, "happy", [], "hi") != happy
+
+def test_personal_turns_are_not_cached():
+    cache = ResponseCache(max_history=2, max_message_chars=10)
+    history = [Stored("user", "hi"), Stored("character", "hello")]
+    assert cache.key(LUNA, None, history, "hi") is not None
+    assert cache.key(LUNA, None, history + [Stored("user", "and?")], "hi") is None
+    assert cache.key(LUNA, None, [], "hi", conversation_summary="They love jazz") is None
+    assert cache.key(LUNA, None, [], "tell me about your day") is None
+    assert cache.key(LUNA, None, [], "!!!") is None
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(ttl_seconds=60, pool_size=1)
+    key = cache.key(LUNA, None, [], "hi")
+    cache.add(key, ["Hello!"])
+    clock[0] += 59
+    assert cache.get(key) == "Hello!"
+    clock[0] += 1
+    assert cache.missing(key) == 1
+    assert cache.get(key) is None
+    assert cache.expirations == 1
+    # An expired pool starts over instead of mixing in stale replies
+    cache.add(key, ["Hi again"])
+    assert cache.get(key) == "Hi again"
+
+def test_least_recently_used_key_is_evicted():
+    cache = ResponseCache(max_entries=2, pool_size=1)
+    hi, hey, yo = (cache.key(LUNA, None, [], message) for message in ("hi", "hey", "yo"))
+    cache.add(hi, ["a"])
+    cache.add(hey, ["b"])
+    cache.get(hi)
+    cache.add(yo, ["c"])
+    assert cache.get(hey) is None
+    assert cache.get(hi) == "a" and cache.get(yo) == "c"
+    assert cache.stats()["evictions"] == 1
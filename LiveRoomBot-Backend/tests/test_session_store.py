@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+import pytest
+from app.services.session_store import InMemorySessionStore, RedisSessionStore, SessionStore
+from tests.fake_redis import FakeRedis
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemorySessionStore(max_entries=10, ttl_seconds=60, history_length=4)
+    return RedisSessionStore(FakeRedis(), ttl_seconds=60, history_length=4)
+
+def history(session):
+    return [(message.sender_type, message.content) for message in session.history]
+
+def test_base_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+def test_unknown_user_has_no_session(store):
+    async def main():
+        assert await store.get(1) is None
+        # Appending without a session is ignored rather than creating one
+        await store.append(1, "hi", "hello")
+        assert await store.get(1) is None
+
+    asyncio.run(main())
+
+def test_round_trip_keeps_order_senders_and_text(store):
+    async def main():
+        await store.start(1, "Luna")
+        await store.append(1, "Привет 👋", 'She said "hi", then left')
+        session = await store.get(1)
+        assert session.character_name == "Luna"
+        assert history(session) == [("user", "Привет 👋"), ("character", 'She said "hi", then left')]
+        assert all(message.id is None for message in session.history)
+
+    asyncio.run(main())
+
+def test_history_is_trimmed_to_the_last_messages(store):
+    async def main():
+        await store.start(1, "Luna")
+        for turn in range(5):
+            await store.append(1, f"q{turn}", f"a{turn}")
+        assert history(await store.get(1)) == [("user", "q3"), ("character", "a3"), ("user", "q4"), ("character", "a4")]
+
+    asyncio.run(main())
+
+def test_start_switches_character_and_clears_history(store):
+    async def main():
+        await store.start(1, "Luna")
+        await store.append(1, "hi", "hello")
+        await store.start(1, "Orion")
+        session = await store.get(1)
+        assert session.character_name == "Orion"
+        assert session.history == []
+
+    asyncio.run(main())
+
+def test_idle_session_expires_and_append_extends_it(store, clock):
+    async def main():
+        await store.start(1, "Luna")
+        clock[0] += 50
+        await store.append(1, "hi", "hello")
+        clock[0] += 50
+        # 100s since start, but only 50s since the last message
+        assert history(await store.get(1)) == [("user", "hi"), ("character", "hello")]
+        clock[0] += 60
+        assert await store.get(1) is None
+
+    asyncio.run(main())
+
+def test_users_are_kept_apart(store):
+    async def main():
+        await store.start(1, "Luna")
+        await store.start(2, "Orion")
+        await store.append(1, "hi", "hello")
+        assert (await store.get(2)).history == []
+        assert (await store.get(1)).character_name == "Luna"
+
+    asyncio.run(main())
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_entries=2)
+
+    async def main():
+        await store.start(1, "Luna")
+        await store.start(2, "Orion")
+        await store.get(1)
+        await store.start(3, "Vega")
+        assert await store.get(2) is None
+        assert (await store.get(1)).character_name == "Luna"
+        assert (await store.get(3)).character_name == "Vega"
+
+    asyncio.run(main())
+
+def test_redis_store_writes_compact_pairs_with_expiry():
+    client = FakeRedis()
+    store = RedisSessionStore(client, prefix="s", ttl_seconds=60)
+
+    async def main():
+        await store.start(7, "Luna")
+        await store.append(7, "héllo", "hi")
+        assert await client.get("s:7") == "Luna"
+        raw = await client.lrange("s:7:history", 0, -1)
+        assert raw == ['["u","héllo"]', '["c","hi"]']
+        assert [json.loads(item) for item in raw] == [["u", "héllo"], ["c", "hi"]]
+        assert await client.ttl("s:7") == 60
+        assert await client.ttl("s:7:history") == 60
+
+    asyncio.run(main())
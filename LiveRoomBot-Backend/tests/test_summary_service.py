@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models import Base, Character, Conversation, Message, User
+from app.services import summary_service
+from app.services.llm_providers import FakeProvider
+from app.services.llm_scheduler import LLMScheduler
+from app.services.summary_service import ConversationSummarizer
+
+class Summaries(FakeProvider):
+    """Remembers what it was asked to summarize; before_reply runs while the call is in flight"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.before_reply = None
+
+    async def complete(self, messages, params):
+        self.calls.append((messages, params))
+        if self.before_reply:
+            await self.before_reply()
+        return await super().complete(messages, params)
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = Summaries()
+    monkeypatch.setattr(summary_service, "get_llm_provider", lambda name: provider)
+    return provider
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/summary.db")
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(summary_service, "AsyncSessionLocal", Session)
+    asyncio.run(_create(engine))
+    yield Session
+    asyncio.run(engine.dispose())
+
+async def _create(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{"id": 1, "username": "u", "email": "u@x"}])
+        await conn.execute(insert(Character), [{"id": 1, "name": "luna", "display_name": "Luna"}])
+        await conn.execute(insert(Conversation), [{"id": 1, "user_id": 1, "character_id": 1}])
+
+def add_messages(Session, count, first=0):
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async def main():
+        async with Session() as db:
+            await db.execute(insert(Message), [
+                {
+                    "conversation_id": 1, "user_id": 1, "character_id": 1, "content": f"m{n}",
+                    "sender_type": "user" if n % 2 == 0 else "character", "created_at": started + timedelta(seconds=n)
+                }
+                for n in range(first, first + count)
+            ])
+            await db.commit()
+
+    asyncio.run(main())
+
+def conversation(Session) -> Conversation:
+    async def main():
+        async with Session() as db:
+            return await db.get(Conversation, 1)
+
+    return asyncio.run(main())
+
+def test_schedule_waits_for_enough_new_messages(monkeypatch):
+    summarizer = ConversationSummarizer(keep_recent=4, min_new_messages=6)
+    summarized = []
+
+    async def summarize(conversation_id):
+        summarized.append(conversation_id)
+
+    monkeypatch.setattr(summarizer, "summarize", summarize)
+
+    async def main():
+        summarizer.maybe_schedule(1, 100)  # not started: nothing to queue on
+        await summarizer.start()
+        summarizer.maybe_schedule(1, 9)
+        summarizer.maybe_schedule(2, 10)
+        summarizer.maybe_schedule(2, 12)  # already queued, collapses into the first
+        summarizer.maybe_schedule(3, 10)
+        await asyncio.sleep(0.01)
+        await summarizer.stop()
+
+    asyncio.run(main())
+    assert summarized == [2, 3]
+
+def test_older_messages_are_folded_into_the_summary(sessions, provider):
+    add_messages(sessions, 30)
+    summarizer = ConversationSummarizer(keep_recent=10, min_new_messages=5)
+    assert asyncio.run(summarizer.summarize(1)) is True
+
+    messages, params = provider.calls[0]
+    transcript = messages[-1]["content"]
+    assert "User: m0" in transcript and "Companion: m19" in transcript
+    # The live window stays verbatim in the chat context, so it isn't summarized
+    assert "m20" not in transcript
+    assert params["temperature"] == 0.3
+
+    summarized = conversation(sessions)
+    assert summarized.summary == provider.reply(messages, params).strip()
+    assert summarized.summary_message_id == 20  # ids start at 1
+
+    # Only messages after the stored summary are sent next time
+    add_messages(sessions, 5, first=30)
+    assert asyncio.run(summarizer.summarize(1)) is True
+    transcript = provider.calls[1][0][-1]["content"]
+    assert "Existing memory:\n" + summarized.summary in transcript
+    new_messages = transcript.rsplit("New messages:", 1)[1]
+    assert "m19" not in new_messages and "User: m20" in new_messages
+
+def test_too_few_new_messages_are_left_alone(sessions, provider):
+    add_messages(sessions, 14)
+    summarizer = ConversationSummarizer(keep_recent=10, min_new_messages=5)
+    assert asyncio.run(summarizer.summarize(1)) is False
+    assert provider.calls == []
+    assert conversation(sessions).summary is None
+
+def test_slower_worker_never_rolls_the_summary_back(sessions, provider):
+    add_messages(sessions, 30)
+
+    async def newer_summary_lands():
+        async with sessions() as db:
+            await db.execute(update(Conversation).where(Conversation.id == 1).values(summary="newer", summary_message_id=25))
+            await db.commit()
+
+    provider.before_reply = newer_summary_lands
+    summarizer = ConversationSummarizer(keep_recent=10, min_new_messages=5)
+    asyncio.run(summarizer.summarize(1))
+    summarized = conversation(sessions)
+    assert (summarized.summary, summarized.summary_message_id) == ("newer", 25)
+
+def test_summaries_run_in_the_background_lane(sessions, provider, monkeypatch):
+    add_messages(sessions, 30)
+    lanes = []
+
+    class Scheduler:
+        async def run(self, fn, lane="free", deadline=None):
+            lanes.append(lane)
+            return await fn()
+
+    monkeypatch.setattr(summary_service, "get_llm_scheduler", lambda name: Scheduler())
+    asyncio.run(ConversationSummarizer(keep_recent=10, min_new_messages=5).summarize(1))
+    assert lanes == ["background"]
+
+def test_background_lane_waits_behind_chat_turns():
+    scheduler = LLMScheduler(initial_limit=1, min_limit=1)
+    order = []
+
+    async def call(name):
+        order.append(name)
+
+    async def main():
+        async with scheduler.slot("pro"):
+            background = asyncio.create_task(scheduler.run(lambda: call("summary"), lane="background"))
+            chat = asyncio.create_task(scheduler.run(lambda: call("chat"), lane="free"))
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        await asyncio.gather(background, chat)
+
+    asyncio.run(main())
+    assert order == ["chat", "summary"]
@@ -0,0 +1,47 @@
+from app.services.tts_text import chunk_text, normalize, split_sentences
+
+def test_normalize_strips_markup_actions_and_asides():
+    assert normalize("**Hello** *waves* there (quietly) `friend`!") == "Hello there friend!"
+
+def test_normalize_keeps_snake_case_words():
+    assert normalize("my_variable_name is _fine_") == "my_variable_name is fine"
+
+def test_normalize_collapses_emoji_runs():
+    assert normalize("Yay 🎉🎉🎉🎉 done") == "Yay 😊 done"
+    assert normalize("Hi 👋 there") == "Hi 👋 there"
+
+def test_split_sentences_keeps_closing_quotes():
+    assert split_sentences('She said "Hi!" Then left. Really?') == ['She said "Hi!"', "Then left.", "Really?"]
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("Hello there. How are you?", 250) == ["Hello there. How are you?"]
+
+def test_sentences_are_packed_up_to_the_limit():
+    text = "One two three. Four five six. Seven eight nine."
+    assert chunk_text(text, 30) == ["One two three. Four five six.", "Seven eight nine."]
+
+def test_sentence_exactly_at_the_limit_is_not_split():
+    sentence = "a" * 19 + "."
+    assert chunk_text(sentence, 20) == [sentence]
+    assert chunk_text(sentence + " b.", 20) == [sentence, "b."]
+
+def test_long_sentence_splits_at_clauses_then_words():
+    text = "First clause here, second clause here; and a final stretch of words to end it"
+    chunks = chunk_text(text, 20)
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+    assert chunks[0] == "First clause here,"
+
+def test_word_longer_than_the_limit_is_cut():
+    chunks = chunk_text("x" * 45, 20)
+    assert chunks == ["x" * 20, "x" * 20, "x" * 5]
+
+def test_nothing_is_dropped():
+    text = "Hi! " * 40 + "A much longer sentence, with clauses, that keeps going well past the limit we set."
+    chunks = chunk_text(text, 50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", 250) == []
+    assert chunk_text("   ", 250) == []
@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from app.core.single_flight import SingleFlight
+from app.services.turn_guard import ChatTurnGuard, IdempotencyConflict
+
+class Turns:
+    """A chat turn that counts its executions and can be held open"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return {"response": f"reply {self.calls}"}
+
+def test_single_flight_shares_one_execution():
+    async def main():
+        flights = SingleFlight()
+        turns = Turns()
+        waiters = [asyncio.create_task(flights.do("key", turns)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.in_flight("key")
+        turns.release.set()
+        results = await asyncio.gather(*waiters)
+        assert turns.calls == 1
+        assert results == [{"response": "reply 1"}] * 3
+        assert not flights.in_flight("key")
+
+    asyncio.run(main())
+
+def test_single_flight_shares_the_exception():
+    async def main():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def boom():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream")
+
+        first = asyncio.create_task(flights.do("key", boom))
+        await started.wait()
+        second = asyncio.create_task(flights.do("key", boom))
+        for task in (first, second):
+            with pytest.raises(RuntimeError):
+                await task
+
+    asyncio.run(main())
+
+def test_single_flight_waiter_cancellation_does_not_cancel_the_call():
+    async def main():
+        flights = SingleFlight()
+        turns = Turns()
+        owner = asyncio.create_task(flights.do("key", turns))
+        await asyncio.sleep(0)
+        impatient = asyncio.create_task(flights.do("key", turns))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        turns.release.set()
+        assert await owner == {"response": "reply 1"}
+
+    asyncio.run(main())
+
+def test_single_flight_runs_again_once_finished():
+    async def main():
+        flights = SingleFlight()
+        turns = Turns()
+        turns.release.set()
+        await flights.do("key", turns)
+        await flights.do("key", turns)
+        assert turns.calls == 2
+
+    asyncio.run(main())
+
+def test_duplicate_messages_are_coalesced():
+    async def main():
+        guard = ChatTurnGuard()
+        turns = Turns()
+        taps = [asyncio.create_task(guard.run(1, 2, "hello", None, turns)) for _ in range(2)]
+        await asyncio.sleep(0)
+        turns.release.set()
+        assert await asyncio.gather(*taps) == [{"response": "reply 1"}] * 2
+        assert turns.calls == 1
+        assert guard.coalesced == 1
+
+    asyncio.run(main())
+
+def test_retry_with_the_same_key_replays_the_response():
+    async def main():
+        guard = ChatTurnGuard()
+        turns = Turns()
+        turns.release.set()
+        first = await guard.run(1, 2, "hello", "key-1", turns)
+        retry = await guard.run(1, 2, "hello", "key-1", turns)
+        assert retry == first
+        assert turns.calls == 1
+        assert guard.replayed == 1
+
+    asyncio.run(main())
+
+def test_reused_key_for_another_message_conflicts():
+    async def main():
+        guard = ChatTurnGuard()
+        turns = Turns()
+        turns.release.set()
+        await guard.run(1, 2, "hello", "key-1", turns)
+        with pytest.raises(IdempotencyConflict):
+            await guard.run(1, 2, "something else", "key-1", turns)
+
+    asyncio.run(main())
+
+def test_replay_expires_after_the_ttl():
+    async def main():
+        guard = ChatTurnGuard(ttl_seconds=0)
+        turns = Turns()
+        turns.release.set()
+        await guard.run(1, 2, "hello", "key-1", turns)
+        await guard.run(1, 2, "hello", "key-1", turns)
+        assert turns.calls == 2
+
+    asyncio.run(main())
+
+def test_different_messages_for_a_pair_run_one_at_a_time():
+    async def main():
+        guard = ChatTurnGuard()
+        running = 0
+        peak = 0
+
+        async def turn():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+
+        await asyncio.gather(*(guard.run(1, 2, f"message {i}", None, turn) for i in range(3)))
+        assert peak == 1
+        assert guard.stats()["active_pairs"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Pre-synthesize character fallback lines and mood greetings into the voice cache
+"""
+import argparse
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.media_cache import flush_media_caches
+from app.services.voice_service import close_voice_service
+from app.services.voice_warmup import warm_voice_cache
+
+async def main(concurrency: int):
+    print("🔊 Warming the voice cache...")
+    try:
+        summary = await warm_voice_cache(concurrency=concurrency)
+    finally:
+        await close_voice_service()
+        flush_media_caches()
+
+    print(f"📊 Lines: {summary['total']}")
+    print(f"✅ Already cached: {summary['cached']}")
+    print(f"🎙️ Synthesized: {summary['synthesized']}")
+    if summary["failed"]:
+        print(f"❌ Failed: {summary['failed']}")
+    return summary["failed"] == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=settings.TTS_WARMUP_CONCURRENCY, help="Syntheses running at once")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.concurrency)) else 1)